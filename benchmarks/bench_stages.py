@@ -0,0 +1,347 @@
+"""
+Per stage benchmark of the number plate recognition pipeline.
+
+Every stage runs on the bundled images and on synthetic generated frames and videos, the OCR service is
+replaced with the local stub client. The stages whose models or dependencies are missing are reported as
+skipped, with the reason. The JSON report carries the commit and the library versions, so the reports of
+two commits can be compared with --compare.
+
+Run from the repository root:
+    python -m benchmarks.bench_stages --repeat 5 --output bench_report.json
+    python -m benchmarks.bench_stages --compare bench_base.json bench_report.json
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+from utils import text_filter, video
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# the bundled images, by fixture name
+FRAME_FIXTURES = {
+    "input_image": "input/image.png",
+    "east_test_frame": "textdetection/test_frame.png",
+    "yolo_test_frame": "yolov3/images/test_frame.png",
+}
+VEHICLE_FIXTURES = {
+    "car": "lpdetection/car.jpg",
+    "car0": "yolov3/images/cars/car0.jpg",
+    "car1": "yolov3/images/cars/car1.jpg",
+}
+
+SYNTHETIC_FPS = 25
+SYNTHETIC_SIZE = (1280, 720)
+SYNTHETIC_PLATES = ["B123ABC", "CJ16GXS", "IS07XYZ", "TM99QWE"]
+
+# texts as they come from OCR: dates, plates, misread plates and noise
+FILTER_TEXTS = ["12/10/2019", "2019/10/12", "CJ 16 GXS", "B 123 ABC", "CI12ABC", "B1OOXYZ", "DACIA",
+                "LOGAN 1.5 dCi", "11:42:07", "CAM 03", "IS 07 XYZ", "www.example.ro", "RO", "0745 123 456"]
+
+
+class Skipped(Exception):
+    """
+    Raised by a stage which cannot run in this environment.
+    """
+
+
+def _stats(durations):
+    durations = sorted(durations)
+    return {
+        "runs": len(durations),
+        "mean": statistics.mean(durations),
+        "median": statistics.median(durations),
+        "p95": durations[min(len(durations) - 1, int(round(0.95 * (len(durations) - 1))))],
+        "min": durations[0],
+        "max": durations[-1],
+    }
+
+
+def measure(function, repeat, warmup=1):
+    """
+    Time a function call.
+
+    :param function: the function without arguments to time
+    :param repeat: the number of timed calls
+    :param warmup: the number of calls before the timed ones, for the lazy model initialisations
+    :return: the dict of the seconds statistics
+    """
+    for _ in range(warmup):
+        function()
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        durations.append(time.perf_counter() - start)
+    return _stats(durations)
+
+
+def load_fixtures(fixtures):
+    images = {}
+    for (name, path) in fixtures.items():
+        image = cv2.imread(os.path.join(ROOT, path))
+        if image is not None:
+            images[name] = image
+    return images
+
+
+def synthetic_frame(index, plate, size=SYNTHETIC_SIZE):
+    """
+    Draw a CCTV like frame: a timestamp in the top left margin and a vehicle with its number plate
+    moving across the frame.
+    """
+    width, height = size
+    frame = np.full((height, width, 3), 90, dtype=np.uint8)
+    # road texture, so the frames do not compress to nothing
+    cv2.randn(frame, (90, 90, 90), (12, 12, 12))
+    cv2.putText(frame, "12/10/2019", (20, 40), cv2.FONT_HERSHEY_SIMPLEX, 1.0, (255, 255, 255), 2)
+
+    x = 40 + (index * 7) % (width - 520)
+    y = height // 3
+    cv2.rectangle(frame, (x, y), (x + 420, y + 300), (40, 40, 160), -1)
+    cv2.rectangle(frame, (x + 110, y + 210), (x + 310, y + 252), (255, 255, 255), -1)
+    cv2.rectangle(frame, (x + 110, y + 210), (x + 310, y + 252), (0, 0, 0), 2)
+    cv2.putText(frame, plate, (x + 122, y + 244), cv2.FONT_HERSHEY_SIMPLEX, 1.0, (0, 0, 0), 2)
+    return frame
+
+
+def synthetic_vehicle(plate):
+    frame = synthetic_frame(0, plate, size=(600, 400))
+    return frame[400 // 3 - 20:400 // 3 + 320, 20:480]
+
+
+def write_synthetic_video(path, seconds, fps=SYNTHETIC_FPS, size=SYNTHETIC_SIZE):
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), fps, size)
+    if not writer.isOpened():
+        raise Skipped("no MJPG video writer in this OpenCV build")
+    for index in range(int(seconds * fps)):
+        writer.write(synthetic_frame(index, SYNTHETIC_PLATES[index // fps % len(SYNTHETIC_PLATES)], size))
+    writer.release()
+
+
+def bench_frame_sampling(context, repeat):
+    results = {}
+    for seconds in context["synthetic_seconds"]:
+        path = os.path.join(context["workdir"], "synthetic_{0:d}s.avi".format(seconds))
+        write_synthetic_video(path, seconds)
+
+        def sample():
+            cap = cv2.VideoCapture(path)
+            frames = list(video.sample_frames(cap, int(cap.get(cv2.CAP_PROP_FPS))))
+            cap.release()
+            return frames
+
+        results["synthetic_{0:d}s".format(seconds)] = measure(sample, repeat)
+    return results
+
+
+def bench_east(context, repeat):
+    text_recognition = _import("textdetection.text_recognition")
+    model = os.path.join(ROOT, "textdetection", "frozen_east_text_detection.pb")
+    if not os.path.exists(model):
+        raise Skipped("EAST model missing: " + model)
+    detector = text_recognition.EastTextDetector()
+    context["east_detector"] = detector
+    return dict((name, measure(lambda: detector.detect_text_boxes(frame), repeat))
+                for (name, frame) in context["frames"].items())
+
+
+def bench_tesseract(context, repeat):
+    text_recognition = _import("textdetection.text_recognition")
+    detector = context.get("east_detector")
+    if detector is None:
+        raise Skipped("the text boxes come from the EAST stage, which was skipped")
+    results = {}
+    for (name, frame) in context["frames"].items():
+        boxes, (rW, rH) = detector.detect_text_boxes(frame)
+        results[name] = measure(
+            lambda: text_recognition._apply_pytesseract_predictions(frame.copy(), rW, rH, boxes), repeat)
+        results[name]["boxes"] = len(boxes)
+    return results
+
+
+def bench_yolo(context, repeat):
+    car_detection = _import("yolov3.car_detection")
+    try:
+        detector = car_detection.YoloDetector()
+    except (IOError, OSError) as error:
+        raise Skipped("YOLO weights missing: " + str(error))
+    results = {}
+    for (name, frame) in context["frames"].items():
+        processed_image = car_detection.process_image(frame)
+        results[name + "/predict"] = measure(lambda: detector.yolo.predict(processed_image, frame.shape), repeat)
+        boxes, classes, scores = detector.yolo.predict(processed_image, frame.shape)
+        if boxes is not None:
+            results[name + "/post_process"] = measure(
+                lambda: car_detection.extract_car_boxes(frame, boxes, scores, classes, detector.all_classes),
+                repeat)
+    return results
+
+
+def bench_plate_localisation(context, repeat):
+    number_plate_detection = _import("lpdetection.number_plate_detection")
+    # the settings of the pipeline scripts and the original full search
+    detectors = {
+        "pipeline": number_plate_detection.NumberPlateDetection(top_k=3, rectify=True, reference_width=420,
+                                                                cascade_scales=(0.5, 1.0)),
+        "full": number_plate_detection.NumberPlateDetection(fast_preprocessing=False),
+    }
+    results = {}
+    for (detector_name, detector) in detectors.items():
+        for (name, vehicle) in context["vehicles"].items():
+            results[detector_name + "/" + name] = measure(
+                lambda: detector.detect_number_plate_locations(vehicle), repeat)
+    return results
+
+
+def bench_text_filter(context, repeat):
+    results = {}
+    texts = FILTER_TEXTS * 50
+    filters = {"grammar": text_filter.NprTextsFilter()}
+    try:
+        plate_correction = _import("utils.plate_correction")
+        filters["corrected"] = text_filter.NprTextsFilter(corrector=plate_correction.PlateCorrector())
+    except Skipped:
+        pass
+    for (name, texts_filter) in filters.items():
+        results[name] = measure(lambda: texts_filter.filterDatesAndPlates(texts), repeat)
+        results[name]["texts"] = len(texts)
+    return results
+
+
+def bench_stub_ocr(context, repeat):
+    vision = _import("visionapi.vision")
+    batch_vision = _import("visionapi.batch_vision")
+    stub = _import("visionapi.stub")
+    stub_client = stub.StubVisionClient(lambda content: ["CJ 16 GXS"])
+    detector = batch_vision.BatchVision(vision.Vision(stub_client))
+    crops = list(context["vehicles"].values()) * 8
+    result = measure(lambda: detector.detect_texts_many(crops), repeat)
+    result["images"] = len(crops)
+    # the stub calls are deterministic, a change in their number is a change in the batching
+    result["calls_per_run"] = stub_client.calls / float(repeat + 1)
+    return {"vehicles": result}
+
+
+STAGES = [
+    ("frame_sampling", bench_frame_sampling),
+    ("east", bench_east),
+    ("tesseract", bench_tesseract),
+    ("yolo", bench_yolo),
+    ("plate_localisation", bench_plate_localisation),
+    ("text_filter", bench_text_filter),
+    ("stub_ocr", bench_stub_ocr),
+]
+
+
+def _import(module_name):
+    try:
+        __import__(module_name)
+    except ImportError as error:
+        raise Skipped("missing dependency: " + str(error))
+    return sys.modules[module_name]
+
+
+def _git(*args):
+    try:
+        return subprocess.check_output(("git",) + args, cwd=ROOT, stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def environment():
+    return {
+        "commit": _git("rev-parse", "HEAD"),
+        "dirty": bool(_git("status", "--porcelain", "--untracked-files=no")),
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "opencv": cv2.__version__,
+        "numpy": np.__version__,
+        "cpus": os.cpu_count(),
+        "opencv_threads": cv2.getNumThreads(),
+    }
+
+
+def run(repeat, stages=None, synthetic_seconds=(2, 10)):
+    """
+    Run the benchmark stages.
+
+    :param repeat: the number of timed runs of every measurement
+    :param stages: the names of the stages to run, all of them if None
+    :param synthetic_seconds: the lengths of the synthetic videos
+    :return: the report dict
+    """
+    report = {"environment": environment(), "repeat": repeat, "stages": {}}
+    with tempfile.TemporaryDirectory(prefix="npr_bench") as workdir:
+        frames = load_fixtures(FRAME_FIXTURES)
+        vehicles = load_fixtures(VEHICLE_FIXTURES)
+        for (i, plate) in enumerate(SYNTHETIC_PLATES[:2]):
+            frames["synthetic_" + plate] = synthetic_frame(i * 40, plate)
+            vehicles["synthetic_" + plate] = synthetic_vehicle(plate)
+        context = {"workdir": workdir, "frames": frames, "vehicles": vehicles,
+                   "synthetic_seconds": synthetic_seconds}
+
+        for (name, stage) in STAGES:
+            if stages is not None and name not in stages:
+                continue
+            print("[BENCH] " + name)
+            try:
+                report["stages"][name] = stage(context, repeat)
+            except Skipped as skipped:
+                print("[BENCH] " + name + " skipped: " + str(skipped))
+                report["stages"][name] = {"skipped": str(skipped)}
+    return report
+
+
+def compare(base_report, report):
+    """
+    Print the median time change of every measurement found in both reports.
+    """
+    print("{0:<50} {1:>10} {2:>10} {3:>8}".format("measurement", "base ms", "ms", "change"))
+    for (stage, measurements) in sorted(report["stages"].items()):
+        base_measurements = base_report["stages"].get(stage, {})
+        for (name, result) in sorted(measurements.items()):
+            base_result = base_measurements.get(name)
+            if not isinstance(result, dict) or not isinstance(base_result, dict):
+                continue
+            change = result["median"] / base_result["median"] - 1 if base_result["median"] else 0.0
+            print("{0:<50} {1:>10.2f} {2:>10.2f} {3:>+7.1%}".format(stage + "/" + name, base_result["median"] * 1000,
+                                                                    result["median"] * 1000, change))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Per stage benchmark of the number plate recognition pipeline.")
+    parser.add_argument("--repeat", type=int, default=5, help="timed runs of every measurement")
+    parser.add_argument("--stage", action="append", choices=[name for (name, stage) in STAGES],
+                        help="run only this stage, can be repeated")
+    parser.add_argument("--synthetic-seconds", type=int, nargs="+", default=[2, 10],
+                        help="lengths of the synthetic videos")
+    parser.add_argument("--output", default="bench_report.json", help="the JSON report path")
+    parser.add_argument("--compare", nargs=2, metavar=("BASE", "REPORT"),
+                        help="compare two JSON reports instead of running the benchmark")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        with open(args.compare[0]) as base_file, open(args.compare[1]) as report_file:
+            compare(json.load(base_file), json.load(report_file))
+        return
+
+    report = run(args.repeat, args.stage, args.synthetic_seconds)
+    with open(args.output, "w") as output:
+        json.dump(report, output, indent=2, sort_keys=True)
+    print("[BENCH] report written to " + args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,344 @@
+"""
+Speed and accuracy regression check of the number plate recognition pipeline.
+
+Every case runs the pipeline on a bundled input and compares its output with a golden file: the result.txt
+of the pipeline scripts, or the dates.txt / numbers.txt of the EAST text recognition. The runs are offline and
+need no credentials. The Vision API calls are answered from the recording of the fixtures,
+benchmarks/fixtures/vision_responses.jsonl, when it exists, and a Vision request missing from it fails the run:
+the uploads are keyed by their hash, a change of the crops, of their encoding or of the images the local
+Tesseract escalates to Vision needs a new recording. Without the recording, the Vision calls are answered by the
+local Tesseract with the stub client, deterministic for a given Tesseract install. The stage timings of every
+case are recorded, and the run fails when a case loses accuracy or when a case or a stage exceeds its latency
+budget.
+
+Run from the repository root:
+    python -m benchmarks.regression --output regression_report.json
+    python -m benchmarks.regression --budget my_budget.json
+    python -m benchmarks.regression --record-responses    # with the Google Cloud credentials
+    python -m benchmarks.regression --update-golden
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+from benchmarks import bench_stages
+
+ROOT = bench_stages.ROOT
+
+# the pipeline cases: the input run through the pipeline and the golden result.txt it must reproduce
+PIPELINE_CASES = {
+    "input_image": ("input/image.png", "result.txt"),
+}
+# the EAST text recognition cases: the frame and the golden (dates, numbers) files
+EAST_CASES = {
+    "east_test_frame": ("textdetection/test_frame.png", "textdetection/output/dates.txt",
+                        "textdetection/output/numbers.txt"),
+}
+VIDEO_EXTENSIONS = (".avi", ".mp4", ".mkv", ".mov")
+# the Vision API responses of the cases, recorded with --record-responses
+RESPONSES_PATH = "benchmarks/fixtures/vision_responses.jsonl"
+
+# the share of the golden and detected dates and plates that must match, 1.0 for an exact match
+MIN_ACCURACY = 1.0
+# the seconds every case may take, and the mean seconds of every stage span, on a single CPU core
+LATENCY_BUDGET = {
+    "cases": {
+        "input_image": 30.0,
+        "east_test_frame": 5.0,
+    },
+    "stages": {
+        "extract_numbers_first_date": 5.0,
+        "detect_cars": 5.0,
+        "detect_number_plate_locations": 0.5,
+        "detect_texts": 10.0,
+        "filter_texts": 0.1,
+        "extract_margin_date": 5.0,
+        "east_text": 5.0,
+    },
+}
+
+
+def read_result(path):
+    """
+    Read a result.txt written by npr_pipeline.write_result.
+
+    :return: the list of (date, number plate) readings
+    """
+    readings = []
+    with open(path) as file:
+        for line in file:
+            if " - " in line:
+                date, number = line.strip().rsplit(" - ", 1)
+                readings.append((date, number))
+    return readings
+
+
+def read_lines(path):
+    with open(path) as file:
+        return [line.strip() for line in file if line.strip()]
+
+
+def write_lines(path, lines):
+    with open(path, "w") as file:
+        for line in lines:
+            file.write(line + "\n")
+
+
+def result_items(readings):
+    """
+    :param readings: list of (date, number plate) readings
+    :return: the set of the compared items: the dates, the plates and the readings
+    """
+    items = set()
+    for (date, number) in readings:
+        if date != "NO_DATE":
+            items.add("date:" + date)
+        items.add("plate:" + number)
+        items.add("reading:" + date + " - " + number)
+    return items
+
+
+def text_items(dates, numbers):
+    return set(["date:" + date for date in dates] + ["plate:" + number for number in numbers])
+
+
+def accuracy(golden, detected):
+    """
+    :param golden: the set of the golden items
+    :param detected: the set of the detected items
+    :return: dict with the accuracy, the share of all the items found in both sets, and the differences
+    """
+    union = golden | detected
+    return {
+        "accuracy": len(golden & detected) / float(len(union)) if union else 1.0,
+        "missing": sorted(golden - detected),
+        "unexpected": sorted(detected - golden),
+    }
+
+
+def stage_timings(before, after):
+    """
+    :param before: the Instrumentation snapshot taken before the case
+    :param after: the Instrumentation snapshot taken after the case
+    :return: dict of the spans of the case by stage name, with their count, total and mean seconds
+    """
+    timings = {}
+    for (name, histogram) in after["stages"].items():
+        previous = before["stages"].get(name, {"count": 0, "sum": 0.0})
+        count = histogram["count"] - previous["count"]
+        if count > 0:
+            seconds = histogram["sum"] - previous["sum"]
+            timings[name] = {"count": count, "seconds": seconds, "mean": seconds / count}
+    return timings
+
+
+class RegressionRun:
+    """
+    Runs the cases on a single pipeline, the models are loaded once for all of them.
+    """
+
+    def __init__(self, vision_client) -> None:
+        """
+        :param vision_client: the Vision API client of the pipeline, e.g. the StubVisionClient
+        """
+        import npr_pipeline
+        from utils import instrumentation
+        self.metrics = instrumentation.Instrumentation()
+        # the OCR cache is kept in memory only, the results do not depend on the earlier runs
+        self.pipeline = npr_pipeline.NprPipeline(metrics=self.metrics, vision_client=vision_client,
+                                                 ocr_cache_path=None)
+
+    def run_pipeline_case(self, path):
+        """
+        :param path: the input image or video path
+        :return: the list of (date, number plate) readings
+        """
+        if path.lower().endswith(VIDEO_EXTENSIONS):
+            result = self.pipeline.process_video(path)
+        else:
+            input_image = cv2.imread(path)
+            if input_image is None:
+                raise IOError("Error reading the image file " + path)
+            result = self.pipeline.process_image(input_image)
+        return [(str(date), number) for (date, numbers) in result.items() for number in numbers]
+
+    def run_east_case(self, path):
+        """
+        :param path: the frame path
+        :return: tuple (dates, numbers) recognised by EAST and Tesseract
+        """
+        input_image = cv2.imread(path)
+        if input_image is None:
+            raise IOError("Error reading the image file " + path)
+        with self.metrics.span("east_text"):
+            dates, numbers = self.pipeline.eastDetector.extract_text(input_image)
+        return dates, numbers
+
+    def timed(self, case, *args):
+        """
+        Run a case and time it, starting from an empty OCR cache.
+
+        :return: tuple (the case output, its total seconds, its stage timings)
+        """
+        # the OCR results of the warmup runs would be served from the cache instead of measuring the OCR
+        self.pipeline.ocrCache.clear()
+        before = self.metrics.snapshot()
+        start = time.perf_counter()
+        output = case(*args)
+        seconds = time.perf_counter() - start
+        return output, seconds, stage_timings(before, self.metrics.snapshot())
+
+    def close(self):
+        self.pipeline.close()
+
+
+def check_latency(name, seconds, timings, budget):
+    """
+    :return: the list of the latency budget violations of a case
+    """
+    violations = []
+    case_budget = budget["cases"].get(name)
+    if case_budget is not None and seconds > case_budget:
+        violations.append("{0} took {1:.2f}s, budget {2:.2f}s".format(name, seconds, case_budget))
+    for (stage, timing) in sorted(timings.items()):
+        stage_budget = budget["stages"].get(stage)
+        if stage_budget is not None and timing["mean"] > stage_budget:
+            violations.append("{0}/{1} took {2:.3f}s on average, budget {3:.3f}s".format(
+                name, stage, timing["mean"], stage_budget))
+    return violations
+
+
+def local_ocr_responder():
+    """
+    :return: a StubVisionClient responder answering the uploaded images with the words and the word boxes
+        the local Tesseract reads in them, the whole text first like the Vision API
+    """
+    from ocr import backends
+    tesseract = backends.TesseractBackend()
+
+    def respond(content):
+        image = cv2.imdecode(np.frombuffer(content, dtype=np.uint8), cv2.IMREAD_COLOR)
+        return tesseract.recognise_annotations(image)[1] if image is not None else []
+
+    return respond
+
+
+def create_vision_client(responses, record=False):
+    """
+    :param responses: the Vision API recording path, relative to the repository root
+    :param record: record the responses of the live Vision API instead of replaying them
+    :return: tuple (the Vision API client of the pipeline, its mode: "record", "replay" or "local_ocr")
+    """
+    from visionapi import replay, stub
+    path = os.path.join(ROOT, responses)
+    if record:
+        from google.cloud import vision
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return replay.RecordingVisionClient(vision.ImageAnnotatorClient(), path), "record"
+    if os.path.exists(path):
+        return replay.ReplayVisionClient(path), "replay"
+    print("[REGRESSION] no Vision API recording " + path + ", the Vision calls are answered by the local Tesseract")
+    return stub.StubVisionClient(local_ocr_responder()), "local_ocr"
+
+
+def run(budget=LATENCY_BUDGET, min_accuracy=MIN_ACCURACY, responses=RESPONSES_PATH, warmup=1, update_golden=False,
+        record=False):
+    """
+    Run all the cases.
+
+    :param budget: dict of the "cases" seconds and the "stages" mean seconds allowed
+    :param min_accuracy: the lowest accuracy accepted for every case
+    :param responses: the Vision API recording of visionapi.replay answering the Vision calls, the local
+        Tesseract answers them when it does not exist
+    :param warmup: the untimed runs of every case before the timed one, for the lazy model initialisations
+    :param update_golden: write the outputs of the cases into their golden files instead of checking them
+    :param record: record the live Vision API responses into the recording instead of replaying it
+    :return: the report dict, its "failures" list is empty when the run passed
+    """
+    vision_client, vision_mode = create_vision_client(responses, record)
+    report = {"environment": bench_stages.environment(), "min_accuracy": min_accuracy, "budget": budget,
+              "vision_mode": vision_mode, "vision_calls": 0, "cases": {}, "failures": []}
+    regression = RegressionRun(vision_client)
+    try:
+        cases = [(name, regression.run_pipeline_case, (os.path.join(ROOT, path),))
+                 for (name, (path, golden)) in PIPELINE_CASES.items()]
+        cases += [(name, regression.run_east_case, (os.path.join(ROOT, path),))
+                  for (name, (path, dates, numbers)) in EAST_CASES.items()]
+        for _ in range(warmup):
+            for (name, case, args) in cases:
+                case(*args)
+
+        for (name, case, args) in cases:
+            print("[REGRESSION] " + name)
+            output, seconds, timings = regression.timed(case, *args)
+            if name in PIPELINE_CASES:
+                golden_path = os.path.join(ROOT, PIPELINE_CASES[name][1])
+                if update_golden:
+                    write_lines(golden_path, sorted(date + " - " + number for (date, number) in output))
+                comparison = accuracy(result_items(read_result(golden_path)), result_items(output))
+            else:
+                dates_path, numbers_path = [os.path.join(ROOT, path) for path in EAST_CASES[name][1:]]
+                if update_golden:
+                    write_lines(dates_path, output[0])
+                    write_lines(numbers_path, output[1])
+                comparison = accuracy(text_items(read_lines(dates_path), read_lines(numbers_path)),
+                                      text_items(*output))
+
+            failures = check_latency(name, seconds, timings, budget)
+            if comparison["accuracy"] < min_accuracy:
+                failures.insert(0, "{0} accuracy {1:.2f} below {2:.2f}, missing {3}, unexpected {4}".format(
+                    name, comparison["accuracy"], min_accuracy, comparison["missing"], comparison["unexpected"]))
+            for failure in failures:
+                print("[REGRESSION] FAILED " + failure)
+            report["cases"][name] = dict(comparison, seconds=seconds, stages=timings)
+            report["failures"].extend(failures)
+    finally:
+        regression.close()
+    report["vision_replay_misses"] = getattr(vision_client, "misses", 0)
+    report["vision_calls"] = getattr(vision_client, "calls", None)
+    if report["vision_replay_misses"]:
+        failure = "{0:d} Vision requests missing from the recording {1}, record it again with " \
+                  "--record-responses".format(report["vision_replay_misses"], responses)
+        print("[REGRESSION] FAILED " + failure)
+        report["failures"].append(failure)
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Speed and accuracy regression check of the pipeline.")
+    parser.add_argument("--budget", help="JSON file of the latency budget, overriding the default cases and stages")
+    parser.add_argument("--min-accuracy", type=float, default=MIN_ACCURACY,
+                        help="the lowest accuracy accepted for every case")
+    parser.add_argument("--responses", default=RESPONSES_PATH,
+                        help="the Vision API recording replayed when it exists, see visionapi.replay")
+    parser.add_argument("--record-responses", action="store_true",
+                        help="record the live Vision API responses of the cases into the recording")
+    parser.add_argument("--warmup", type=int, default=1, help="untimed runs of every case before the timed one")
+    parser.add_argument("--update-golden", action="store_true",
+                        help="write the outputs of the cases into their golden files")
+    parser.add_argument("--output", default="regression_report.json", help="the JSON report path")
+    args = parser.parse_args(argv)
+
+    budget = {"cases": dict(LATENCY_BUDGET["cases"]), "stages": dict(LATENCY_BUDGET["stages"])}
+    if args.budget:
+        with open(args.budget) as file:
+            overrides = json.load(file)
+        budget["cases"].update(overrides.get("cases", {}))
+        budget["stages"].update(overrides.get("stages", {}))
+    report = run(budget, args.min_accuracy, args.responses, args.warmup, args.update_golden, args.record_responses)
+    with open(args.output, "w") as output:
+        json.dump(report, output, indent=2, sort_keys=True)
+    print("[REGRESSION] report written to " + args.output)
+    if report["failures"]:
+        print("[REGRESSION] {0:d} failures".format(len(report["failures"])))
+        sys.exit(1)
+    print("[REGRESSION] passed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+import cv2
+
+# Romanian number plates are 520 x 110 mm
+PLATE_ASPECT_RATIO = 520.0 / 110.0
+
+DEFAULT_WEIGHTS = {
+    'edge_density': 1.0,
+    'aspect_ratio': 1.0,
+    'characters': 2.0,
+    'position': 1.0,
+}
+
+
+class PlateCandidate:
+    """
+    A potential number plate location found within a vehicle image.
+    """
+
+    def __init__(self, rectangle, image, box_points=None) -> None:
+        """
+        :param rectangle: the axis aligned location (topLeft(x,y), bottomRight(x,y)) within the vehicle image
+        :param image: the cv2 image cropped from the vehicle image
+        :param box_points: the rotated corner points of all the contours merged into this candidate
+        """
+        self.rectangle = rectangle
+        self.image = image
+        self.box_points = box_points if box_points is not None else []
+        self.score = 0.0
+        self.features = {}
+
+    def __repr__(self) -> str:
+        return 'PlateCandidate({0}, score={1:.3f})'.format(self.rectangle, self.score)
+
+
+def edge_density_score(edges, rectangle, target_density=0.25):
+    """
+    Score the ratio of edge pixels within the rectangle, plates are text dense but not noise.
+
+    :param edges: the Canny edges of the vehicle image
+    :param rectangle: (topLeft(x,y), bottomRight(x,y))
+    :param target_density: the expected ratio of edge pixels on a plate
+    :return: score between 0 and 1
+    """
+    (left, top), (right, bottom) = rectangle
+    region = edges[top:bottom, left:right]
+    if region.size == 0:
+        return 0.0
+    density = cv2.countNonZero(region) / float(region.size)
+    return max(0.0, 1.0 - abs(density - target_density) / target_density)
+
+
+def aspect_ratio_score(rectangle, target_ratio=PLATE_ASPECT_RATIO):
+    """
+    Score how close the rectangle is to the number plate aspect ratio.
+
+    :param rectangle: (topLeft(x,y), bottomRight(x,y))
+    :param target_ratio: the expected width / height ratio
+    :return: score between 0 and 1
+    """
+    (left, top), (right, bottom) = rectangle
+    width = float(right - left)
+    height = float(bottom - top)
+    if width <= 0.0 or height <= 0.0:
+        return 0.0
+    return max(0.0, 1.0 - abs(width / height - target_ratio) / target_ratio)
+
+
+def characters_score(plate_img, expected_characters=7):
+    """
+    Score the number of character like connected components within the plate image.
+    A character is taller than wide and covers most of the plate height.
+
+    :param plate_img: the cv2 cropped plate image
+    :param expected_characters: the expected number of characters on a plate
+    :return: score between 0 and 1
+    """
+    if plate_img.size == 0:
+        return 0.0
+    gray = cv2.cvtColor(plate_img, cv2.COLOR_BGR2GRAY) if plate_img.ndim == 3 else plate_img
+    # the characters are dark on a light plate
+    ret, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV | cv2.THRESH_OTSU)
+    count, labels, stats, centroids = cv2.connectedComponentsWithStats(binary)
+
+    plate_height = gray.shape[0]
+    characters = 0
+    # label 0 is the background
+    for (x, y, width, height, area) in stats[1:]:
+        if 0.4 * plate_height <= height <= 0.95 * plate_height and width < height and area > 0.2 * width * height:
+            characters += 1
+    return max(0.0, 1.0 - abs(characters - expected_characters) / float(expected_characters))
+
+
+def position_score(rectangle, vehicle_shape):
+    """
+    Score the position of the rectangle within the vehicle, plates are centered horizontally on the lower half.
+
+    :param rectangle: (topLeft(x,y), bottomRight(x,y))
+    :param vehicle_shape: the shape of the vehicle image
+    :return: score between 0 and 1
+    """
+    (left, top), (right, bottom) = rectangle
+    vehicle_height, vehicle_width = vehicle_shape[:2]
+    center_x = (left + right) / 2.0 / vehicle_width
+    center_y = (top + bottom) / 2.0 / vehicle_height
+    horizontal = max(0.0, 1.0 - 2.0 * abs(center_x - 0.5))
+    vertical = min(1.0, max(0.0, center_y))
+    return 0.5 * horizontal + 0.5 * vertical
+
+
+class PlateCandidateScorer:
+    """
+    Weighted scoring of the number plate candidates, used to only send the best ones to OCR.
+    """
+    __weights = None
+
+    def __init__(self, weights=None) -> None:
+        """
+        :param weights: dict of feature name -> weight, missing features use the default weights
+        """
+        self.__weights = dict(DEFAULT_WEIGHTS)
+        if weights is not None:
+            self.__weights.update(weights)
+
+    def score(self, candidate, edges, vehicle_shape):
+        """
+        Compute the candidate features and its weighted score, stored on the candidate.
+
+        :param candidate: the PlateCandidate to score
+        :param edges: the Canny edges of the vehicle image
+        :param vehicle_shape: the shape of the vehicle image
+        :return: the score between 0 and 1
+        """
+        features = {}
+        weights = self.__weights
+        if weights['edge_density']:
+            features['edge_density'] = edge_density_score(edges, candidate.rectangle)
+        if weights['aspect_ratio']:
+            features['aspect_ratio'] = aspect_ratio_score(candidate.rectangle)
+        if weights['characters']:
+            features['characters'] = characters_score(candidate.image)
+        if weights['position']:
+            features['position'] = position_score(candidate.rectangle, vehicle_shape)
+
+        total_weight = sum(weights[name] for name in features)
+        candidate.features = features
+        candidate.score = sum(weights[name] * value for (name, value) in features.items()) / total_weight \
+            if total_weight > 0 else 0.0
+        return candidate.score
+
+    def select(self, candidates, edges, vehicle_shape, top_k=None, min_score=0.0):
+        """
+        Score the candidates and keep the best ones.
+
+        :param candidates: list of PlateCandidate
+        :param edges: the Canny edges of the vehicle image
+        :param vehicle_shape: the shape of the vehicle image
+        :param top_k: the maximum number of candidates to keep, None to keep all
+        :param min_score: the candidates scoring lower are dropped
+        :return: the kept candidates, best first
+        """
+        for candidate in candidates:
+            self.score(candidate, edges, vehicle_shape)
+        ranked = sorted((c for c in candidates if c.score >= min_score), key=lambda c: c.score, reverse=True)
+        return ranked if top_k is None else ranked[:top_k]
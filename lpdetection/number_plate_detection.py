@@ -1,28 +1,12 @@
+import time
+
 import cv2
 import numpy as np
 
-
-def increase_contrast(bgr_img):
-    """
-    Increase the contrast of the input image
-    :param bgr_img: cv2 read image
-    :return: the image with an increased contrast
-    """
-    # Convert image to LAB color space
-    lab_img = cv2.cvtColor(bgr_img, cv2.COLOR_BGR2LAB)
-
-    # Split the 3 channels
-    l, a, b = cv2.split(lab_img)
-
-    # Apply CLAHE to the L-channel
-    clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
-    cl = clahe.apply(l)
-
-    # Merge the CLAHE enhanced L-channel with the other channels
-    l_img = cv2.merge((cl, a, b))
-
-    final = cv2.cvtColor(l_img, cv2.COLOR_LAB2BGR)
-    return final
+from lpdetection.candidate_scoring import PlateCandidate, PlateCandidateScorer
+from lpdetection.plate_rectification import PLATE_SIZE, rectify_plate
+from lpdetection.preprocessing import luminance_edges, reference_edges
+from lpdetection.rectangle_merge import findRectangleGroups
 
 
 def find_margin_corners(x, y, boxPoints):
@@ -41,120 +25,186 @@ def find_margin_corners(x, y, boxPoints):
     return topLeft, bottomRight
 
 
-def areOverlapping(rect1, rect2):
+def filterHorizontalRectangles(rectangles):
     """
-    Find if the two rectangles are intersecting.
-    Rect: (topLeft(x,y), bottomRight(x,y))
+    Filter the horizontal oriented rectangles from the given list.
+
+    :param rectangles: a list containing tuples of points (topLeft, bottomRight)
+    :return: the filtered list of points
     """
-    topLeft1 = rect1[0]
-    bottomRight1 = rect1[1]
+    return [rectangle for rectangle in rectangles if isHorizontalRectangle(rectangle)]
 
-    topLeft2 = rect2[0]
-    bottomRight2 = rect2[1]
 
-    if topLeft1[0] > bottomRight2[0] or bottomRight1[0] < topLeft2[0]:
-        return False
-    if topLeft1[1] > bottomRight2[1] or bottomRight1[1] < topLeft2[1]:
-        return False
-    return True
+def isHorizontalRectangle(rectangle):
+    """
+    Rect: (topLeft(x,y), bottomRight(x,y))
+    :return: True if the rectangle is wider than it is tall
+    """
+    topLeft, bottomRight = rectangle
+    rectangleWidth = bottomRight[0] - topLeft[0]
+    rectangleHeight = bottomRight[1] - topLeft[1]
+    return rectangleWidth > rectangleHeight
 
 
-def findRectangleIntersections(rectangles):
+def clipRectangle(rectangle, img_shape):
     """
-    Find the intersection of every rectangles
+    Clip the rectangle to the image bounds.
 
-    :param rectangles: a list containing tuples of points (topLeft, bottomRight)
-    :return: the filtered list of points
+    :param rectangle: (topLeft(x,y), bottomRight(x,y))
+    :param img_shape: the shape of the image
+    :return: the clipped rectangle with int coordinates
     """
-    result = rectangles.copy()
-    intersected = True
-    i = 0
-    j = 1
-    while intersected:
-        intersected = False
-
-        if len(result) >= 2 and areOverlapping(result[i], result[j]):
-            minRectangle = minimumContainingRect(rectangles[i], rectangles[j])
-            result.append(minRectangle)
-            result.remove(rectangles[i])
-            result.remove(rectangles[j])
-            i = 0
-            j = 1
-            intersected = True
-        else:
-            j += 1
-            if j == len(result):
-                j = 0
-                i += 1
-            if i == len(result) - 1:
-                break
-    return result
+    (left, top), (right, bottom) = rectangle
+    img_height, img_width = img_shape[:2]
+    return ((int(min(max(left, 0), img_width)), int(min(max(top, 0), img_height))),
+            (int(min(max(right, 0), img_width)), int(min(max(bottom, 0), img_height))))
 
 
-def minimumContainingRect(rect1, rect2):
+def rectangleOverlap(rect1, rect2):
     """
+    Intersection over union of the two rectangles.
     Rect: (topLeft(x,y), bottomRight(x,y))
-    :return: the minimum rectangle that contains both of the rectangles.
     """
-    intTopLeft = (min(rect1[0][0], rect1[0][0]), min(rect2[0][1], rect2[0][1]))
-    intBottomRight = (max(rect1[1][0], rect1[1][0]), max(rect2[1][1], rect2[1][1]))
-    return intTopLeft, intBottomRight
+    width = min(rect1[1][0], rect2[1][0]) - max(rect1[0][0], rect2[0][0])
+    height = min(rect1[1][1], rect2[1][1]) - max(rect1[0][1], rect2[0][1])
+    intersection = max(0, width) * max(0, height)
+    union = (rect1[1][0] - rect1[0][0]) * (rect1[1][1] - rect1[0][1]) \
+        + (rect2[1][0] - rect2[0][0]) * (rect2[1][1] - rect2[0][1]) - intersection
+    return intersection / float(union) if union > 0 else 0.0
 
 
-def filterHorizontalRectangles(rectangles):
+def mergeLevelCandidates(kept, candidates, top_k=None, max_overlap=0.5):
     """
-    Filter the horizontal oriented rectangles from the given list.
-
-    :param rectangles: a list containing tuples of points (topLeft, bottomRight)
-    :return: the filtered list of points
+    Merge the candidates of a cascade level into the best ones of the earlier levels.
+    A location found at several levels is kept once, with its best scored candidate.
+
+    :param kept: the best scored PlateCandidate list of the earlier levels, within the input image coordinates
+    :param candidates: the PlateCandidate list of the level, within the input image coordinates
+    :param top_k: the maximum number of candidates to keep, None to keep all
+    :param max_overlap: the candidates overlapping a better one more than this are the same location
+    :return: the best scored PlateCandidate list, at most top_k long
     """
-    result = []
-    for (topLeft, bottomRight) in rectangles:
-        rectangleWidth = bottomRight[0] - topLeft[0]
-        rectangleHeight = bottomRight[1] - topLeft[1]
-        if rectangleWidth > rectangleHeight:
-            result.append((topLeft, bottomRight))
-    return result
+    merged = []
+    for candidate in sorted(kept + candidates, key=lambda c: c.score, reverse=True):
+        if all(rectangleOverlap(candidate.rectangle, other.rectangle) <= max_overlap for other in merged):
+            merged.append(candidate)
+    return merged if top_k is None else merged[:top_k]
 
 
 class NumberPlateDetection:
-
-    def __init__(self) -> None:
+    __fast_preprocessing = True
+    __scorer = None
+    __top_k = None
+    __min_score = 0.0
+    __rectify = False
+    __plate_size = PLATE_SIZE
+    __reference_width = None
+    __cascade_scales = (1.0,)
+    __plausible_score = 0.5
+    __last_timings = None
+
+    def __init__(self, fast_preprocessing=True, top_k=None, scorer=None, min_score=0.0, rectify=False,
+                 plate_size=PLATE_SIZE, reference_width=None, cascade_scales=(1.0,), plausible_score=0.5) -> None:
+        """
+        :param fast_preprocessing: compute the edges on the luminance channel only, instead of the full colour path
+        :param top_k: the maximum number of plate locations returned per vehicle, None to return all of them
+        :param scorer: the PlateCandidateScorer ranking the plate locations, the default weights are used if None
+        :param min_score: the plate locations scoring lower are dropped
+        :param rectify: return the plate locations deskewed, binarised and resized to plate_size
+        :param plate_size: (width, height) of the rectified plate images
+        :param reference_width: the width every vehicle image is resized to before the search, None to keep its size
+        :param cascade_scales: the increasing scales of the reference width searched one after the other
+        :param plausible_score: a level finding a candidate scoring at least this much ends the search
+        """
         super().__init__()
-
-    @staticmethod
-    def detect_number_plate_locations(input_img):
+        self.__fast_preprocessing = fast_preprocessing
+        self.__top_k = top_k
+        self.__scorer = scorer if scorer is not None else PlateCandidateScorer()
+        self.__min_score = min_score
+        self.__rectify = rectify
+        self.__plate_size = plate_size
+        self.__reference_width = reference_width
+        self.__cascade_scales = tuple(cascade_scales)
+        self.__plausible_score = plausible_score
+        self.__last_timings = []
+
+    def detect_number_plate_candidates(self, input_img):
         """
-        Detect the number plate locations from the input image.
+        Detect the number plate candidates from the input image, ranked by their score.
+        The image is normalised to the reference width and searched level by level through the cascade scales,
+        stopping at the first level that finds a plausible candidate. The candidates of all the levels searched
+        are merged, so the less plausible ones of a coarse level are still returned when a finer level finds none.
 
         :param input_img: cv2 read input image
-        :return:  all the locations cropped as cv2 images from the input image
+        :return: the best scored PlateCandidate list, at most top_k long
         """
-        # BLUR the image
-        blurred = cv2.GaussianBlur(input_img, (3, 3), 0)
+        img_height, img_width = input_img.shape[:2]
+        normalisation = self.__reference_width / float(img_width) if self.__reference_width else 1.0
+
+        self.__last_timings = []
+        candidates = []
+        for scale in self.__cascade_scales:
+            start = time.time()
+            level_scale = normalisation * scale
+            if level_scale == 1.0:
+                level_img = input_img
+            else:
+                interpolation = cv2.INTER_AREA if level_scale < 1.0 else cv2.INTER_LINEAR
+                level_img = cv2.resize(input_img, (max(1, int(round(img_width * level_scale))),
+                                                   max(1, int(round(img_height * level_scale)))),
+                                       interpolation=interpolation)
+
+            level_candidates = self.__detect_level(level_img, scale)
+            # Map the candidates found within the level image back onto the input image
+            for candidate in level_candidates:
+                (left, top), (right, bottom) = candidate.rectangle
+                (left, top), (right, bottom) = candidate.rectangle = clipRectangle(
+                    ((left / level_scale, top / level_scale), (right / level_scale, bottom / level_scale)),
+                    input_img.shape)
+                candidate.image = input_img[top:bottom, left:right]
+                candidate.box_points = [box / level_scale for box in candidate.box_points]
+
+            self.__last_timings.append({'scale': scale, 'size': level_img.shape[1::-1],
+                                        'candidates': len(level_candidates), 'seconds': time.time() - start})
+            candidates = mergeLevelCandidates(candidates, level_candidates, self.__top_k)
+            if any(candidate.score >= self.__plausible_score for candidate in level_candidates):
+                break
 
-        # Increase image CONTRAST
-        contrasted = increase_contrast(blurred)
+        if self.__rectify:
+            for candidate in candidates:
+                candidate.image = self.plate_image(input_img, candidate.rectangle, candidate.box_points)
+        return candidates
 
-        # Convert the image to grayscale
-        gray = cv2.cvtColor(contrasted, cv2.COLOR_BGR2GRAY)
+    def __detect_level(self, input_img, scale):
+        """
+        Detect and score the number plate candidates from one level of the cascade.
 
-        # Canny edges
-        edges = cv2.Canny(gray, 100, 200)
+        :param input_img: cv2 image of the level, normalised to the reference width times the scale
+        :param scale: the scale of the level, the absolute size thresholds are multiplied by it
+        :return: the best scored PlateCandidate list with the level coordinates, at most top_k long
+        """
+        # BLUR, increase CONTRAST and get the Canny edges of the image
+        if self.__fast_preprocessing:
+            edges = luminance_edges(input_img)
+        else:
+            edges = reference_edges(input_img)
 
         # Find Contours
         contours, hierarchy = cv2.findContours(edges, cv2.RETR_CCOMP, cv2.CHAIN_APPROX_NONE)
 
         img_height = input_img.shape[0]
         img_width = input_img.shape[1]
+        min_long_side = 50 * scale
+        min_short_side = 10 * scale
 
         number_rectangles = []
+        number_boxes = []
         for i in range(len(contours)):
             rect = cv2.minAreaRect(contours[i])
             (x, y), (width, height), angle = rect
 
             box = cv2.boxPoints(rect)
-            box = np.int0(box)
+            box = np.intp(box)
 
             width = float(width)
             height = float(height)
@@ -163,21 +213,62 @@ class NumberPlateDetection:
                 rightRatio = (3.0 < width / height < 5.0) or (3.0 < height / width < 5.0)
 
             if ((80 <= abs(angle) <= 100) or (abs(angle) <= 10)) and rightRatio \
-                    and max(width, height) > 50 and min(width, height) > 10 \
+                    and max(width, height) > min_long_side and min(width, height) > min_short_side \
                     and img_height / height > 5 and img_width / width > 3:
                 topLeft, bottomRight = find_margin_corners(x, y, box)
-                number_rectangles.append((topLeft, bottomRight))
+                if topLeft is not None and bottomRight is not None:
+                    number_rectangles.append((topLeft, bottomRight))
+                    number_boxes.append(box)
 
         # If there are intersecting rectangles, replace them with the minimum containing rectangle
-        filteredRectangles = findRectangleIntersections(number_rectangles)
-        # From the rectangles, only keep the ones that have a horizontal orientation
-        filteredRectangles = filterHorizontalRectangles(filteredRectangles)
+        candidates = []
+        for (rectangle, members) in findRectangleGroups(number_rectangles):
+            # From the rectangles, only keep the ones that have a horizontal orientation
+            if not isHorizontalRectangle(rectangle):
+                continue
+            (left, top), (right, bottom) = rectangle = clipRectangle(rectangle, input_img.shape)
+            candidates.append(PlateCandidate(rectangle, input_img[top:bottom, left:right],
+                                             [number_boxes[i] for i in members]))
+
+        return self.__scorer.select(candidates, edges, input_img.shape, self.__top_k, self.__min_score)
+
+    def get_last_timings(self):
+        """
+        Get the timings of the cascade levels run by the last detection.
+
+        :return: list of dicts with the level scale, (width, height) size, candidates count and seconds spent
+        """
+        return list(self.__last_timings)
+
+    def plate_image(self, input_img, rectangle, box_points):
+        """
+        Cut a number plate location out of an image, rectified when the detection rectifies its locations.
+        The image can be the whole frame the vehicle was found in, with the location within the frame.
+
+        :param input_img: cv2 image holding the location
+        :param rectangle: the location (topLeft(x,y), bottomRight(x,y)) within the image
+        :param box_points: the rotated corner points of the contours making up the location, within the image
+        :return: the cv2 image of the location
+        """
+        if self.__rectify:
+            return rectify_plate(input_img, box_points, self.__plate_size)
+        (left, top), (right, bottom) = rectangle
+        return input_img[top:bottom, left:right]
+
+    def get_top_k(self):
+        return self.__top_k
 
-        print('{0:d} potential number locations found'.format(len(filteredRectangles)))
+    def set_top_k(self, top_k):
+        """
+        :param top_k: the maximum number of plate locations returned per vehicle, None to return all of them
+        """
+        self.__top_k = top_k
 
-        number_images = []
-        for (top_left, bottom_right) in filteredRectangles:
-            number_img = input_img[top_left[1]:bottom_right[1], top_left[0]:bottom_right[0]]
-            number_images.append(number_img)
+    def detect_number_plate_locations(self, input_img):
+        """
+        Detect the number plate locations from the input image.
 
-        return number_images
+        :param input_img: cv2 read input image
+        :return:  all the locations cropped as cv2 images from the input image, best scored first
+        """
+        return [candidate.image for candidate in self.detect_number_plate_candidates(input_img)]
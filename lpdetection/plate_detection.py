@@ -1,6 +1,8 @@
 import cv2
 import numpy as np
 
+from lpdetection.rectangle_merge import findRectangleIntersections
+
 
 def increase_contrast(bgr_img):
     # Convert image to LAB color space
@@ -35,66 +37,6 @@ def find_margin_corners(x, y, box_points):
     return topLeft, bottomRight
 
 
-def areOverlapping(rect1, rect2):
-    """
-    Find if the two rectangles are intersecting.
-    Rect: (topLeft(x,y), bottomRight(x,y))
-    """
-    topLeft1 = rect1[0]
-    bottomRight1 = rect1[1]
-
-    topLeft2 = rect2[0]
-    bottomRight2 = rect2[1]
-
-    if topLeft1[0] > bottomRight2[0] or bottomRight1[0] < topLeft2[0]:
-        return False
-    if topLeft1[1] > bottomRight2[1] or bottomRight1[1] < topLeft2[1]:
-        return False
-    return True
-
-
-def findRectangleIntersections(rectangles):
-    """
-    Find the intersection of every rectangles
-
-    :param rectangles: a list containing tuples of points (topLeft, bottomRight)
-    :return: the filtered list of points
-    """
-    result = rectangles.copy()
-    intersected = True
-    i = 0
-    j = 1
-    while intersected:
-        intersected = False
-
-        if len(result) >= 2 and areOverlapping(result[i], result[j]):
-            minRectangle = minimumContainingRect(rectangles[i], rectangles[j])
-            result.append(minRectangle)
-            result.remove(rectangles[i])
-            result.remove(rectangles[j])
-            i = 0
-            j = 1
-            intersected = True
-        else:
-            j += 1
-            if j == len(result):
-                j = 0
-                i += 1
-            if i == len(result) - 1:
-                break
-    return result
-
-
-def minimumContainingRect(rect1, rect2):
-    """
-    Rect: (topLeft(x,y), bottomRight(x,y))
-    :return: the minimum rectangle that contains both of the rectangles.
-    """
-    intTopLeft = (min(rect1[0][0], rect1[0][0]), min(rect2[0][1], rect2[0][1]))
-    intBottomRight = (max(rect1[1][0], rect1[1][0]), max(rect2[1][1], rect2[1][1]))
-    return intTopLeft, intBottomRight
-
-
 def filterHorizontalRectangles(rectangles):
     """
     Filter the horizontal oriented rectangles from the given list.
@@ -140,7 +82,7 @@ img_copy = img.copy()
 for i in range(len(contours)):
     rect = cv2.minAreaRect(contours[i])
     box = cv2.boxPoints(rect)
-    box = np.int0(box)
+    box = np.intp(box)
     cv2.drawContours(img_copy, [box], 0, (0, 0, 255), 1)
 
 ###### Filtered Area Rects by angle ######
@@ -151,7 +93,7 @@ for i in range(len(contours)):
     (x, y), (width, height), angle = rect
 
     box = cv2.boxPoints(rect)
-    box = np.int0(box)
+    box = np.intp(box)
     if 80 <= abs(rect[2]) <= 100:
         #         print (x ,y, width, height, angle)
         cv2.drawContours(img_copy, [box], 0, (0, 0, 255), 1)
@@ -168,7 +110,7 @@ for i in range(len(contours)):
     (x, y), (width, height), angle = rect
 
     box = cv2.boxPoints(rect)
-    box = np.int0(box)
+    box = np.intp(box)
 
     width = float(width)
     height = float(height)
@@ -0,0 +1,108 @@
+import multiprocessing
+import queue
+
+import numpy as np
+
+from lpdetection.number_plate_detection import NumberPlateDetection
+from utils.frame_transport import CropRef
+
+# the seconds between the checks of the worker processes while waiting for their results
+POLL_INTERVAL = 1.0
+
+
+def _plate_location_worker(ring, tasks, results, detector_options):
+    """
+    Detect the number plate locations of the vehicles read from the FrameRing, meant to run within its own process.
+    Every task is answered with the plate CropRefs of its vehicle, or with the exception raised by its detection.
+
+    :param ring: the FrameRing holding the frames of the vehicles
+    :param tasks: the multiprocessing.Queue of (task id, vehicle CropRef, top_k), None to stop
+    :param results: the multiprocessing.Queue of (task id, list of plate CropRefs or exception)
+    :param detector_options: the NumberPlateDetection arguments, the locations are rectified by the caller
+    """
+    detector = NumberPlateDetection(**dict(detector_options, rectify=False))
+    try:
+        for (task, vehicle_ref, top_k) in iter(tasks.get, None):
+            try:
+                detector.set_top_k(top_k)
+                x1, y1 = vehicle_ref.box[:2]
+                plates = []
+                # the vehicle is a view of the shared memory, the plate locations are mapped back onto the frame
+                for candidate in detector.detect_number_plate_candidates(ring.crop(vehicle_ref)):
+                    (left, top), (right, bottom) = candidate.rectangle
+                    points = [np.asarray(box, dtype=np.float32) + (x1, y1) for box in candidate.box_points]
+                    plates.append(CropRef(vehicle_ref.frame, (left + x1, top + y1, right + x1, bottom + y1), points))
+                results.put((task, plates))
+            except Exception as error:
+                results.put((task, error))
+    finally:
+        ring.close()
+
+
+class PlateLocationWorkers:
+    """
+    Processes detecting the number plate locations of the vehicles of the frames shared through a FrameRing.
+    The vehicles are passed to the processes as CropRefs of their frame, and the plate locations come back as
+    CropRefs of the same frame, with their corner points, instead of copying the images through the queues.
+    The frames must be held by the caller until their plate locations are returned.
+    """
+
+    def __init__(self, ring, workers=2, detector_options=None) -> None:
+        """
+        :param ring: the FrameRing holding the frames of the vehicles
+        :param workers: the number of processes
+        :param detector_options: the NumberPlateDetection arguments of the processes
+        """
+        self.__tasks = multiprocessing.Queue()
+        self.__results = multiprocessing.Queue()
+        self.__next_task = 0
+        self.__processes = [multiprocessing.Process(target=_plate_location_worker,
+                                                    args=(ring, self.__tasks, self.__results,
+                                                          dict(detector_options or {})),
+                                                    name='plate-location-{0:d}'.format(index), daemon=True)
+                            for index in range(workers)]
+        for process in self.__processes:
+            process.start()
+
+    def detect(self, vehicle_refs, top_k=None):
+        """
+        Detect the number plate locations of many vehicles, spread over the processes.
+
+        :param vehicle_refs: the CropRefs of the vehicles
+        :param top_k: the maximum number of plate locations returned per vehicle, None to return all of them
+        :return: the list of the plate location CropRefs of every vehicle, in the input order
+        """
+        tasks = list(range(self.__next_task, self.__next_task + len(vehicle_refs)))
+        self.__next_task += len(vehicle_refs)
+        for (task, vehicle_ref) in zip(tasks, vehicle_refs):
+            self.__tasks.put((task, vehicle_ref, top_k))
+
+        plates = {}
+        while len(plates) < len(tasks):
+            try:
+                (task, result) = self.__results.get(timeout=POLL_INTERVAL)
+            except queue.Empty:
+                for process in self.__processes:
+                    if process.exitcode is not None:
+                        raise RuntimeError('the plate location process {0} exited with code {1}'.format(
+                            process.name, process.exitcode))
+                continue
+            # the results of an earlier call which failed are left out
+            if task < tasks[0]:
+                continue
+            if isinstance(result, Exception):
+                raise result
+            plates[task] = result
+        return [plates[task] for task in tasks]
+
+    def shutdown(self, timeout=5.0):
+        """
+        Stop the processes once their queued tasks are done.
+        """
+        for process in self.__processes:
+            self.__tasks.put(None)
+        for process in self.__processes:
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+                process.join()
@@ -0,0 +1,50 @@
+import cv2
+import numpy as np
+
+# (width, height) of the rectified plate images, keeps the 520 x 110 mm romanian plate aspect ratio
+PLATE_SIZE = (208, 44)
+
+
+def order_corners(points):
+    """
+    Order 4 corner points as top left, top right, bottom right, bottom left.
+
+    :param points: the 4 (x, y) corner points in any order
+    :return: float32 array of the ordered points
+    """
+    points = np.asarray(points, dtype=np.float32).reshape(4, 2)
+    sums = points.sum(axis=1)
+    diffs = points[:, 1] - points[:, 0]
+    return np.array([points[np.argmin(sums)],
+                     points[np.argmin(diffs)],
+                     points[np.argmax(sums)],
+                     points[np.argmax(diffs)]], dtype=np.float32)
+
+
+def rectify_plate(input_img, box_points, size=PLATE_SIZE, binarise=True):
+    """
+    Perspective warp the plate to a fixed size, deskewed image.
+
+    :param input_img: the cv2 vehicle image the plate was found in
+    :param box_points: list of the rotated corner points of the contours making up the plate
+    :param size: (width, height) of the resulting image
+    :param binarise: threshold the plate into black characters on a white background
+    :return: the rectified plate image, grayscale
+    """
+    points = np.concatenate([np.asarray(box, dtype=np.float32).reshape(-1, 2) for box in box_points])
+    corners = order_corners(cv2.boxPoints(cv2.minAreaRect(points)))
+
+    (plate_width, plate_height) = size
+    destination = np.array([[0, 0],
+                            [plate_width - 1, 0],
+                            [plate_width - 1, plate_height - 1],
+                            [0, plate_height - 1]], dtype=np.float32)
+    transform = cv2.getPerspectiveTransform(corners, destination)
+
+    # only the small output is computed, so warping before the grayscale conversion is the cheaper order
+    warped = cv2.warpPerspective(input_img, transform, size, flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_REPLICATE)
+    plate = cv2.cvtColor(warped, cv2.COLOR_BGR2GRAY) if warped.ndim == 3 else warped
+
+    if binarise:
+        ret, plate = cv2.threshold(plate, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU)
+    return plate
@@ -0,0 +1,114 @@
+import threading
+
+import cv2
+import numpy as np
+
+# CLAHE objects and scratch buffers are not safe to share between threads, so every thread keeps its own.
+_thread_state = threading.local()
+
+
+def get_clahe():
+    """
+    Get the CLAHE instance of the current thread, creating it on first use.
+
+    :return: the cached cv2 CLAHE object
+    """
+    clahe = getattr(_thread_state, 'clahe', None)
+    if clahe is None:
+        clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
+        _thread_state.clahe = clahe
+    return clahe
+
+
+def _scratch_buffer(name, shape):
+    """
+    Get a uint8 buffer of the given shape for the current thread.
+    The memory is grow-only and reused between calls, so differently sized vehicle crops do not allocate.
+
+    :param name: the name of the buffer
+    :param shape: the (height, width) of the requested buffer
+    :return: a contiguous view of the thread's buffer
+    """
+    buffers = getattr(_thread_state, 'buffers', None)
+    if buffers is None:
+        buffers = {}
+        _thread_state.buffers = buffers
+
+    size = shape[0] * shape[1]
+    flat = buffers.get(name)
+    if flat is None or flat.size < size:
+        flat = np.empty(size, dtype=np.uint8)
+        buffers[name] = flat
+    return flat[:size].reshape(shape)
+
+
+def increase_contrast(bgr_img):
+    """
+    Increase the contrast of the input image
+    :param bgr_img: cv2 read image
+    :return: the image with an increased contrast
+    """
+    # Convert image to LAB color space
+    lab_img = cv2.cvtColor(bgr_img, cv2.COLOR_BGR2LAB)
+
+    # Split the 3 channels
+    l, a, b = cv2.split(lab_img)
+
+    # Apply CLAHE to the L-channel
+    cl = get_clahe().apply(l)
+
+    # Merge the CLAHE enhanced L-channel with the other channels
+    l_img = cv2.merge((cl, a, b))
+
+    final = cv2.cvtColor(l_img, cv2.COLOR_LAB2BGR)
+    return final
+
+
+def reference_edges(bgr_img):
+    """
+    Canny edges of the image computed on the full colour path: blur, LAB contrast enhancement, grayscale.
+
+    :param bgr_img: cv2 read image
+    :return: the edges image
+    """
+    blurred = cv2.GaussianBlur(bgr_img, (3, 3), 0)
+    contrasted = increase_contrast(blurred)
+    gray = cv2.cvtColor(contrasted, cv2.COLOR_BGR2GRAY)
+    return cv2.Canny(gray, 100, 200)
+
+
+def luminance_edges(bgr_img):
+    """
+    Canny edges of the image computed on the luminance channel only.
+    The blur and the contrast enhancement run on a single channel and write into per thread scratch buffers,
+    so the returned edges are only valid until the next call from the same thread.
+
+    :param bgr_img: cv2 read image, BGR or already grayscale
+    :return: the edges image
+    """
+    shape = bgr_img.shape[:2]
+
+    if bgr_img.ndim == 3:
+        gray = cv2.cvtColor(bgr_img, cv2.COLOR_BGR2GRAY, dst=_scratch_buffer('gray', shape))
+    else:
+        gray = bgr_img
+
+    blurred = cv2.GaussianBlur(gray, (3, 3), 0, dst=_scratch_buffer('blurred', shape))
+    contrasted = get_clahe().apply(blurred, dst=_scratch_buffer('contrasted', shape))
+    return cv2.Canny(contrasted, 100, 200, edges=_scratch_buffer('edges', shape))
+
+
+def edges_parity(bgr_img):
+    """
+    Compare the luminance edges with the reference edges of the same image.
+
+    :param bgr_img: cv2 read image
+    :return: the Dice coefficient of the two edge maps, 1.0 meaning identical edges
+    """
+    reference = reference_edges(bgr_img) > 0
+    luminance = luminance_edges(bgr_img) > 0
+
+    total = int(reference.sum()) + int(luminance.sum())
+    if total == 0:
+        return 1.0
+    return 2.0 * int(np.logical_and(reference, luminance).sum()) / total
@@ -0,0 +1,116 @@
+def areOverlapping(rect1, rect2):
+    """
+    Find if the two rectangles are intersecting.
+    Rect: (topLeft(x,y), bottomRight(x,y))
+    """
+    topLeft1 = rect1[0]
+    bottomRight1 = rect1[1]
+
+    topLeft2 = rect2[0]
+    bottomRight2 = rect2[1]
+
+    if topLeft1[0] > bottomRight2[0] or bottomRight1[0] < topLeft2[0]:
+        return False
+    if topLeft1[1] > bottomRight2[1] or bottomRight1[1] < topLeft2[1]:
+        return False
+    return True
+
+
+def minimumContainingRect(rect1, rect2):
+    """
+    Rect: (topLeft(x,y), bottomRight(x,y))
+    :return: the minimum rectangle that contains both of the rectangles.
+    """
+    intTopLeft = (min(rect1[0][0], rect2[0][0]), min(rect1[0][1], rect2[0][1]))
+    intBottomRight = (max(rect1[1][0], rect2[1][0]), max(rect1[1][1], rect2[1][1]))
+    return intTopLeft, intBottomRight
+
+
+class _UnionFind:
+    """
+    Disjoint set forest with path halving and union by size.
+    """
+
+    def __init__(self, size) -> None:
+        self.parent = list(range(size))
+        self.size = [1] * size
+
+    def find(self, i):
+        parent = self.parent
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    def union(self, i, j):
+        root_i = self.find(i)
+        root_j = self.find(j)
+        if root_i == root_j:
+            return False
+        if self.size[root_i] < self.size[root_j]:
+            root_i, root_j = root_j, root_i
+        self.parent[root_j] = root_i
+        self.size[root_i] += self.size[root_j]
+        return True
+
+
+def _overlappingPairs(rectangles):
+    """
+    Sort and sweep along the x axis, yielding the index pairs of the overlapping rectangles.
+
+    :param rectangles: a list containing tuples of points (topLeft, bottomRight)
+    """
+    order = sorted(range(len(rectangles)), key=lambda k: rectangles[k][0][0])
+    active = []
+    for i in order:
+        (left, top), (right, bottom) = rectangles[i]
+        # drop the rectangles that end before the current one starts, they can not overlap anything further
+        active = [j for j in active if rectangles[j][1][0] >= left]
+        for j in active:
+            if rectangles[j][0][1] <= bottom and rectangles[j][1][1] >= top:
+                yield j, i
+        active.append(i)
+
+
+def findRectangleGroups(rectangles):
+    """
+    Group the overlapping rectangles together.
+    A merged group is checked again against the others, as its containing rectangle can overlap
+    rectangles that none of its members did.
+
+    :param rectangles: a list containing tuples of points (topLeft, bottomRight)
+    :return: a list of tuples (containing rectangle, indices of the input rectangles in the group)
+    """
+    groups = [(rect, [i]) for (i, rect) in enumerate(rectangles)]
+
+    merged = True
+    while merged and len(groups) >= 2:
+        containing = [rect for (rect, members) in groups]
+        union_find = _UnionFind(len(groups))
+        merged = False
+        for (i, j) in _overlappingPairs(containing):
+            merged |= union_find.union(i, j)
+        if not merged:
+            break
+
+        roots = {}
+        for (i, (rect, members)) in enumerate(groups):
+            root = union_find.find(i)
+            if root in roots:
+                group_rect, group_members = roots[root]
+                roots[root] = (minimumContainingRect(group_rect, rect), group_members + members)
+            else:
+                roots[root] = (rect, members)
+        groups = list(roots.values())
+
+    return groups
+
+
+def findRectangleIntersections(rectangles):
+    """
+    Replace every group of intersecting rectangles with their minimum containing rectangle.
+
+    :param rectangles: a list containing tuples of points (topLeft, bottomRight)
+    :return: the filtered list of points
+    """
+    return [rect for (rect, members) in findRectangleGroups(rectangles)]
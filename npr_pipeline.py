@@ -0,0 +1,454 @@
+import multiprocessing
+import time
+
+import cv2
+
+from collections import defaultdict
+
+from lpdetection import number_plate_detection, plate_location_workers
+from ocr import backends, router
+from textdetection import text_recognition
+from utils import frame_transport, instrumentation, margin_dates, ocr_cache, plate_consensus, plate_correction, \
+    profiling, text_filter, video
+from visionapi import batch_vision, concurrent_vision, encoding, mosaic, replay, vision
+from yolov3 import car_detection
+
+NO_DATE = "NO_DATE"
+OCR_CACHE_PATH = "ocr_cache"
+# Only the best scored number plate locations of every vehicle are sent to OCR
+PLATE_CANDIDATES_PER_VEHICLE = 3
+# Vehicle images are resized to this width and searched at half resolution first
+PLATE_SEARCH_WIDTH = 420
+PLATE_SEARCH_SCALES = (0.5, 1.0)
+# Local OCR results less confident than this are escalated to Vision
+LOCAL_OCR_MIN_CONFIDENCE = 0.6
+OCR_TARGET_TEXT_HEIGHT = 40
+OCR_JPEG_QUALITY = 85
+# Readings of the same plate needed to emit it and stop its OCR
+PLATE_CONSENSUS_READINGS = 3
+# Frames decoded ahead by the decoding process, waiting in shared memory
+DECODE_RING_SLOTS = 8
+# The frames decoded ahead above which the pipeline falls behind the decoding, the backlog can never reach
+# the ring size, the decoder waits for a free slot
+DECODE_BACKLOG_LIMIT = DECODE_RING_SLOTS // 2
+# Processes detecting the plate locations of the vehicles of the frames in shared memory
+PLATE_LOCATION_WORKERS = 2
+
+
+def write_result(result_map, path="result.txt"):
+    """
+    Write the result map into a txt file, one "date - number" reading per line
+
+    :param result_map: the detection result map Map <Date, List<Number>>
+    :param path: the txt file path
+    """
+    file = open(path, "w")
+    for date in result_map.keys():
+        for number in result_map[date]:
+            file.write(str(date) + " - " + number + "\n")
+    file.close()
+
+
+def add_result(result_map, consolidated):
+    """
+    Add the voted number plate into the result map, under the date of its latest reading.
+
+    :param result_map: the detection result map Map <Date, List<Number>>
+    :param consolidated: the ConsolidatedPlate
+    """
+    map_key = consolidated.payload
+    if consolidated.plate not in result_map[map_key]:
+        result_map[map_key].append(consolidated.plate)
+    print("\t" + str(map_key) + " - " + consolidated.plate + " ({0:d} readings, confidence {1:.2f})".format(
+        consolidated.readings, consolidated.confidence))
+
+
+class NprPipeline:
+    """
+    The number plate recognition pipeline: EAST text recognition of the frame, YOLO vehicle detection,
+    number plate location detection, OCR of the plates and of the frame margins for the date.
+    The models are loaded once, so one pipeline processes any number of images and videos.
+    """
+
+    def __init__(self, metrics=None, profiler=None, vision_client=None, ocr_cache_path=OCR_CACHE_PATH,
+                 load_controller=None, verbose=False) -> None:
+        """
+        :param metrics: optional Instrumentation timing the stages, disabled if None
+        :param profiler: optional FrameProfiler of a window of the processed frames
+        :param vision_client: optional Vision API client, e.g. the local StubVisionClient
+        :param ocr_cache_path: the path the OCR results are kept in between the runs, None to keep them in memory
+        :param load_controller: optional LoadController lowering the quality while the pipeline falls behind
+        :param verbose: print the progress of every frame, otherwise it is only counted by the metrics
+        """
+        self.metrics = metrics if metrics is not None else instrumentation.NullInstrumentation()
+        self.profiler = profiler
+        if profiler is not None:
+            # The stage spans of the profiled frames are broken down into wall, CPU and blocked time
+            self.metrics = profiling.ProfiledInstrumentation(self.metrics, profiler)
+        self.frames_processed = 0
+        self.verbose = verbose
+        # the frames waiting to be processed, given by the caller feeding the pipeline
+        self.queue_depth = lambda: 0
+        self.quality = None
+        # the frames sampled from every second of the videos, shared with the decoding process
+        self.frames_per_second = multiprocessing.Value('i', video.FRAMES_PER_SECOND, lock=False)
+
+        # OCR results of the crops already seen, kept between the runs. The crops are matched by their exact content
+        # only, two plates a character apart have near identical perceptual hashes
+        self.ocrCache = ocr_cache.OcrResultCache(max_entries=4096, path=ocr_cache_path)
+
+        # Detectors
+        self.eastDetector = text_recognition.EastTextDetector(ocr_cache=self.ocrCache)
+        self.yoloDetector = car_detection.YoloDetector()
+        # the plate location processes of the videos decoded into shared memory use the same options
+        self.plateDetectionOptions = {"top_k": PLATE_CANDIDATES_PER_VEHICLE, "rectify": True,
+                                      "reference_width": PLATE_SEARCH_WIDTH, "cascade_scales": PLATE_SEARCH_SCALES}
+        self.nplDetector = number_plate_detection.NumberPlateDetection(**self.plateDetectionOptions)
+        # The images are uploaded as grayscale JPEGs, downscaled to the text height OCR needs
+        self.ocrEncodingPolicy = encoding.EncodingPolicy(grayscale=True, target_text_height=OCR_TARGET_TEXT_HEIGHT,
+                                                         quality=OCR_JPEG_QUALITY)
+        plateVision = vision.Vision(client=vision_client, encoding_policy=self.ocrEncodingPolicy)
+        self.visionDetector = concurrent_vision.ConcurrentVision(plateVision)
+        # The stitched margins hold 4 rows of small text, their height says nothing of the text height,
+        # so they are uploaded at their full size, on the same client
+        self.marginEncodingPolicy = encoding.EncodingPolicy(grayscale=True, quality=OCR_JPEG_QUALITY)
+        self.marginVisionDetector = concurrent_vision.ConcurrentVision(
+            vision.Vision(client=plateVision.client, encoding_policy=self.marginEncodingPolicy), max_concurrency=1)
+        # The crops are packed into mosaic images, many crops per Vision API request
+        mosaicVisionDetector = mosaic.MosaicVision(self.visionDetector)
+        cachedVisionDetector = ocr_cache.CachedOcr(mosaicVisionDetector, self.ocrCache)
+        # The OCR confusions of the plates not matching the grammar are corrected instead of dropping them
+        self.nprTextsFilter = text_filter.NprTextsFilter(corrector=plate_correction.PlateCorrector())
+
+        # The local Tesseract OCR is tried first, Vision only gets the crops without a confident valid text
+        localOcrBackend = backends.TesseractBackend()
+        visionOcrBackend = backends.VisionBackend(cachedVisionDetector)
+        self.plateOcrRouter = router.OcrRouter([localOcrBackend, visionOcrBackend], self.nprTextsFilter,
+                                               min_confidence=LOCAL_OCR_MIN_CONFIDENCE,
+                                               validate=router.VALIDATE_PLATES)
+        # The stitched margins are read with the geometry of the words, mapping every date back to its margin
+        dateVisionBackend = backends.VisionBackend(self.marginVisionDetector)
+        self.dateOcrRouter = router.OcrRouter([localOcrBackend, dateVisionBackend], self.nprTextsFilter,
+                                              min_confidence=LOCAL_OCR_MIN_CONFIDENCE,
+                                              validate=router.VALIDATE_DATES)
+        self.batchPlateOcr = batch_vision.BatchVision(self.plateOcrRouter)
+        # The 4 margins of the frame are stitched together into a single date OCR request
+        self.marginDateExtractor = margin_dates.MarginDateExtractor(self.dateOcrRouter, self.nprTextsFilter)
+
+        self.metrics.register_histogram("vision_request", self.visionDetector.latency)
+        self.metrics.register_gauge("ocr_cache_hit_rate", lambda: self.ocrCache.stats()['hit_rate'])
+        # the replayed uploads missing from the recording are answered with no text, they are counted
+        self.replayClient = plateVision.client if isinstance(plateVision.client, replay.ReplayVisionClient) else None
+        if self.replayClient is not None:
+            self.metrics.register_gauge("vision_replay_misses", lambda: self.replayClient.misses)
+
+        self.load_controller = load_controller
+        if load_controller is not None:
+            load_controller.on_change = self.apply_quality
+            self.apply_quality(load_controller.level)
+            self.metrics.register_gauge("quality_level", lambda: load_controller.index)
+
+    def apply_quality(self, level):
+        """
+        Switch the pipeline settings to a quality level.
+
+        :param level: the QualityLevel
+        """
+        self.quality = level
+        self.yoloDetector.set_input_size(level.yolo_input_size)
+        self.nplDetector.set_top_k(level.plate_top_k)
+        self.frames_per_second.value = level.frames_per_second
+
+    def process_frame(self, frame, frame_index=None, consensus=None):
+        """
+        Recognise the date and the number plates of a single frame.
+
+        :param frame: input cv2 image
+        :param frame_index: the index of the frame within its video, needed with the consensus
+        :param consensus: optional PlateConsensus, the vehicles whose plate it already agreed upon are skipped
+        :return: tuple (date or None, list of (number plate, (x, y) center of its vehicle, (x1, y1, x2, y2) box of its
+            vehicle))
+        """
+        return self.process_frames([frame], [frame_index], consensus)[0]
+
+    def __detect_plate_locations(self, frame, vehicles, frame_ref=None, plate_workers=None):
+        """
+        :param frame: the cv2 frame of the vehicles
+        :param vehicles: list of (vehicle image, (x, y) center, (x1, y1, x2, y2) box within the frame)
+        :param frame_ref: optional FrameRef of the frame within the ring of the plate_workers
+        :param plate_workers: optional PlateLocationWorkers, reading the vehicles from the shared memory
+        :return: the list of the number plate location images of every vehicle
+        """
+        if plate_workers is None or frame_ref is None:
+            plates = []
+            for (vehicle, vehicle_position, vehicle_box) in vehicles:
+                with self.metrics.span("detect_number_plate_locations"):
+                    plates.append(self.nplDetector.detect_number_plate_locations(vehicle))
+            return plates
+
+        # the vehicles of the frame are searched in parallel, only their CropRefs are passed to the processes
+        with self.metrics.span("detect_number_plate_locations_workers"):
+            vehicles_plates = plate_workers.detect([frame_transport.CropRef(frame_ref, vehicle_box)
+                                                    for (vehicle, vehicle_position, vehicle_box) in vehicles],
+                                                   self.nplDetector.get_top_k())
+        return [[self.nplDetector.plate_image(frame, (plate.box[:2], plate.box[2:]), plate.points)
+                 for plate in plates] for plates in vehicles_plates]
+
+    def process_frames(self, frames, frame_indexes=None, consensus=None, cached_date=None, frame_refs=None,
+                       plate_workers=None):
+        """
+        Recognise the dates and the number plates of many frames together.
+        The text and vehicle detections run once for all the frames, and the number plate locations
+        of all their vehicles are sent to OCR together. The frames processed together are profiled as one.
+
+        :param frames: input cv2 images
+        :param frame_indexes: the indexes of the frames within their video, needed with the consensus
+        :param consensus: optional PlateConsensus, the vehicles whose plate it already agreed upon are skipped
+        :param cached_date: the date already recognised in the previous frames of the same video, reused instead
+            of the EAST date recognition when the quality level allows it
+        :param frame_refs: optional FrameRefs of the frames within the ring of the plate_workers
+        :param plate_workers: optional PlateLocationWorkers detecting the plate locations in other processes
+        :return: list of (date or None, list of (number plate, (x, y) center of its vehicle, (x1, y1, x2, y2) box of
+            its vehicle)), one for every frame
+        """
+        if not frames:
+            return []
+        start = time.monotonic()
+        metrics = self.metrics
+        metrics.count("frames", len(frames))
+        if frame_indexes is None:
+            frame_indexes = [None] * len(frames)
+        if frame_refs is None:
+            frame_refs = [None] * len(frames)
+        # the profiled frames are numbered from 1, the frames of a batch are profiled as its first frame
+        first_frame = self.frames_processed + 1
+        self.frames_processed += len(frames)
+        if self.profiler is not None:
+            self.profiler.start_frame(first_frame)
+
+        # Initial text recognition using east text detection and recognition
+        if cached_date is not None and self.quality is not None and self.quality.reuse_cached_date:
+            east_results = [(cached_date, [])] * len(frames)
+        else:
+            with metrics.span("extract_numbers_first_date"):
+                east_results = self.eastDetector.extract_numbers_first_date_batch(frames)
+
+        # Car detection from within every frame
+        with metrics.span("detect_cars"):
+            frames_vehicles = self.yoloDetector.detect_cars_with_boxes_batch(frames) if len(frames) > 1 \
+                else [self.yoloDetector.detect_cars_with_boxes(frames[0])]
+
+        # Number Plate Location Detection for every detected vehicle
+        # The number plate locations of all the vehicles are sent to OCR together
+        frames_tickets = []
+        for (frame, frame_index, frame_ref, detected_vehicles) in zip(frames, frame_indexes, frame_refs,
+                                                                      frames_vehicles):
+            metrics.count("vehicles", len(detected_vehicles))
+            if self.verbose:
+                print("cars detected:" + str(len(detected_vehicles)))
+            vehicles = []
+            for (vehicle, vehicle_box) in detected_vehicles:
+                (x1, y1, x2, y2) = vehicle_box
+                vehicle_position = ((x1 + x2) / 2.0, (y1 + y2) / 2.0)
+                # The vehicles whose plate is already agreed upon need no more OCR
+                if consensus is not None and consensus.is_settled(frame_index, vehicle_position, vehicle_box):
+                    metrics.count("settled_vehicles")
+                    continue
+                vehicles.append((vehicle, vehicle_position, vehicle_box))
+            plate_tickets = []
+            vehicles_plates = self.__detect_plate_locations(frame, vehicles, frame_ref, plate_workers)
+            for ((vehicle, vehicle_position, vehicle_box), nr_plates) in zip(vehicles, vehicles_plates):
+                metrics.count("plate_candidates", len(nr_plates))
+                for nr_plate in nr_plates:
+                    plate_tickets.append((self.batchPlateOcr.submit(nr_plate), vehicle_position, vehicle_box))
+            metrics.count("ocr_crops", len(plate_tickets))
+            frames_tickets.append(plate_tickets)
+        with metrics.span("detect_texts"):
+            self.batchPlateOcr.flush()
+
+        results = []
+        for (frame, (east_date, east_numbers), plate_tickets) in zip(frames, east_results, frames_tickets):
+            if east_date is not None:
+                metrics.count("east_dates")
+                if self.verbose:
+                    print("Date recognised using the EAST text detection.")
+
+            detected_numbers = []
+            with metrics.span("filter_texts"):
+                for (ticket, vehicle_position, vehicle_box) in plate_tickets:
+                    # collect the filtered romanian number plates from all detected text of the number plate location
+                    ignore, romanian_plates = self.nprTextsFilter.filterDatesAndPlates(ticket.texts)
+                    detected_numbers.extend((number, vehicle_position, vehicle_box) for number in romanian_plates)
+
+            # If we do not receive a date then we try to detect it from the 4 corners of the frame with Vision
+            date = east_date
+            if east_date is None and len(detected_numbers) > 0:
+                with metrics.span("extract_margin_date"):
+                    date = self.marginDateExtractor.extract(frame)
+            results.append((date, detected_numbers))
+
+        if self.profiler is not None:
+            self.profiler.end_frame()
+        if self.load_controller is not None:
+            self.load_controller.observe((time.monotonic() - start) / len(frames), self.queue_depth())
+        return results
+
+    def process_image(self, input_image):
+        """
+        Recognise the date and the number plates of an image.
+
+        :param input_image: input cv2 image
+        :return: the detection result map Map <Date, List<Number>>
+        """
+        return self.process_images([input_image])[0]
+
+    def process_images(self, input_images):
+        """
+        Recognise the dates and the number plates of many images, processed together.
+
+        :param input_images: input cv2 images
+        :return: the list of detection result maps Map <Date, List<Number>>, one for every image
+        """
+        results = []
+        for (date, detected_numbers) in self.process_frames(input_images):
+            # add the detected number plates into a Map <Date, List<Number>>
+            result = defaultdict(list)
+            map_key = date if date is not None else NO_DATE
+            for (number, vehicle_position, vehicle_box) in detected_numbers:
+                if number not in result[map_key]:
+                    result[map_key].append(number)
+            results.append(result)
+        return results
+
+    def process_video(self, path, decode_process=False):
+        """
+        Recognise the dates and the number plates of a video, from two consecutive frames of every second.
+        The readings of the same plate across the frames are voted into a single plate.
+
+        :param path: the video file path
+        :param decode_process: decode the video within a separate process, ahead of the recognition,
+            the frames are passed through shared memory, and the plate locations of their vehicles are detected
+            in PLATE_LOCATION_WORKERS processes reading the vehicles from the same memory
+        :return: the detection result map Map <Date, List<Number>>
+        """
+        cap = cv2.VideoCapture(path)
+        if not cap.isOpened():
+            raise IOError("Error opening the video file " + path + ". Please double check your file path for typos.")
+
+        FPS = int(cap.get(cv2.CAP_PROP_FPS))
+        frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        frame_height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        frame_width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        print(str(FPS) + " frames per second.")
+        print(str(frame_count) + " frames read from the file.")
+        print(str(frame_height) + " frames height.")
+        print(str(frame_width) + " frames width.")
+
+        # Readings of the same plate in nearby frames, two frames are collected per second
+        consensus = plate_consensus.PlateConsensus(min_readings=PLATE_CONSENSUS_READINGS, max_frame_gap=4)
+        result = defaultdict(list)
+        last_date = [None]
+
+        def process(frame_index, frame, frame_ref=None, plate_workers=None):
+            if self.verbose:
+                print('\nFrame {0:d}'.format(frame_index))
+            date, detected_numbers = self.process_frames([frame], [frame_index], consensus, last_date[0],
+                                                         [frame_ref], plate_workers)[0]
+            if date is not None:
+                last_date[0] = date
+
+            # vote the readings of the same number plate across the frames
+            map_key = date if date is not None else NO_DATE
+            for (number, vehicle_position, vehicle_box) in detected_numbers:
+                consolidated = consensus.add(frame_index, number, vehicle_position, map_key, vehicle_box)
+                if consolidated is not None:
+                    self.metrics.count("plates")
+                    add_result(result, consolidated)
+
+        if decode_process:
+            cap.release()
+            ring = frame_transport.FrameRing(DECODE_RING_SLOTS, (frame_height, frame_width, 3))
+            frames_queue = multiprocessing.Queue()
+            decoder = multiprocessing.Process(target=video.decode_into_ring,
+                                              args=(path, ring, frames_queue, self.frames_per_second),
+                                              name="video-decoder", daemon=True)
+            decoder.start()
+            plate_workers = plate_location_workers.PlateLocationWorkers(ring, PLATE_LOCATION_WORKERS,
+                                                                        self.plateDetectionOptions)
+            # the frames decoded ahead are the backlog, the queue depth of the caller and its limit are restored
+            # afterwards
+            queue_depth = self.queue_depth
+            self.queue_depth = frames_queue.qsize
+            if self.load_controller is not None:
+                max_queue_depth = self.load_controller.max_queue_depth
+                self.load_controller.max_queue_depth = DECODE_BACKLOG_LIMIT
+            try:
+                for ref in iter(frames_queue.get, None):
+                    try:
+                        # the frame is held until the plate locations of its vehicles are read out of it
+                        process(ref.index, ring.view(ref), ref, plate_workers)
+                    finally:
+                        ring.release(ref)
+            finally:
+                self.queue_depth = queue_depth
+                if self.load_controller is not None:
+                    self.load_controller.max_queue_depth = max_queue_depth
+                plate_workers.shutdown()
+                decoder.terminate()
+                decoder.join()
+                ring.close()
+        else:
+            # the frames of a file wait for the pipeline, not the other way round, it has no backlog of its own
+            try:
+                # the frames are decoded while they are processed, not kept in memory
+                sampled_frames = video.sample_frames(cap, FPS, lambda: self.frames_per_second.value)
+                for (frame_index, frame) in enumerate(sampled_frames, 1):
+                    process(frame_index, frame)
+            finally:
+                cap.release()
+
+        # the plates never emitted during the video, kept only with the evidence needed for emitting them
+        for consolidated in consensus.flush():
+            self.metrics.count("plates")
+            add_result(result, consolidated)
+        return result
+
+    def stats(self):
+        """
+        :return: dict of the OCR statistics
+        """
+        return {
+            "vision_api_calls": self.visionDetector.stats(),
+            "vision_api_uploads": self.ocrEncodingPolicy.stats(),
+            "margin_vision_api_calls": self.marginVisionDetector.stats(),
+            "margin_vision_api_uploads": self.marginEncodingPolicy.stats(),
+            "ocr_cache": self.ocrCache.stats(),
+            "plate_ocr_backends": self.plateOcrRouter.stats(),
+            "date_ocr_backends": self.dateOcrRouter.stats(),
+            "quality": self.load_controller.stats() if self.load_controller is not None else None,
+            "vision_replay": self.replayClient.stats() if self.replayClient is not None else None,
+        }
+
+    def print_stats(self):
+        print("Vision API calls: " + str(self.visionDetector.stats()))
+        print("Vision API uploads: " + str(self.ocrEncodingPolicy.stats()))
+        print("Margin Vision API calls: " + str(self.marginVisionDetector.stats()))
+        print("Margin Vision API uploads: " + str(self.marginEncodingPolicy.stats()))
+        print("OCR cache: " + str(self.ocrCache.stats()))
+        print("Plate OCR backends: " + str(self.plateOcrRouter.stats()))
+        print("Date OCR backends: " + str(self.dateOcrRouter.stats()))
+        if self.load_controller is not None:
+            print("Quality: " + str(self.load_controller.stats()))
+        if self.replayClient is not None:
+            print("Vision replay: " + str(self.replayClient.stats()))
+
+    def close(self):
+        """
+        Stop the OCR workers and persist the OCR cache.
+        """
+        self.visionDetector.shutdown()
+        self.marginVisionDetector.shutdown()
+        self.marginDateExtractor.shutdown()
+        self.ocrCache.close()
+        if self.profiler is not None:
+            self.profiler.finish()
@@ -0,0 +1,198 @@
+"""
+Local HTTP service keeping the number plate recognition models loaded between the requests.
+
+POST /image   the encoded image as the request body, or {"path": "..."} JSON of an image file
+POST /video   {"path": "..."} JSON of a video file
+GET  /health  liveness check
+GET  /metrics the stage metrics in the Prometheus text format
+
+The responses are JSON: {"result": {date: [number plates]}, "seconds": processing time}
+The images posted by concurrent callers are processed in micro batches, with one text and vehicle detection pass.
+"""
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import cv2
+import numpy as np
+
+from utils import runtime_config
+
+# the thread budget of the host applies before TensorFlow and OpenCV start their thread pools
+runtime_config.apply_runtime_config(runtime_config.load_runtime_config())
+
+import npr_pipeline  # noqa: E402
+from utils import instrumentation, load_control, micro_batching
+from visionapi import replay
+
+DEFAULT_PORT = 8080
+# the largest accepted request body, a full HD PNG is a few MB
+MAX_BODY_BYTES = 32 * 1024 * 1024
+# the images gathered into a single pipeline pass, and the seconds the first of them waits for the others
+MAX_BATCH_SIZE = 8
+MAX_BATCH_LATENCY = 0.05
+
+
+class ServiceError(Exception):
+    def __init__(self, status, message) -> None:
+        super().__init__(message)
+        self.status = status
+
+
+class NprService:
+    """
+    Serves a single warm NprPipeline. The models are not thread safe, so the jobs run one at a time
+    while the connections are accepted concurrently. The images waiting together are batched into one job.
+    """
+
+    def __init__(self, pipeline, host="127.0.0.1", port=DEFAULT_PORT, max_batch_size=MAX_BATCH_SIZE,
+                 max_batch_latency=MAX_BATCH_LATENCY) -> None:
+        """
+        :param pipeline: the NprPipeline, with its models loaded
+        :param host: the listening address
+        :param port: the HTTP port, 0 for any free port
+        :param max_batch_size: the largest batch of images processed together
+        :param max_batch_latency: the seconds the first image of a batch waits for the others
+        """
+        self.pipeline = pipeline
+        self.__jobs_lock = threading.Lock()
+        self.imageBatcher = micro_batching.MicroBatcher(self.__process_images, max_batch_size, max_batch_latency,
+                                                        name="image-batcher")
+        self.imageBatcher.register_metrics(pipeline.metrics, "image_batch")
+        # the quality adapts to the images waiting for the next batches
+        pipeline.queue_depth = self.imageBatcher.queue_depth
+        service = self
+
+        class NprRequestHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == "/health":
+                    self.send_json(200, {"status": "ok"})
+                elif self.path == "/metrics":
+                    body = service.pipeline.metrics.prometheus_text().encode("utf-8")
+                    self.send_response(200)
+                    self.send_header("Content-Type", "text/plain; version=0.0.4")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                else:
+                    self.send_json(404, {"error": "unknown path " + self.path})
+
+            def do_POST(self):
+                try:
+                    try:
+                        length = int(self.headers.get("Content-Length", 0))
+                    except ValueError:
+                        raise ServiceError(400, "invalid Content-Length " + self.headers.get("Content-Length"))
+                    if length < 0:
+                        raise ServiceError(400, "invalid Content-Length {0:d}".format(length))
+                    if length > MAX_BODY_BYTES:
+                        raise ServiceError(413, "request body larger than {0:d} bytes".format(MAX_BODY_BYTES))
+                    body = self.rfile.read(length)
+                    if self.path == "/image":
+                        response = service.process_image(body, self.headers.get("Content-Type", ""))
+                    elif self.path == "/video":
+                        response = service.process_video(body)
+                    else:
+                        raise ServiceError(404, "unknown path " + self.path)
+                    self.send_json(200, response)
+                except ServiceError as error:
+                    self.send_json(error.status, {"error": str(error)})
+                except Exception as error:
+                    self.send_json(500, {"error": repr(error)})
+
+            def send_json(self, status, content):
+                body = json.dumps(content).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self.__server = ThreadingHTTPServer((host, port), NprRequestHandler)
+        self.port = self.__server.server_address[1]
+
+    @staticmethod
+    def __json_path(body):
+        try:
+            return json.loads(body.decode("utf-8"))["path"]
+        except (ValueError, KeyError, TypeError):
+            raise ServiceError(400, 'expected a JSON body with the "path" of the file')
+
+    def __process_images(self, input_images):
+        with self.__jobs_lock:
+            return self.pipeline.process_images(input_images)
+
+    def __run(self, job, *args):
+        start = time.time()
+        with self.__jobs_lock:
+            result = job(*args)
+        return {"result": result, "seconds": time.time() - start}
+
+    def process_image(self, body, content_type=""):
+        """
+        :param body: the encoded image bytes, or the JSON with the image path
+        :param content_type: the request content type
+        :return: the response dict
+        """
+        if content_type.startswith("application/json"):
+            input_image = cv2.imread(self.__json_path(body))
+        else:
+            input_image = cv2.imdecode(np.frombuffer(body, dtype=np.uint8), cv2.IMREAD_COLOR)
+        if input_image is None:
+            raise ServiceError(400, "the image could not be read")
+        start = time.time()
+        result = self.imageBatcher.process(input_image)
+        return {"result": result, "seconds": time.time() - start}
+
+    def process_video(self, body):
+        """
+        :param body: the JSON with the video path
+        :return: the response dict
+        """
+        path = self.__json_path(body)
+        try:
+            return self.__run(self.pipeline.process_video, path)
+        except IOError as error:
+            raise ServiceError(400, str(error))
+
+    def serve_forever(self):
+        print("[INFO] Number plate recognition service listening on port " + str(self.port))
+        self.__server.serve_forever()
+
+    def shutdown(self):
+        self.__server.shutdown()
+        self.__server.server_close()
+        self.imageBatcher.shutdown()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Number plate recognition service.")
+    parser.add_argument("--host", default="127.0.0.1", help="the listening address")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="the HTTP port")
+    parser.add_argument("--no-metrics", action="store_true", help="disable the stage metrics")
+    parser.add_argument("--max-batch-size", type=int, default=MAX_BATCH_SIZE,
+                        help="the largest batch of images processed together")
+    parser.add_argument("--max-batch-latency", type=float, default=MAX_BATCH_LATENCY,
+                        help="the seconds the first image of a batch waits for the others")
+    parser.add_argument("--adaptive", action="store_true",
+                        help="lower the recognition quality while the images queue up")
+    replay.add_replay_arguments(parser)
+    args = parser.parse_args(argv)
+
+    pipeline = npr_pipeline.NprPipeline(metrics=instrumentation.create_instrumentation(not args.no_metrics),
+                                        load_controller=load_control.LoadController() if args.adaptive else None,
+                                        vision_client=replay.create_vision_client(args))
+    service = NprService(pipeline, args.host, args.port, args.max_batch_size, args.max_batch_latency)
+    try:
+        service.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.shutdown()
+        pipeline.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+import time
+
+import cv2
+import pytesseract
+
+from visionapi.vision import VisionResponseError
+
+try:
+    # in process Tesseract, the model stays loaded between the calls
+    import tesserocr
+    from PIL import Image
+except ImportError:
+    tesserocr = None
+
+# single line of text, LSTM engine
+TESSERACT_CONFIG = "-l eng --oem 1 --psm 7"
+# uniform block of several text lines, for the images of stacked text rows
+TESSERACT_BLOCK_CONFIG = "-l eng --oem 1 --psm 6"
+
+
+class OcrResult:
+    """
+    The texts recognised by an OCR backend and the backend confidence in them, between 0 and 1.
+    """
+
+    def __init__(self, texts, confidence, backend) -> None:
+        self.texts = texts
+        self.confidence = confidence
+        self.backend = backend
+
+    def __repr__(self) -> str:
+        return 'OcrResult({0}, confidence={1:.2f}, backend={2})'.format(self.texts, self.confidence, self.backend)
+
+
+class OcrBackend:
+    """
+    Common interface of the OCR engines.
+    """
+    name = None
+    # True for the backends also giving the geometry of the texts, through recognise_annotations
+    annotations = False
+
+    def recognise(self, input_img):
+        """
+        Recognise the texts from a cv2 image.
+
+        :param input_img: cv2 loaded image
+        :return: the OcrResult
+        """
+        raise NotImplementedError()
+
+    def recognise_batch(self, input_imgs):
+        """
+        Recognise the texts from many cv2 images, backends able to batch the requests override it.
+
+        :param input_imgs: list of cv2 loaded images
+        :return: the list of OcrResult, in the input order
+        """
+        return [self.recognise(input_img) for input_img in input_imgs]
+
+    def recognise_annotations(self, input_img):
+        """
+        Recognise the texts from a cv2 image of several text lines, keeping the geometry of every word.
+
+        :param input_img: cv2 loaded image
+        :return: tuple of the OcrResult and the (text, bounding polygon vertices [(x, y)]) list of the texts,
+            the whole text first then the single words, like Vision.detect_text_annotations
+        """
+        raise NotImplementedError()
+
+    def detect_texts(self, input_img):
+        return self.recognise(input_img).texts
+
+
+def _annotations_result(annotations, confidence, backend):
+    return OcrResult([text for (text, vertices) in annotations], confidence, backend)
+
+
+class VisionBackend(OcrBackend):
+    """
+    Google Cloud Vision, through any detector exposing detect_texts (Vision, ConcurrentVision, CachedOcr...).
+    The text annotations carry no confidence, so any detected text is fully trusted.
+    """
+    name = 'vision'
+
+    def __init__(self, vision_detector) -> None:
+        self.vision_detector = vision_detector
+        self.annotations = hasattr(vision_detector, 'detect_text_annotations')
+
+    def recognise(self, input_img):
+        try:
+            texts = self.vision_detector.detect_texts(input_img)
+        except VisionResponseError as error:
+            print(str(error))
+            texts = []
+        return OcrResult(texts, 1.0 if texts else 0.0, self.name)
+
+    def recognise_batch(self, input_imgs):
+        if not hasattr(self.vision_detector, 'detect_texts_batch'):
+            return super().recognise_batch(input_imgs)
+        # the images answered with an error, None, have no text
+        return [OcrResult(texts or [], 1.0 if texts else 0.0, self.name)
+                for texts in self.vision_detector.detect_texts_batch(input_imgs)]
+
+    def recognise_annotations(self, input_img):
+        try:
+            annotations = self.vision_detector.detect_text_annotations(input_img)
+        except VisionResponseError as error:
+            print(str(error))
+            annotations = []
+        return _annotations_result(annotations, 1.0 if annotations else 0.0, self.name), annotations
+
+
+class TesseractBackend(OcrBackend):
+    """
+    Local Tesseract OCR, in process when tesserocr is installed, through the pytesseract subprocess otherwise.
+    """
+    name = 'tesseract'
+    annotations = True
+
+    def __init__(self, config=TESSERACT_CONFIG, block_config=TESSERACT_BLOCK_CONFIG) -> None:
+        """
+        :param config: the Tesseract configuration of the single line images
+        :param block_config: the Tesseract configuration of the multi line images, with their geometry
+        """
+        self.config = config
+        self.block_config = block_config
+        self.__api = tesserocr.PyTessBaseAPI(lang='eng', psm=tesserocr.PSM.SINGLE_LINE) \
+            if tesserocr is not None else None
+
+    def recognise(self, input_img):
+        gray = cv2.cvtColor(input_img, cv2.COLOR_BGR2GRAY) if input_img.ndim == 3 else input_img
+
+        if self.__api is not None:
+            self.__api.SetImage(Image.fromarray(gray))
+            text = self.__api.GetUTF8Text()
+            confidences = self.__api.AllWordConfidences()
+        else:
+            data = pytesseract.image_to_data(gray, config=self.config, output_type=pytesseract.Output.DICT)
+            words = [(word, float(conf)) for (word, conf) in zip(data['text'], data['conf'])
+                     if word.strip() and float(conf) >= 0]
+            text = " ".join(word for (word, conf) in words)
+            confidences = [conf for (word, conf) in words]
+
+        text = text.strip()
+        confidence = sum(confidences) / len(confidences) / 100.0 if confidences else 0.0
+        return OcrResult([text] if text else [], confidence, self.name)
+
+    def recognise_annotations(self, input_img):
+        # the word boxes come from the Tesseract subprocess, tesserocr is kept in its single line mode
+        gray = cv2.cvtColor(input_img, cv2.COLOR_BGR2GRAY) if input_img.ndim == 3 else input_img
+        data = pytesseract.image_to_data(gray, config=self.block_config, output_type=pytesseract.Output.DICT)
+        words = []
+        lines = []
+        confidences = []
+        for (i, word) in enumerate(data['text']):
+            if not word.strip() or float(data['conf'][i]) < 0:
+                continue
+            left, top, width, height = data['left'][i], data['top'][i], data['width'][i], data['height'][i]
+            words.append((word, [(left, top), (left + width, top), (left + width, top + height),
+                                 (left, top + height)]))
+            confidences.append(float(data['conf'][i]))
+            line = (data['block_num'][i], data['par_num'][i], data['line_num'][i])
+            if not lines or lines[-1][0] != line:
+                lines.append((line, []))
+            lines[-1][1].append(word)
+
+        if not words:
+            return OcrResult([], 0.0, self.name), []
+        annotations = [("\n".join(" ".join(line_words) for (line, line_words) in lines), [])] + words
+        return _annotations_result(annotations, sum(confidences) / len(confidences) / 100.0, self.name), annotations
+
+
+class StubBackend(OcrBackend):
+    """
+    Local stand-in OCR engine, answering with the given responder.
+    """
+    name = 'stub'
+
+    def __init__(self, responder, confidence=1.0, latency=0.0, name='stub', annotator=None) -> None:
+        """
+        :param responder: function(cv2 image) -> list of texts
+        :param confidence: the confidence of every answer
+        :param latency: the seconds every call sleeps before answering
+        :param name: the backend name, to tell several stubs apart
+        :param annotator: optional function(cv2 image) -> list of (text, vertices), the whole text first
+        """
+        self.responder = responder
+        self.confidence = confidence
+        self.latency = latency
+        self.name = name
+        self.annotator = annotator
+        self.annotations = annotator is not None
+
+    def recognise(self, input_img):
+        if self.latency:
+            time.sleep(self.latency)
+        return OcrResult(self.responder(input_img), self.confidence, self.name)
+
+    def recognise_annotations(self, input_img):
+        if self.latency:
+            time.sleep(self.latency)
+        annotations = self.annotator(input_img)
+        return _annotations_result(annotations, self.confidence, self.name), annotations
@@ -0,0 +1,131 @@
+import threading
+import time
+
+from utils.metrics import LatencyHistogram
+
+# what a result must contain to be accepted without escalating to the next backend
+VALIDATE_PLATES = 'plates'
+VALIDATE_DATES = 'dates'
+VALIDATE_ANY = 'any'
+
+
+class _BackendStats:
+    def __init__(self) -> None:
+        self.calls = 0
+        self.images = 0
+        self.accepted = 0
+        self.latency = LatencyHistogram()
+
+
+class OcrRouter:
+    """
+    Runs the OCR backends from the cheapest to the most expensive one,
+    only escalating the images whose result fails the NprTextsFilter validation or the confidence threshold.
+    """
+
+    def __init__(self, backends, texts_filter, min_confidence=0.6, validate=VALIDATE_PLATES) -> None:
+        """
+        :param backends: the OcrBackend list, cheapest first
+        :param texts_filter: the NprTextsFilter validating the results
+        :param min_confidence: the results with a lower confidence are escalated
+        :param validate: VALIDATE_PLATES, VALIDATE_DATES or VALIDATE_ANY valid text needed to accept a result
+        """
+        self.backends = list(backends)
+        self.texts_filter = texts_filter
+        self.min_confidence = min_confidence
+        self.validate = validate
+        self.__stats = dict((backend.name, _BackendStats()) for backend in self.backends)
+        self.__lock = threading.Lock()
+
+    def is_accepted(self, result):
+        """
+        :param result: the OcrResult
+        :return: True if the result is confident enough and contains the expected valid texts
+        """
+        if result.confidence < self.min_confidence:
+            return False
+        if self.validate == VALIDATE_PLATES:
+            return len(self.texts_filter.filterNumberPlates(result.texts)) > 0
+        if self.validate == VALIDATE_DATES:
+            return len(self.texts_filter.filterDates(result.texts)) > 0
+        dates, numbers = self.texts_filter.filterDatesAndPlates(result.texts)
+        return len(dates) > 0 or len(numbers) > 0
+
+    def recognise_batch(self, input_imgs):
+        """
+        Recognise the texts from many cv2 images, every backend getting the still unaccepted images in one batch.
+
+        :param input_imgs: list of cv2 loaded images
+        :return: the list of OcrResult, the accepted one or the last backend one, in the input order
+        """
+        results = [None] * len(input_imgs)
+        pending = list(range(len(input_imgs)))
+        for backend in self.backends:
+            if not pending:
+                break
+            start = time.time()
+            backend_results = backend.recognise_batch([input_imgs[i] for i in pending])
+            elapsed = time.time() - start
+
+            still_pending = []
+            accepted = 0
+            for (i, result) in zip(pending, backend_results):
+                results[i] = result
+                if self.is_accepted(result):
+                    accepted += 1
+                else:
+                    still_pending.append(i)
+
+            stats = self.__stats[backend.name]
+            with self.__lock:
+                stats.calls += 1
+                stats.images += len(pending)
+                stats.accepted += accepted
+            stats.latency.observe(elapsed)
+            pending = still_pending
+        return results
+
+    def recognise(self, input_img):
+        return self.recognise_batch([input_img])[0]
+
+    def detect_text_annotations(self, input_img):
+        """
+        Detect the texts from a cv2 image of several text lines with their geometry, from the cheapest backend
+        giving the geometry to the most expensive one, until a result is accepted.
+
+        :param input_img: cv2 loaded image
+        :return: the (text, bounding polygon vertices [(x, y)]) list of the accepted or the last backend,
+            the whole text first then the single words
+        """
+        annotations = []
+        for backend in self.backends:
+            if not backend.annotations:
+                continue
+            start = time.time()
+            result, annotations = backend.recognise_annotations(input_img)
+            elapsed = time.time() - start
+
+            accepted = self.is_accepted(result)
+            stats = self.__stats[backend.name]
+            with self.__lock:
+                stats.calls += 1
+                stats.images += 1
+                stats.accepted += 1 if accepted else 0
+            stats.latency.observe(elapsed)
+            if accepted:
+                break
+        return annotations
+
+    def detect_texts(self, input_img):
+        return self.recognise(input_img).texts
+
+    def detect_texts_batch(self, input_imgs):
+        return [result.texts for result in self.recognise_batch(input_imgs)]
+
+    def stats(self):
+        """
+        :return: dict of backend name -> calls, images, accepted images and latency histogram
+        """
+        return dict((name, {'calls': stats.calls, 'images': stats.images, 'accepted': stats.accepted,
+                            'latency': stats.latency.snapshot()})
+                    for (name, stats) in self.__stats.items())
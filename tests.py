@@ -20,3 +20,27 @@ test_car = cv2.imread("lpdetection/car.jpg")
 yoloDetector = car_detection.YoloDetector()
 detected_cars = yoloDetector.detect_cars(test_frame)
 print(len(detected_cars))
+
+# Integration Test: Plate preprocessing parity (1.0 means identical edges)
+# from lpdetection import preprocessing
+# print(preprocessing.edges_parity(test_car))
+
+# Integration Test: Vision API batching against the local stub client
+# from visionapi import batch_vision, stub
+# stub_client = stub.StubVisionClient(lambda content: ["CJ 16 GXS"])
+# batch_detector = batch_vision.BatchVision(vision.Vision(stub_client))
+# print(batch_detector.detect_texts_many([test_car] * 20), stub_client.calls)
+
+# Integration Test: stitched margin dates through the OCR router, the date of the top left band wins
+# from ocr import backends, router
+# from utils import margin_dates, text_filter
+# from visionapi import mosaic
+# bands = margin_dates.margin_bands(test_frame)
+# stitched, placements = mosaic.pack_mosaic(bands, max_width=1)
+# band_words = [("2019/01/29", 0), ("2018/12/31", 3)]
+# annotations = [("", [])] + [(word, [(x + 1, y + 1), (x + 2, y + 2)]) for (word, band) in band_words
+#                             for (x, y, width, height) in [placements[band]]]
+# stub_backend = backends.StubBackend(lambda image: [], annotator=lambda image: annotations)
+# texts_filter = text_filter.NprTextsFilter()
+# date_router = router.OcrRouter([stub_backend], texts_filter, validate=router.VALIDATE_DATES)
+# print(margin_dates.MarginDateExtractor(date_router, texts_filter).extract(test_frame), "== 2019/01/29")
@@ -0,0 +1,57 @@
+import unittest
+
+import numpy as np
+
+from visionapi.batch_vision import BatchVision
+
+
+class FakeDetector:
+    """
+    Answers every image with its mean pixel value, fails the calls listed in failures.
+    """
+
+    def __init__(self, failures=()) -> None:
+        self.calls = 0
+        self.failures = set(failures)
+
+    def detect_texts_batch(self, input_imgs):
+        self.calls += 1
+        if self.calls in self.failures:
+            raise IOError("call {0:d} failed".format(self.calls))
+        return [[str(int(img.mean()))] if img.mean() > 0 else None for img in input_imgs]
+
+
+def image(value):
+    return np.full((4, 4), value, dtype=np.uint8)
+
+
+class BatchVisionTest(unittest.TestCase):
+
+    def test_batches_and_maps_the_texts_back(self):
+        detector = FakeDetector()
+        batch = BatchVision(detector, batch_size=2)
+        self.assertEqual(batch.detect_texts_many([image(1), image(2), image(3)]), [["1"], ["2"], ["3"]])
+        self.assertEqual(detector.calls, 2)
+
+    def test_errored_images_have_no_text(self):
+        received = []
+        batch = BatchVision(FakeDetector())
+        ticket = batch.submit(image(0), received.append)
+        batch.flush()
+        self.assertEqual((ticket.texts, received), ([], [[]]))
+
+    def test_failed_batch_resolves_its_tickets(self):
+        received = []
+        batch = BatchVision(FakeDetector(failures=[1]), batch_size=2)
+        tickets = [batch.submit(image(value), received.append) for value in (1, 2)]
+        tickets.append(batch.submit(image(3), received.append))
+        batch.flush()
+        self.assertTrue(all(ticket.done for ticket in tickets))
+        self.assertEqual([ticket.texts for ticket in tickets], [[], [], ["3"]])
+        self.assertIsInstance(tickets[0].error, IOError)
+        self.assertIsNone(tickets[2].error)
+        self.assertEqual(received, [[], [], ["3"]])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,74 @@
+import threading
+import unittest
+
+from utils.micro_batching import MicroBatcher
+
+
+class MicroBatcherTest(unittest.TestCase):
+
+    def submit_together(self, batcher, items):
+        # the worker waits until every item is queued, so they are gathered into one batch
+        gate = threading.Event()
+        batcher.submit(gate)
+        futures = [batcher.submit(item) for item in items]
+        gate.set()
+        return futures
+
+    def test_every_caller_gets_its_result(self):
+        def process_batch(items):
+            for item in items:
+                if isinstance(item, threading.Event):
+                    item.wait()
+            return [item * 2 if isinstance(item, int) else None for item in items]
+
+        batcher = MicroBatcher(process_batch, max_batch_size=4, max_latency=1.0)
+        try:
+            futures = self.submit_together(batcher, [1, 2, 3])
+            self.assertEqual([future.result(5) for future in futures], [2, 4, 6])
+            self.assertEqual(batcher.stats()['batch_sizes'], {4: 1})
+        finally:
+            batcher.shutdown()
+
+    def test_short_result_fails_every_caller(self):
+        batch_sizes = []
+
+        def process_batch(items):
+            for item in items:
+                if isinstance(item, threading.Event):
+                    item.wait()
+            batch_sizes.append(len(items))
+            # one result short for the batches of many items
+            return items[1:] if len(items) > 1 else items
+
+        batcher = MicroBatcher(process_batch, max_batch_size=4, max_latency=1.0)
+        try:
+            futures = self.submit_together(batcher, [1, 2, 3])
+            for future in futures:
+                with self.assertRaises(ValueError):
+                    future.result(5)
+            # the worker keeps serving the later batches
+            self.assertEqual(batcher.process(7, timeout=5), 7)
+            self.assertEqual(batch_sizes, [4, 1])
+        finally:
+            batcher.shutdown()
+
+    def test_process_batch_error_reaches_every_caller(self):
+        def process_batch(items):
+            raise IOError("the OCR backend is down")
+
+        batcher = MicroBatcher(process_batch, max_batch_size=2, max_latency=0.01)
+        try:
+            futures = [batcher.submit(item) for item in (1, 2, 3)]
+            for future in futures:
+                self.assertRaises(IOError, future.result, 5)
+        finally:
+            batcher.shutdown()
+
+    def test_submit_after_shutdown(self):
+        batcher = MicroBatcher(lambda items: items)
+        batcher.shutdown()
+        self.assertRaises(RuntimeError, batcher.submit, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
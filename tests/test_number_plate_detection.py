@@ -0,0 +1,49 @@
+import os
+import unittest
+
+import cv2
+
+from lpdetection.candidate_scoring import PlateCandidate
+from lpdetection.number_plate_detection import NumberPlateDetection, mergeLevelCandidates, rectangleOverlap
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def candidate(rectangle, score):
+    plate = PlateCandidate(rectangle, None)
+    plate.score = score
+    return plate
+
+
+class CascadeMergeTest(unittest.TestCase):
+
+    def test_rectangle_overlap(self):
+        self.assertEqual(rectangleOverlap(((0, 0), (10, 10)), ((0, 0), (10, 10))), 1.0)
+        self.assertAlmostEqual(rectangleOverlap(((0, 0), (10, 10)), ((5, 0), (15, 10))), 50 / 150.0)
+        self.assertEqual(rectangleOverlap(((0, 0), (10, 10)), ((20, 20), (30, 30))), 0.0)
+
+    def test_coarse_candidates_kept_when_the_finer_level_finds_none(self):
+        coarse = [candidate(((10, 10), (60, 22)), 0.3)]
+        self.assertEqual(mergeLevelCandidates(coarse, [], top_k=3), coarse)
+
+    def test_same_location_kept_once_with_its_best_score(self):
+        coarse = [candidate(((10, 10), (60, 22)), 0.3), candidate(((100, 10), (150, 22)), 0.2)]
+        fine = [candidate(((11, 10), (61, 22)), 0.4)]
+        merged = mergeLevelCandidates(coarse, fine, top_k=3)
+        self.assertEqual([plate.score for plate in merged], [0.4, 0.2])
+
+    def test_top_k(self):
+        levels = [candidate(((x, 0), (x + 50, 12)), x / 1000.0) for x in range(0, 600, 100)]
+        self.assertEqual([plate.score for plate in mergeLevelCandidates(levels[:3], levels[3:], top_k=2)],
+                         [0.5, 0.4])
+
+    def test_detects_the_plate_of_the_vehicle_fixture(self):
+        detector = NumberPlateDetection(top_k=3, reference_width=420, cascade_scales=(0.5, 1.0))
+        candidates = detector.detect_number_plate_candidates(cv2.imread(os.path.join(ROOT, "lpdetection", "car.jpg")))
+        self.assertGreaterEqual(len(candidates), 1)
+        self.assertLessEqual(len(candidates), 3)
+        self.assertEqual(candidates, sorted(candidates, key=lambda plate: plate.score, reverse=True))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,107 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from utils.ocr_cache import CachedOcr, OcrResultCache, exact_hash
+
+
+def plate(value=0):
+    img = np.zeros((20, 60, 3), dtype=np.uint8)
+    img[5:15, 10:50] = 200
+    img[0, 0, 0] = value
+    return img
+
+
+class FakeOcr:
+    """
+    Answers every image with its corner pixel value, the images listed in failures are answered with None.
+    """
+
+    def __init__(self, failures=()) -> None:
+        self.images = 0
+        self.failures = set(failures)
+
+    def detect_texts(self, input_img):
+        self.images += 1
+        return [str(input_img[0, 0, 0])]
+
+    def detect_texts_batch(self, input_imgs):
+        self.images += len(input_imgs)
+        return [None if img[0, 0, 0] in self.failures else [str(img[0, 0, 0])] for img in input_imgs]
+
+
+class OcrResultCacheTest(unittest.TestCase):
+
+    def test_keyed_by_the_exact_content(self):
+        cache = OcrResultCache()
+        cache.put(plate(1), ["CJ16GXS"])
+        self.assertEqual(cache.get(plate(1)), ["CJ16GXS"])
+        # a single differing pixel is another image
+        self.assertIsNone(cache.get(plate(2)))
+        # the same pixels of another shape or type too
+        self.assertIsNone(cache.get(plate(1).reshape((60, 20, 3))))
+        self.assertIsNone(cache.get(plate(1).astype(np.uint16)))
+        self.assertEqual((cache.hits, cache.misses), (1, 3))
+
+    def test_namespaces_are_apart(self):
+        cache = OcrResultCache()
+        cache.put(plate(), ["CJ16GXS"], namespace='vision')
+        self.assertIsNone(cache.get(plate(), namespace='tesseract'))
+        self.assertNotEqual(exact_hash(plate(), 'vision'), exact_hash(plate(), 'tesseract'))
+
+    def test_crop_views_match_their_copies(self):
+        frame = np.random.RandomState(0).randint(0, 255, (100, 100, 3)).astype(np.uint8)
+        crop = frame[10:30, 20:80]
+        self.assertFalse(crop.flags['C_CONTIGUOUS'])
+        self.assertEqual(exact_hash(crop), exact_hash(crop.copy()))
+
+    def test_least_recently_used_are_evicted(self):
+        cache = OcrResultCache(max_entries=2)
+        cache.put(plate(1), ["1"])
+        cache.put(plate(2), ["2"])
+        cache.get(plate(1))
+        cache.put(plate(3), ["3"])
+        self.assertIsNone(cache.get(plate(2)))
+        self.assertEqual(cache.get(plate(1)), ["1"])
+        self.assertEqual(cache.stats()['evictions'], 1)
+
+    def test_clear_keeps_the_disk_store(self):
+        directory = tempfile.mkdtemp()
+        try:
+            cache = OcrResultCache(path=os.path.join(directory, "ocr_cache"))
+            cache.put(plate(1), ["CJ16GXS"])
+            cache.put(plate(2), [])
+            cache.clear()
+            self.assertEqual(cache.stats()['entries'], 0)
+            self.assertEqual(cache.get(plate(1)), ["CJ16GXS"])
+            self.assertEqual(cache.disk_hits, 1)
+            # the empty results are not persisted
+            self.assertIsNone(cache.get(plate(2)))
+            cache.close()
+        finally:
+            shutil.rmtree(directory)
+
+
+class CachedOcrTest(unittest.TestCase):
+
+    def test_only_the_misses_reach_the_detector(self):
+        ocr = FakeOcr()
+        cached = CachedOcr(ocr, OcrResultCache())
+        self.assertEqual(cached.detect_texts(plate(1)), ["1"])
+        self.assertEqual(cached.detect_texts_batch([plate(1), plate(2), plate(1)]), [["1"], ["2"], ["1"]])
+        self.assertEqual(ocr.images, 2)
+
+    def test_failed_detections_are_not_cached(self):
+        ocr = FakeOcr(failures=[2])
+        cached = CachedOcr(ocr, OcrResultCache())
+        self.assertEqual(cached.detect_texts_batch([plate(1), plate(2)]), [["1"], []])
+        ocr.failures = set()
+        self.assertEqual(cached.detect_texts_batch([plate(1), plate(2)]), [["1"], ["2"]])
+        self.assertEqual(ocr.images, 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,101 @@
+import unittest
+
+from utils.plate_consensus import PlateConsensus, edit_distance
+
+
+def center(box):
+    return (box[0] + box[2]) / 2.0, (box[1] + box[3]) / 2.0
+
+
+class PlateConsensusTest(unittest.TestCase):
+
+    def run_frames(self, consensus, vehicles, frames):
+        """
+        Read the plates of the vehicles which are not settled, frame after frame.
+
+        :param vehicles: list of (plate, box, first frame)
+        :return: tuple (the OCR calls by plate, the emitted plates)
+        """
+        ocr_calls = dict((plate, 0) for (plate, box, first_frame) in vehicles)
+        emitted = []
+        for frame_index in range(frames):
+            readings = []
+            for (plate, box, first_frame) in vehicles:
+                if frame_index >= first_frame and not consensus.is_settled(frame_index, center(box), box):
+                    ocr_calls[plate] += 1
+                    readings.append((plate, box))
+            for (plate, box) in readings:
+                consolidated = consensus.add(frame_index, plate, center(box), None, box)
+                if consolidated is not None:
+                    emitted.append(consolidated.plate)
+        return ocr_calls, emitted + [consolidated.plate for consolidated in consensus.flush()]
+
+    def test_votes_the_readings_of_a_plate(self):
+        consensus = PlateConsensus(min_readings=3)
+        self.assertIsNone(consensus.add(0, "CJ16GXS", (100, 100)))
+        self.assertIsNone(consensus.add(1, "CJ16GX5", (105, 100)))
+        consolidated = consensus.add(2, "CJ16GXS", (110, 100))
+        self.assertEqual(consolidated.plate, "CJ16GXS")
+        self.assertEqual(consolidated.readings, 3)
+        self.assertEqual(consensus.flush(), [])
+
+    def test_settled_vehicle_skips_its_ocr(self):
+        consensus = PlateConsensus(min_readings=3, reverify_every=5)
+        box = (100, 100, 400, 300)
+        ocr_calls, emitted = self.run_frames(consensus, [("CJ16GXS", box, 0)], 12)
+        self.assertEqual(emitted, ["CJ16GXS"])
+        # 3 readings to emit it, then one reading again after every 5 skipped frames
+        self.assertEqual(ocr_calls["CJ16GXS"], 4)
+
+    def test_neighbouring_vehicles(self):
+        consensus = PlateConsensus(min_readings=3, reverify_every=5)
+        vehicle_a = ("CJ16GXS", (100, 100, 220, 190), 0)
+        vehicle_b = ("B99XYZ", (230, 100, 350, 190), 3)
+        ocr_calls, emitted = self.run_frames(consensus, [vehicle_a, vehicle_b], 20)
+        # every plate is emitted once, the settled vehicle does not stand for its neighbour
+        self.assertEqual(sorted(emitted), ["B99XYZ", "CJ16GXS"])
+        self.assertEqual(ocr_calls["CJ16GXS"], 5)
+        self.assertEqual(ocr_calls["B99XYZ"], 5)
+
+    def test_another_vehicle_at_the_same_place(self):
+        consensus = PlateConsensus(min_readings=3, reverify_every=2)
+        box = (100, 100, 400, 300)
+        for frame_index in range(3):
+            consensus.add(frame_index, "CJ16GXS", center(box), None, box)
+        self.assertTrue(consensus.is_settled(3, center(box), box))
+        # the settled vehicle box jumps, it is read again
+        self.assertFalse(consensus.is_settled(4, center(box), (100, 100, 200, 300)))
+        # another vehicle of the same size stopped in its place is read again after a few frames
+        self.assertTrue(consensus.is_settled(5, center(box), box))
+        self.assertFalse(consensus.is_settled(6, center(box), box))
+        # its different plate ends the settled state of the earlier vehicle
+        consensus.add(6, "B123ABC", center(box), None, box)
+        self.assertFalse(consensus.is_settled(7, center(box), box))
+
+    def add_unsettled_readings(self, consensus):
+        for frame_index in range(3):
+            consensus.add(frame_index, "CJ16GXS", (100, 100))
+        # a far away duplicate of the emitted plate, and a plate read once
+        consensus.add(3, "CJ16GX5", (100, 900))
+        consensus.add(4, "CJ16GX5", (100, 900))
+        consensus.add(5, "B99XYZ", (900, 100))
+
+    def test_flush_needs_the_evidence(self):
+        consensus = PlateConsensus(min_readings=3)
+        self.add_unsettled_readings(consensus)
+        self.assertEqual(consensus.flush(), [])
+
+    def test_flush_drops_the_duplicates(self):
+        consensus = PlateConsensus(min_readings=3)
+        self.add_unsettled_readings(consensus)
+        consensus.min_readings = 1
+        self.assertEqual([consolidated.plate for consolidated in consensus.flush()], ["B99XYZ"])
+
+    def test_edit_distance(self):
+        self.assertEqual(edit_distance("CJ16GXS", "CJ16GXS"), 0)
+        self.assertEqual(edit_distance("CJ16GXS", "CJ16GX5"), 1)
+        self.assertEqual(edit_distance("B99XYZ", "B9XYZ"), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
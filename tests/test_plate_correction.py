@@ -0,0 +1,40 @@
+import unittest
+
+from utils.plate_correction import PlateCorrector
+from utils.text_filter import NprTextsFilter
+
+
+class PlateCorrectorTest(unittest.TestCase):
+
+    def setUp(self):
+        self.corrector = PlateCorrector()
+        self.texts_filter = NprTextsFilter(corrector=self.corrector)
+
+    def assertCorrected(self, text, plate):
+        corrected, score = self.corrector.correct(text)
+        self.assertEqual(corrected, plate)
+        self.assertEqual(self.texts_filter.filterDatesAndPlates([text]), ([], [plate]))
+
+    def test_letters_misread_as_digits(self):
+        self.assertCorrected("CI12A8C", "CJ12ABC")
+
+    def test_digits_misread_as_letters(self):
+        self.assertCorrected("B1OOXYZ", "B100XYZ")
+
+    def test_region_code_misread(self):
+        self.assertCorrected("CI12ABC", "CJ12ABC")
+        self.assertCorrected("CJ1ZABC", "CJ12ABC")
+
+    def test_valid_plate_is_kept(self):
+        self.assertEqual(self.corrector.correct("SB12ABC"), ("SB12ABC", 1.0))
+
+    def test_words_are_not_bent_into_plates(self):
+        for word in ("BOOKING", "PARKING", "HOSPITAL", "TAXI"):
+            self.assertEqual(self.texts_filter.filterDatesAndPlates([word]), ([], []))
+
+    def test_dates_are_not_corrected(self):
+        self.assertEqual(self.texts_filter.filterDates(["CI12A8C", "2019/01/29"]), ["2019/01/29"])
+
+
+if __name__ == "__main__":
+    unittest.main()
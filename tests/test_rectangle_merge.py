@@ -0,0 +1,59 @@
+import unittest
+
+from lpdetection.rectangle_merge import _UnionFind, _overlappingPairs, areOverlapping, findRectangleGroups, \
+    findRectangleIntersections, minimumContainingRect
+
+
+def groups_of(rectangles):
+    return sorted((rect, sorted(members)) for (rect, members) in findRectangleGroups(rectangles))
+
+
+class RectangleMergeTest(unittest.TestCase):
+
+    def test_overlapping(self):
+        self.assertTrue(areOverlapping(((0, 0), (10, 10)), ((5, 5), (15, 15))))
+        # the touching edges overlap
+        self.assertTrue(areOverlapping(((0, 0), (10, 10)), ((10, 0), (20, 10))))
+        self.assertFalse(areOverlapping(((0, 0), (10, 10)), ((11, 0), (20, 10))))
+        # apart along y only
+        self.assertFalse(areOverlapping(((0, 0), (10, 10)), ((5, 11), (8, 20))))
+
+    def test_minimum_containing_rect(self):
+        # x and y are taken from their own axis of both rectangles
+        self.assertEqual(minimumContainingRect(((0, 10), (5, 20)), ((3, 0), (30, 12))), ((0, 0), (30, 20)))
+        self.assertEqual(minimumContainingRect(((3, 0), (30, 12)), ((0, 10), (5, 20))), ((0, 0), (30, 20)))
+        self.assertEqual(minimumContainingRect(((1, 1), (9, 9)), ((0, 0), (10, 10))), ((0, 0), (10, 10)))
+
+    def test_union_find(self):
+        union_find = _UnionFind(5)
+        self.assertTrue(union_find.union(0, 1))
+        self.assertTrue(union_find.union(3, 4))
+        self.assertTrue(union_find.union(1, 4))
+        self.assertFalse(union_find.union(0, 3))
+        self.assertEqual(len(set(union_find.find(i) for i in (0, 1, 3, 4))), 1)
+        self.assertNotEqual(union_find.find(2), union_find.find(0))
+        self.assertEqual(union_find.size[union_find.find(0)], 4)
+
+    def test_overlapping_pairs(self):
+        rectangles = [((20, 0), (30, 10)), ((0, 0), (10, 10)), ((5, 5), (25, 8)), ((5, 50), (25, 60))]
+        pairs = set(tuple(sorted(pair)) for pair in _overlappingPairs(rectangles))
+        self.assertEqual(pairs, {(0, 2), (1, 2)})
+
+    def test_chains_are_grouped(self):
+        rectangles = [((0, 0), (10, 10)), ((8, 2), (20, 12)), ((18, 4), (30, 14)), ((50, 50), (60, 60))]
+        self.assertEqual(groups_of(rectangles), [(((0, 0), (30, 14)), [0, 1, 2]), (((50, 50), (60, 60)), [3])])
+
+    def test_merged_group_overlaps_further_rectangles(self):
+        # the last rectangle only overlaps the containing rectangle of the first three
+        rectangles = [((0, 0), (10, 10)), ((20, 20), (30, 30)), ((8, 8), (22, 22)), ((26, 2), (29, 5))]
+        self.assertEqual(groups_of(rectangles), [(((0, 0), (30, 30)), [0, 1, 2, 3])])
+
+    def test_intersections(self):
+        self.assertEqual(findRectangleIntersections([]), [])
+        self.assertEqual(findRectangleIntersections([((0, 0), (5, 5))]), [((0, 0), (5, 5))])
+        self.assertEqual(sorted(findRectangleIntersections([((0, 0), (5, 5)), ((4, 4), (9, 9)), ((20, 0), (25, 5))])),
+                         [((0, 0), (9, 9)), ((20, 0), (25, 5))])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,46 @@
+import unittest
+
+from utils.text_filter import NprTextsFilter, compile_plate_grammar, PLATE_GRAMMARS
+
+
+class NprTextsFilterTest(unittest.TestCase):
+
+    def setUp(self):
+        self.texts_filter = NprTextsFilter()
+
+    def test_scans_the_plates(self):
+        self.assertEqual(self.texts_filter.scan("B123ABC"), (None, "B123ABC"))
+        self.assertEqual(self.texts_filter.scan("B12ABC"), (None, "B12ABC"))
+        self.assertEqual(self.texts_filter.scan("SB 12 ABC"), (None, "SB12ABC"))
+        # a plate can be anywhere within the text, the first one is kept
+        self.assertEqual(self.texts_filter.scan("RO-CJ16GXS-B99XYZ"), (None, "CJ16GXS"))
+
+    def test_unknown_region_is_not_a_plate(self):
+        self.assertEqual(self.texts_filter.scan("XX12ABC"), (None, None))
+        self.assertEqual(self.texts_filter.scan("PARKING"), (None, None))
+
+    def test_prefix_corrections(self):
+        self.assertEqual(self.texts_filter.scan("CI12ABC"), (None, "CJ12ABC"))
+        self.assertEqual(self.texts_filter.scan("CI12ABC", correct=False), (None, "CJ12ABC"))
+
+    def test_dates_are_the_whole_text(self):
+        self.assertEqual(self.texts_filter.scan("2019/01/29"), ("2019/01/29", None))
+        self.assertEqual(self.texts_filter.scan("29/1/2019"), ("29/1/2019", None))
+        self.assertEqual(self.texts_filter.scan("at 2019/01/29"), (None, None))
+
+    def test_filter_dates_and_plates(self):
+        texts = ["2019/01/29", "CJ16GXS", "TAXI", "B99XYZ"]
+        self.assertEqual(self.texts_filter.filterDatesAndPlates(texts), (["2019/01/29"], ["CJ16GXS", "B99XYZ"]))
+        self.assertEqual(self.texts_filter.filterNumberPlates(texts), ["CJ16GXS", "B99XYZ"])
+        self.assertEqual(self.texts_filter.filterDates(texts), ["2019/01/29"])
+        self.assertEqual(self.texts_filter.filterBatch([texts[:2], [], texts[2:]]),
+                         [(["2019/01/29"], ["CJ16GXS"]), ([], []), ([], ["B99XYZ"])])
+
+    def test_grammar_accepts_the_misread_prefixes(self):
+        regex = compile_plate_grammar(PLATE_GRAMMARS["RO"])
+        self.assertIn("CI", regex)
+        self.assertIn("CJ", regex)
+
+
+if __name__ == "__main__":
+    unittest.main()
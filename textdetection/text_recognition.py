@@ -8,6 +8,8 @@ import cv2
 import re
 import os
 
+TESSERACT_CACHE_NAMESPACE = "tesseract"
+
 
 def _decode_predictions(scores, geometry):
     # grab the number of rows and columns from the scores volume, then
@@ -66,13 +68,14 @@ def _decode_predictions(scores, geometry):
     return rects, confidences
 
 
-def _apply_pytesseract_predictions(image, rW, rH, boxes):
+def _apply_pytesseract_predictions(image, rW, rH, boxes, ocr_cache=None):
     """
     Extract the texts using pytesseract from the text boxes detected with the text detector.
     :param image:
     :param rH:
     :param rW:
     :param boxes: decoded predictions from the EAST text detector.
+    :param ocr_cache: optional OcrResultCache, Tesseract only runs on the text boxes missing from it
     :return: the list of all detected texts.
     """
     texts = []
@@ -100,8 +103,15 @@ def _apply_pytesseract_predictions(image, rW, rH, boxes):
         # wish to use the LSTM neural net model for OCR, and finally
         # (3) an OEM value, in this case, 7 which implies that we are
         # treating the ROI as a single line of text
+        cached = ocr_cache.get(roi, TESSERACT_CACHE_NAMESPACE) if ocr_cache is not None else None
+        if cached is not None:
+            texts.append(cached[0])
+            continue
+
         config = "-l eng --oem 1 --psm 7"
         text = pytesseract.image_to_string(roi, config=config)
+        if ocr_cache is not None:
+            ocr_cache.put(roi, [text], TESSERACT_CACHE_NAMESPACE)
 
         texts.append(text)
 
@@ -111,45 +121,79 @@ def _apply_pytesseract_predictions(image, rW, rH, boxes):
 class EastTextDetector:
     __east_net = None
     __layer_names = None
+    __ocr_cache = None
 
-    def __init__(self) -> None:
+    def __init__(self, ocr_cache=None) -> None:
+        """
+        :param ocr_cache: optional OcrResultCache for the Tesseract results
+        """
         super().__init__()
+        self.__ocr_cache = ocr_cache
         # load the pre-trained EAST text detector
         print("[INFO] Loading pre-trained EAST text detector...")
         self.__east_net = cv2.dnn.readNet(os.path.dirname(__file__) + "/frozen_east_text_detection.pb")
         self.__layer_names = ["feature_fusion/Conv_7/Sigmoid", "feature_fusion/concat_3"]
 
-    def extract_text(self, input_img):
-        (origH, origW) = input_img.shape[:2]
+    def detect_text_boxes(self, input_img):
+        """
+        Run the EAST text detector and decode its predictions.
 
+        :param input_img: the frame upon which we run the text detection.
+        :return: tuple of the text boxes within the resized image and the (rW, rH) ratios back to the frame size
+        """
+        return self.detect_text_boxes_batch([input_img])[0]
+
+    def detect_text_boxes_batch(self, input_imgs):
+        """
+        Run the EAST text detector on many frames with a single forward pass, and decode its predictions.
+
+        :param input_imgs: the frames upon which we run the text detection.
+        :return: the list of (text boxes, (rW, rH)) tuples, one for every frame
+        """
         # set the new width and height and then determine the ratio in change
         # for both the width and height
         # use default of 320 & 320
         (newW, newH) = (320, 320)
-        rW = origW / float(newW)
-        rH = origH / float(newH)
-
-        # resize the image and grab the new image dimensions
-        image = cv2.resize(input_img, (newW, newH))
-        (H, W) = image.shape[:2]
-
-        # construct a blob from the image and then perform a forward pass of
+        ratios = []
+        images = []
+        for input_img in input_imgs:
+            (origH, origW) = input_img.shape[:2]
+            ratios.append((origW / float(newW), origH / float(newH)))
+            # resize the image
+            images.append(cv2.resize(input_img, (newW, newH)))
+
+        # construct a blob from the images and then perform a forward pass of
         # the model to obtain the two output layer sets
-        blob = cv2.dnn.blobFromImage(image, 1.0, (W, H), (123.68, 116.78, 103.94), swapRB=True, crop=False)
+        blob = cv2.dnn.blobFromImages(images, 1.0, (newW, newH), (123.68, 116.78, 103.94), swapRB=True, crop=False)
         self.__east_net.setInput(blob)
         (scores, geometry) = self.__east_net.forward(self.__layer_names)
 
-        # decode the predictions, then  apply non-maxima suppression to
-        # suppress weak, overlapping bounding boxes
-        (rects, confidences) = _decode_predictions(scores, geometry)
-        boxes = non_max_suppression(np.array(rects), probs=confidences)
+        results = []
+        for (i, ratio) in enumerate(ratios):
+            # decode the predictions, then  apply non-maxima suppression to
+            # suppress weak, overlapping bounding boxes
+            (rects, confidences) = _decode_predictions(scores[i:i + 1], geometry[i:i + 1])
+            boxes = non_max_suppression(np.array(rects), probs=confidences)
+            results.append((boxes, ratio))
+        return results
 
-        # extract the text using pytesseract
-        texts = _apply_pytesseract_predictions(input_img.copy(), rW, rH, boxes)
+    def extract_text(self, input_img):
+        return self.extract_text_batch([input_img])[0]
+
+    def extract_text_batch(self, input_imgs):
+        """
+        Extract the dates and numbers of many frames, the text detection runs on all of them at once.
 
+        :param input_imgs: the frames upon which we run the text detection and recognition.
+        :return: the list of (dates, numbers) tuples, one for every frame
+        """
         nprTextsFilter = text_filter.NprTextsFilter()
-        dates, numbers = nprTextsFilter.filterDatesAndPlates(texts)
-        return dates, numbers
+        results = []
+        for (input_img, (boxes, (rW, rH))) in zip(input_imgs, self.detect_text_boxes_batch(input_imgs)):
+            # extract the text using pytesseract
+            texts = _apply_pytesseract_predictions(input_img.copy(), rW, rH, boxes, self.__ocr_cache)
+            results.append(nprTextsFilter.filterDatesAndPlates(texts))
+        return results
 
     def extract_numbers_first_date(self, input_img):
         """
@@ -159,5 +203,14 @@ class EastTextDetector:
         :param input_img: the frame upon which we run the text detection and recognition.
         :return: detected date or None if it is not existent, and all detected number plate texts.
         """
-        dates, numbers = self.extract_text(input_img)
-        return dates[0] if len(dates) > 0 else None, numbers
+        return self.extract_numbers_first_date_batch([input_img])[0]
+
+    def extract_numbers_first_date_batch(self, input_imgs):
+        """
+        Extract the detected date and numbers of many frames.
+
+        :param input_imgs: the frames upon which we run the text detection and recognition.
+        :return: the list of (detected date or None, all detected number plate texts), one for every frame
+        """
+        return [(dates[0] if len(dates) > 0 else None, numbers)
+                for (dates, numbers) in self.extract_text_batch(input_imgs)]
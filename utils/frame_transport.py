@@ -0,0 +1,178 @@
+import multiprocessing
+import os
+import queue
+from multiprocessing import shared_memory
+
+import numpy as np
+
+
+class FrameRef:
+    """
+    Handle of a frame stored within a FrameRing slot, cheap to pass through the queues.
+    The generation tells a frame from the later ones written into the same slot.
+    """
+    __slots__ = ('slot', 'generation', 'shape', 'index')
+
+    def __init__(self, slot, generation, shape, index=None) -> None:
+        self.slot = slot
+        self.generation = generation
+        self.shape = tuple(shape)
+        self.index = index
+
+    def __getstate__(self):
+        return self.slot, self.generation, self.shape, self.index
+
+    def __setstate__(self, state):
+        self.slot, self.generation, self.shape, self.index = state
+
+    def __repr__(self) -> str:
+        return 'FrameRef(slot={0:d}, generation={1:d}, index={2})'.format(self.slot, self.generation, self.index)
+
+
+class CropRef:
+    """
+    Handle of a crop of a frame stored within a FrameRing slot, e.g. a vehicle or a number plate.
+    """
+    __slots__ = ('frame', 'box', 'points')
+
+    def __init__(self, frame, box, points=None) -> None:
+        """
+        :param frame: the FrameRef
+        :param box: the (x1, y1, x2, y2) box of the crop within the frame
+        :param points: optional rotated corner points of the crop within the frame, e.g. for deskewing a plate
+        """
+        self.frame = frame
+        self.box = tuple(int(value) for value in box)
+        self.points = points
+
+    def __getstate__(self):
+        return self.frame, self.box, self.points
+
+    def __setstate__(self, state):
+        self.frame, self.box, self.points = state
+
+    def __repr__(self) -> str:
+        return 'CropRef({0}, box={1})'.format(self.frame, self.box)
+
+
+class StaleFrameError(Exception):
+    """
+    Raised when a frame is read after its slot was released and reused.
+    """
+
+
+class FrameRing:
+    """
+    Ring buffer of preallocated frame slots within shared memory, for passing the frames between processes
+    without copying them. The writer acquires a free slot and writes the frame into it, then passes the FrameRef
+    through a queue. The readers get numpy views of the slot, and of its crops through CropRefs.
+    A slot goes back to the free slots once all its references are released.
+
+    The ring is passed to the child processes as a multiprocessing.Process argument, they attach to the same memory.
+    """
+
+    def __init__(self, slots, max_frame_shape, dtype=np.uint8) -> None:
+        """
+        :param slots: the number of frame slots
+        :param max_frame_shape: the shape of the largest frame, e.g. (1080, 1920, 3)
+        :param dtype: the frame data type
+        """
+        self.slots = slots
+        self.dtype = np.dtype(dtype)
+        self.slot_bytes = int(np.prod(max_frame_shape)) * self.dtype.itemsize
+        self.__memory = shared_memory.SharedMemory(create=True, size=self.slot_bytes * slots)
+        # a forked child inherits the ring as it is, only the creating process may free the memory
+        self.__owner_pid = os.getpid()
+        self.__free = multiprocessing.Queue()
+        for slot in range(slots):
+            self.__free.put(slot)
+        # the references held on every slot and the number of times it was written
+        self.__references = multiprocessing.Array('i', slots)
+        self.__generations = multiprocessing.Array('i', slots, lock=False)
+
+    def __getstate__(self):
+        return (self.slots, self.dtype, self.slot_bytes, self.__memory.name, self.__free, self.__references,
+                self.__generations)
+
+    def __setstate__(self, state):
+        (self.slots, self.dtype, self.slot_bytes, name, self.__free, self.__references, self.__generations) = state
+        # the child processes share the resource tracker of their parent, the memory stays tracked once
+        self.__memory = shared_memory.SharedMemory(name=name)
+        self.__owner_pid = None
+
+    def __slot_array(self, slot, shape):
+        count = int(np.prod(shape))
+        if count * self.dtype.itemsize > self.slot_bytes:
+            raise ValueError('frame of shape {0} larger than the ring slots'.format(shape))
+        return np.ndarray(shape, dtype=self.dtype, buffer=self.__memory.buf, offset=slot * self.slot_bytes)
+
+    def write(self, frame, index=None, timeout=None):
+        """
+        Copy a frame into a free slot, waiting for one if they are all in use.
+
+        :param frame: the frame
+        :param index: optional frame index kept with the reference
+        :param timeout: the seconds to wait for a free slot, forever if None
+        :return: the FrameRef, holding one reference on the slot
+        """
+        try:
+            slot = self.__free.get(timeout=timeout)
+        except queue.Empty:
+            raise TimeoutError('no free frame slot within {0} seconds'.format(timeout))
+        np.copyto(self.__slot_array(slot, frame.shape), frame, casting='no')
+        with self.__references.get_lock():
+            self.__references[slot] = 1
+            self.__generations[slot] += 1
+            generation = self.__generations[slot]
+        return FrameRef(slot, generation, frame.shape, index)
+
+    def __check(self, ref):
+        if self.__generations[ref.slot] != ref.generation:
+            raise StaleFrameError('{0} was overwritten'.format(ref))
+
+    def view(self, ref):
+        """
+        :param ref: the FrameRef
+        :return: the frame as a numpy view of the shared memory, valid until its slot is released
+        """
+        self.__check(ref)
+        return self.__slot_array(ref.slot, ref.shape)
+
+    def crop(self, crop_ref):
+        """
+        :param crop_ref: the CropRef
+        :return: the crop as a numpy view of the shared memory, valid until its frame slot is released
+        """
+        x1, y1, x2, y2 = crop_ref.box
+        return self.view(crop_ref.frame)[y1:y2, x1:x2]
+
+    def retain(self, ref, count=1):
+        """
+        Add references on the slot of the frame, one for every consumer the frame or its crops are passed to.
+        """
+        with self.__references.get_lock():
+            self.__check(ref)
+            self.__references[ref.slot] += count
+
+    def release(self, ref):
+        """
+        Drop a reference on the slot of the frame, the slot is freed with the last one.
+        """
+        with self.__references.get_lock():
+            self.__check(ref)
+            self.__references[ref.slot] -= 1
+            freed = self.__references[ref.slot] == 0
+            if freed:
+                # the references of the released frame become stale right away
+                self.__generations[ref.slot] += 1
+        if freed:
+            self.__free.put(ref.slot)
+
+    def close(self):
+        """
+        Detach from the shared memory, the creating process also frees it.
+        The views of the frames must not be used anymore.
+        """
+        self.__memory.close()
+        if self.__owner_pid == os.getpid():
+            self.__memory.unlink()
@@ -0,0 +1,262 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from utils.metrics import LatencyHistogram
+
+METRICS_PREFIX = 'npr'
+
+
+class _Span:
+    __slots__ = ('histogram', 'start')
+
+    def __init__(self, histogram) -> None:
+        self.histogram = histogram
+        self.start = None
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.histogram.observe(time.perf_counter() - self.start)
+        return False
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Instrumentation:
+    """
+    Stage timers and counters of the pipeline.
+    The stages are timed with spans, every stage name gets its own latency histogram:
+
+        with instrumentation.span('detect_cars'):
+            vehicles = yoloDetector.detect_cars(frame)
+        instrumentation.count('vehicles', len(vehicles))
+    """
+
+    enabled = True
+
+    def __init__(self) -> None:
+        self.__histograms = {}
+        self.__counters = {}
+        self.__gauges = {}
+        self.__lock = threading.Lock()
+        self.started = time.time()
+
+    def __histogram(self, name):
+        histogram = self.__histograms.get(name)
+        if histogram is None:
+            with self.__lock:
+                histogram = self.__histograms.setdefault(name, LatencyHistogram())
+        return histogram
+
+    def span(self, name):
+        """
+        :param name: the stage name
+        :return: context manager timing the stage
+        """
+        return _Span(self.__histogram(name))
+
+    def timed(self, name, function):
+        """
+        Wrap a function so that every call of it is timed as the given stage.
+        """
+        histogram = self.__histogram(name)
+
+        def timed_function(*args, **kwargs):
+            with _Span(histogram):
+                return function(*args, **kwargs)
+
+        return timed_function
+
+    def count(self, name, value=1):
+        """
+        Increase a counter.
+
+        :param name: the counter name
+        :param value: the increment
+        """
+        with self.__lock:
+            self.__counters[name] = self.__counters.get(name, 0) + value
+
+    def register_histogram(self, name, histogram):
+        """
+        Export a latency histogram kept by another component, e.g. the ConcurrentVision request latency.
+        """
+        with self.__lock:
+            self.__histograms[name] = histogram
+
+    def register_gauge(self, name, function):
+        """
+        Export a value read from another component when the metrics are collected.
+
+        :param name: the gauge name
+        :param function: function without arguments returning the number
+        """
+        with self.__lock:
+            self.__gauges[name] = function
+
+    def snapshot(self):
+        """
+        :return: dict with the stage histograms, the counters and the gauges
+        """
+        with self.__lock:
+            histograms = dict(self.__histograms)
+            counters = dict(self.__counters)
+            gauges = dict(self.__gauges)
+        return {
+            'time': time.time(),
+            'uptime': time.time() - self.started,
+            'stages': dict((name, histogram.snapshot()) for (name, histogram) in histograms.items()),
+            'counters': counters,
+            'gauges': dict((name, function()) for (name, function) in gauges.items()),
+        }
+
+    def prometheus_text(self, prefix=METRICS_PREFIX):
+        """
+        Render the metrics in the Prometheus text exposition format.
+        """
+        snapshot = self.snapshot()
+        lines = []
+        if snapshot['stages']:
+            lines.append('# TYPE {0}_stage_seconds histogram'.format(prefix))
+        for (stage, histogram) in sorted(snapshot['stages'].items()):
+            for (bound, count) in histogram['buckets'].items():
+                lines.append('{0}_stage_seconds_bucket{{stage="{1}",le="{2}"}} {3:d}'.format(prefix, stage, bound,
+                                                                                           count))
+            lines.append('{0}_stage_seconds_sum{{stage="{1}"}} {2:.6f}'.format(prefix, stage, histogram['sum']))
+            lines.append('{0}_stage_seconds_count{{stage="{1}"}} {2:d}'.format(prefix, stage, histogram['count']))
+        for (name, value) in sorted(snapshot['counters'].items()):
+            lines.append('# TYPE {0}_{1}_total counter'.format(prefix, name))
+            lines.append('{0}_{1}_total {2}'.format(prefix, name, value))
+        for (name, value) in sorted(snapshot['gauges'].items()):
+            lines.append('# TYPE {0}_{1} gauge'.format(prefix, name))
+            lines.append('{0}_{1} {2}'.format(prefix, name, value))
+        return '\n'.join(lines) + '\n'
+
+
+class NullInstrumentation:
+    """
+    The disabled instrumentation, with the same interface and nothing recorded.
+    """
+
+    enabled = False
+
+    def span(self, name):
+        return _NULL_SPAN
+
+    def timed(self, name, function):
+        return function
+
+    def count(self, name, value=1):
+        pass
+
+    def register_histogram(self, name, histogram):
+        pass
+
+    def register_gauge(self, name, function):
+        pass
+
+    def snapshot(self):
+        return {'time': time.time(), 'uptime': 0.0, 'stages': {}, 'counters': {}, 'gauges': {}}
+
+    def prometheus_text(self, prefix=METRICS_PREFIX):
+        return ''
+
+
+def create_instrumentation(enabled=True):
+    return Instrumentation() if enabled else NullInstrumentation()
+
+
+class MetricsServer:
+    """
+    Serves the metrics in the Prometheus text format on http://host:port/metrics, from a daemon thread.
+    """
+
+    def __init__(self, instrumentation, port=9108, host='127.0.0.1') -> None:
+        """
+        :param instrumentation: the Instrumentation to export
+        :param port: the HTTP port, 0 for any free port
+        :param host: the listening address, the local host only by default, '0.0.0.0' exposes the metrics
+            on all the interfaces
+        """
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = instrumentation.prometheus_text().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                # the scrapes are not logged
+                pass
+
+        self.__server = ThreadingHTTPServer((host, port), MetricsHandler)
+        self.port = self.__server.server_address[1]
+        self.__thread = threading.Thread(target=self.__server.serve_forever, name='metrics-server', daemon=True)
+        self.__thread.start()
+
+    def shutdown(self):
+        self.__server.shutdown()
+        self.__server.server_close()
+
+
+def append_json_snapshot(instrumentation, path):
+    """
+    Append the metrics snapshot as a JSON line to the file.
+    """
+    with open(path, 'a') as file:
+        file.write(json.dumps(instrumentation.snapshot(), sort_keys=True) + '\n')
+
+
+class JsonMetricsLogger:
+    """
+    Appends a JSON line with the metrics snapshot to a file every interval seconds, from a daemon thread.
+    """
+
+    def __init__(self, instrumentation, path, interval=10.0) -> None:
+        """
+        :param instrumentation: the Instrumentation to export
+        :param path: the JSON lines file path
+        :param interval: the seconds between two snapshots
+        """
+        self.instrumentation = instrumentation
+        self.path = path
+        self.interval = interval
+        self.__stopped = threading.Event()
+        self.__thread = threading.Thread(target=self.__run, name='metrics-logger', daemon=True)
+        self.__thread.start()
+
+    def write(self):
+        append_json_snapshot(self.instrumentation, self.path)
+
+    def __run(self):
+        while not self.__stopped.wait(self.interval):
+            self.write()
+
+    def shutdown(self):
+        """
+        Stop the logger, after writing the last snapshot.
+        """
+        self.__stopped.set()
+        self.__thread.join()
+        self.write()
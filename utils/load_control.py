@@ -0,0 +1,133 @@
+import threading
+import time
+from collections import deque
+
+
+class QualityLevel:
+    """
+    The pipeline settings of a quality level.
+    """
+
+    def __init__(self, name, reuse_cached_date=False, yolo_input_size=416, plate_top_k=3, frames_per_second=2) -> None:
+        """
+        :param name: the level name, used in the logs
+        :param reuse_cached_date: skip the EAST date recognition when a date was already recognised in the video
+        :param yolo_input_size: the YOLO input size, a multiple of 32
+        :param plate_top_k: the number plate locations sent to OCR for every vehicle
+        :param frames_per_second: the consecutive frames sampled from every second of a video
+        """
+        self.name = name
+        self.reuse_cached_date = reuse_cached_date
+        self.yolo_input_size = yolo_input_size
+        self.plate_top_k = plate_top_k
+        self.frames_per_second = frames_per_second
+
+    def __repr__(self) -> str:
+        return 'QualityLevel({0}: reuse_cached_date={1}, yolo_input_size={2:d}, plate_top_k={3}, ' \
+               'frames_per_second={4:d})'.format(self.name, self.reuse_cached_date, self.yolo_input_size,
+                                                 self.plate_top_k, self.frames_per_second)
+
+
+# from the full quality down, every level gives up a little more accuracy for speed
+DEFAULT_LEVELS = [
+    QualityLevel("full"),
+    QualityLevel("cached_date", reuse_cached_date=True),
+    QualityLevel("small_yolo", reuse_cached_date=True, yolo_input_size=320),
+    QualityLevel("top_plate", reuse_cached_date=True, yolo_input_size=320, plate_top_k=1),
+    QualityLevel("one_frame_per_second", reuse_cached_date=True, yolo_input_size=320, plate_top_k=1,
+                 frames_per_second=1),
+]
+
+
+class LoadController:
+    """
+    Steps the pipeline quality down while it cannot keep up, and back up once the load drops.
+    The load is watched through the latency of the processed frames and the depth of the queue waiting for them,
+    averaged over a window of observations. A level change is followed by a cooldown, so the effect of a change is
+    measured before the next one. Stepping up needs a longer calm period than stepping down.
+    """
+
+    def __init__(self, levels=DEFAULT_LEVELS, target_latency=1.0, max_queue_depth=8, window=8,
+                 low_load_ratio=0.5, cooldown=5.0, step_up_after=30.0, on_change=None) -> None:
+        """
+        :param levels: the QualityLevel list, from the full quality down
+        :param target_latency: the frame latency in seconds above which the quality steps down
+        :param max_queue_depth: the queue depth above which the quality steps down
+        :param window: the number of observations averaged
+        :param low_load_ratio: the quality steps up when the latency and the queue depth stay below this ratio
+            of their limits
+        :param cooldown: the seconds without a change after every level change
+        :param step_up_after: the seconds the load must stay low before stepping up
+        :param on_change: function(QualityLevel) called on every level change, and with the initial level
+        """
+        self.levels = list(levels)
+        self.target_latency = target_latency
+        self.max_queue_depth = max_queue_depth
+        self.low_load_ratio = low_load_ratio
+        self.cooldown = cooldown
+        self.step_up_after = step_up_after
+        self.on_change = on_change
+        self.index = 0
+        self.changes = 0
+        self.__latencies = deque(maxlen=window)
+        self.__queue_depths = deque(maxlen=window)
+        self.__last_change = float('-inf')
+        self.__low_since = None
+        self.__lock = threading.Lock()
+        if on_change is not None:
+            on_change(self.level)
+
+    @property
+    def level(self):
+        return self.levels[self.index]
+
+    def observe(self, latency, queue_depth=0, now=None):
+        """
+        Record the latency of a processed frame and the depth of the queue behind it, and adapt the level.
+
+        :param latency: the seconds spent on the frame
+        :param queue_depth: the frames waiting to be processed
+        :param now: the monotonic time of the observation
+        :return: the current QualityLevel
+        """
+        now = time.monotonic() if now is None else now
+        with self.__lock:
+            self.__latencies.append(latency)
+            self.__queue_depths.append(queue_depth)
+            latency = sum(self.__latencies) / len(self.__latencies)
+            queue_depth = sum(self.__queue_depths) / float(len(self.__queue_depths))
+
+            overloaded = latency > self.target_latency or queue_depth > self.max_queue_depth
+            underloaded = latency < self.target_latency * self.low_load_ratio \
+                and queue_depth <= self.max_queue_depth * self.low_load_ratio
+            if underloaded:
+                self.__low_since = now if self.__low_since is None else self.__low_since
+            else:
+                self.__low_since = None
+
+            if now - self.__last_change < self.cooldown:
+                return self.level
+            if overloaded and self.index < len(self.levels) - 1:
+                step = 1
+            elif underloaded and self.index > 0 and now - self.__low_since >= self.step_up_after:
+                step = -1
+            else:
+                return self.level
+
+            previous = self.level
+            self.index += step
+            self.changes += 1
+            self.__last_change = now
+            self.__low_since = None
+            # the next decision is taken on the load of the new level only
+            self.__latencies.clear()
+            self.__queue_depths.clear()
+            level = self.level
+        print('[LOAD] quality {0} -> {1} (latency {2:.3f}s, queue depth {3:.1f}): {4}'.format(
+            previous.name, level.name, latency, queue_depth, level))
+        if self.on_change is not None:
+            self.on_change(level)
+        return level
+
+    def stats(self):
+        return {'level': self.level.name, 'index': self.index, 'changes': self.changes}
@@ -0,0 +1,96 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from visionapi.mosaic import assign_annotations, pack_mosaic
+
+# the date is printed within the top or bottom tenth of the frame
+MARGIN_HEIGHT_RATIO = 0.1
+
+STITCHED = 'stitched'
+CONCURRENT = 'concurrent'
+
+
+def margin_bands(image, height_ratio=MARGIN_HEIGHT_RATIO):
+    """
+    Get the 4 margin corners of the image, as views without copying the image.
+
+    :param image: input cv2 image
+    :param height_ratio: the height of a margin band as a ratio of the image height
+    :return: the top left, top right, bottom left and bottom right margins, in this priority order
+    """
+    height, width = image.shape[:2]
+    return [
+        # top left margin
+        image[0:int(height * height_ratio), 0:int(width * 0.5)],
+        # top right margin corner
+        image[0:int(height * height_ratio), int(width * 0.5):width],
+        # bottom left margin
+        image[int(height * (1 - height_ratio)): height, 0:int(width * 0.5)],
+        # bottom right margin
+        image[int(height * (1 - height_ratio)): height, int(width * 0.5):width]]
+
+
+class MarginDateExtractor:
+    """
+    Extracts the date from the margins of the image (top left & right or bottom left & right),
+    either with a single OCR call on the 4 margins stitched together or with 4 concurrent OCR calls.
+    """
+
+    def __init__(self, text_detector, texts_filter, mode=STITCHED, height_ratio=MARGIN_HEIGHT_RATIO) -> None:
+        """
+        :param text_detector: the OCR text detector, with detect_texts and optionally detect_text_annotations,
+            e.g. the OcrRouter, without the geometry the stitched margins lose their priority order
+        :param texts_filter: the text filter, used to keep only the valid dates
+        :param mode: STITCHED for one OCR call, CONCURRENT for one concurrent OCR call per margin
+        :param height_ratio: the height of a margin band as a ratio of the image height
+        """
+        self.text_detector = text_detector
+        self.texts_filter = texts_filter
+        self.mode = mode
+        self.height_ratio = height_ratio
+        self.__executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='margins') \
+            if mode == CONCURRENT else None
+
+    def __first_date(self, margins_texts):
+        for texts in margins_texts:
+            dates = self.texts_filter.filterDates(texts)
+            if len(dates) > 0:
+                return dates[0]
+        return None
+
+    def __extract_stitched(self, margins):
+        # every margin band gets a row of its own, the words are mapped back to their band through their geometry
+        stitched, placements = pack_mosaic(margins, max_width=1)
+        if hasattr(self.text_detector, 'detect_text_annotations'):
+            annotations = self.text_detector.detect_text_annotations(stitched)
+            return self.__first_date(assign_annotations(annotations, placements))
+        # without the geometry the margins priority is lost, the first date of the whole text is kept
+        return self.__first_date([self.text_detector.detect_texts(stitched)])
+
+    def __extract_concurrent(self, margins):
+        futures = [self.__executor.submit(self.text_detector.detect_texts, margin) for margin in margins]
+        try:
+            # the futures are waited on in priority order, the first valid date wins
+            for future in futures:
+                date = self.__first_date([future.result()])
+                if date is not None:
+                    return date
+            return None
+        finally:
+            for future in futures:
+                future.cancel()
+
+    def extract(self, image):
+        """
+        Extract the date from the margins of the image.
+
+        :param image: input cv2 image
+        :return: the date found from the first detection from within the image margins or None if note existent
+        """
+        margins = margin_bands(image, self.height_ratio)
+        if self.mode == CONCURRENT:
+            return self.__extract_concurrent(margins)
+        return self.__extract_stitched(margins)
+
+    def shutdown(self):
+        if self.__executor is not None:
+            self.__executor.shutdown(wait=True)
@@ -0,0 +1,68 @@
+import bisect
+import threading
+
+# upper bounds in seconds of the latency histogram buckets, the last bucket is unbounded
+DEFAULT_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class LatencyHistogram:
+    """
+    Thread safe cumulative histogram of latencies, in seconds.
+    """
+
+    def __init__(self, buckets=DEFAULT_LATENCY_BUCKETS) -> None:
+        self.buckets = tuple(sorted(buckets))
+        self.__counts = [0] * (len(self.buckets) + 1)
+        self.__count = 0
+        self.__sum = 0.0
+        self.__lock = threading.Lock()
+
+    def observe(self, seconds):
+        index = bisect.bisect_left(self.buckets, seconds)
+        with self.__lock:
+            self.__counts[index] += 1
+            self.__count += 1
+            self.__sum += seconds
+
+    @property
+    def count(self):
+        return self.__count
+
+    @property
+    def sum(self):
+        return self.__sum
+
+    def quantile(self, q):
+        """
+        Estimate the q quantile as the upper bound of the bucket it falls in.
+
+        :param q: the quantile, between 0 and 1
+        :return: the estimated latency in seconds, None if nothing was observed
+        """
+        with self.__lock:
+            counts = list(self.__counts)
+            total = self.__count
+        if total == 0:
+            return None
+        rank = q * total
+        cumulative = 0
+        for (index, count) in enumerate(counts):
+            cumulative += count
+            if cumulative >= rank and count > 0:
+                return self.buckets[index] if index < len(self.buckets) else float('inf')
+        return float('inf')
+
+    def snapshot(self):
+        """
+        :return: dict with the cumulative bucket counts keyed by their upper bound, the count and the sum
+        """
+        with self.__lock:
+            counts = list(self.__counts)
+            total = self.__count
+            seconds = self.__sum
+        cumulative = 0
+        buckets = {}
+        for (bound, count) in zip(list(self.buckets) + ['+Inf'], counts):
+            cumulative += count
+            buckets[str(bound)] = cumulative
+        return {'buckets': buckets, 'count': total, 'sum': seconds}
@@ -0,0 +1,121 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+
+class MicroBatcher:
+    """
+    Gathers the items submitted by many callers into batches, processed by a single worker thread.
+    A batch is processed once it holds max_batch_size items, or max_latency seconds after its first item
+    arrived, whichever comes first. Every caller gets a Future of the result of its own item.
+    """
+
+    def __init__(self, process_batch, max_batch_size=8, max_latency=0.05, name='micro-batcher') -> None:
+        """
+        :param process_batch: function(list of items) -> list of results, in the same order
+        :param max_batch_size: the largest batch
+        :param max_latency: the seconds the first item of a batch waits for the others
+        :param name: the worker thread name
+        """
+        self.process_batch = process_batch
+        self.max_batch_size = max_batch_size
+        self.max_latency = max_latency
+        self.batches = 0
+        self.items = 0
+        self.batch_sizes = [0] * (max_batch_size + 1)
+        self.__queue = queue.Queue()
+        self.__stopped = False
+        self.__thread = threading.Thread(target=self.__run, name=name, daemon=True)
+        self.__thread.start()
+
+    def submit(self, item):
+        """
+        :param item: the item to process within the next batch
+        :return: Future of its result
+        """
+        if self.__stopped:
+            raise RuntimeError('the micro batcher is shut down')
+        future = Future()
+        self.__queue.put((item, future))
+        return future
+
+    def process(self, item, timeout=None):
+        """
+        Process an item within the next batch and wait for its result.
+        """
+        return self.submit(item).result(timeout)
+
+    def queue_depth(self):
+        return self.__queue.qsize()
+
+    def mean_batch_size(self):
+        return self.items / float(self.batches) if self.batches > 0 else 0.0
+
+    def __gather(self):
+        first = self.__queue.get()
+        if first is None:
+            return None
+        batch = [first]
+        deadline = time.monotonic() + self.max_latency
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                entry = self.__queue.get(timeout=remaining) if remaining > 0 else self.__queue.get_nowait()
+            except queue.Empty:
+                break
+            if entry is None:
+                # process the gathered items before stopping
+                self.__queue.put(None)
+                break
+            batch.append(entry)
+        return batch
+
+    def __run(self):
+        while True:
+            batch = self.__gather()
+            if batch is None:
+                return
+            # the callers which gave up waiting are left out
+            batch = [(item, future) for (item, future) in batch if future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            self.batches += 1
+            self.items += len(batch)
+            self.batch_sizes[len(batch)] += 1
+            try:
+                results = list(self.process_batch([item for (item, future) in batch]))
+                if len(results) != len(batch):
+                    # fail every caller, none of the results can be matched with its item
+                    raise ValueError("process_batch returned {0:d} results for {1:d} items".format(
+                        len(results), len(batch)))
+                for ((item, future), result) in zip(batch, results):
+                    future.set_result(result)
+            except Exception as error:
+                for (item, future) in batch:
+                    if not future.done():
+                        future.set_exception(error)
+
+    def stats(self):
+        """
+        :return: dict of the queue depth, the processed batches and items, and the batch size counts
+        """
+        return {'queue_depth': self.queue_depth(), 'batches': self.batches, 'items': self.items,
+                'mean_batch_size': self.mean_batch_size(),
+                'batch_sizes': dict((size, count) for (size, count) in enumerate(self.batch_sizes) if count > 0)}
+
+    def register_metrics(self, metrics, prefix):
+        """
+        Export the queue depth and the batch sizes through an Instrumentation.
+        """
+        metrics.register_gauge(prefix + '_queue_depth', self.queue_depth)
+        metrics.register_gauge(prefix + '_batches', lambda: self.batches)
+        metrics.register_gauge(prefix + '_mean_batch_size', self.mean_batch_size)
+
+    def shutdown(self):
+        """
+        Stop the worker once the queued items are processed.
+        """
+        self.__stopped = True
+        self.__queue.put(None)
+        self.__thread.join()
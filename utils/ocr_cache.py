@@ -0,0 +1,193 @@
+import hashlib
+import shelve
+import threading
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+
+def exact_hash(input_img, namespace=''):
+    """
+    Content hash of the image pixels, shape and type.
+
+    :param input_img: cv2 image
+    :param namespace: prefix keeping the results of different OCR engines apart
+    :return: hex digest
+    """
+    # only the non contiguous crops get copied
+    pixels = np.ascontiguousarray(input_img)
+    digest = hashlib.sha1()
+    digest.update('{0}|{1}|{2}|'.format(namespace, pixels.shape, pixels.dtype).encode())
+    digest.update(pixels.data)
+    return digest.hexdigest()
+
+
+def perceptual_hash(input_img):
+    """
+    64 bit difference hash of the image, near identical crops get hashes a few bits apart.
+
+    :param input_img: cv2 image
+    :return: the hash as an int
+    """
+    gray = cv2.cvtColor(input_img, cv2.COLOR_BGR2GRAY) if input_img.ndim == 3 else input_img
+    small = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return int(np.packbits(bits).view('>u8')[0])
+
+
+def _hamming_distance(hash1, hash2):
+    return bin(hash1 ^ hash2).count('1')
+
+
+class OcrResultCache:
+    """
+    LRU cache of the OCR results keyed by the image content, with an optional on disk store surviving restarts.
+    With perceptual matching, an image missing from the cache can reuse the result of a near identical one.
+    The perceptual hash does not tell apart texts differing by a character, e.g. the binarised CJ16GXS and CJ18GXS
+    plates are 2 bits apart, so it is only safe for images certain to carry the same text, like re-encoded copies
+    of the same frame. Every perceptual lookup also scans all the entries.
+    """
+
+    def __init__(self, max_entries=1024, path=None, perceptual=False, max_distance=4) -> None:
+        """
+        :param max_entries: the maximum number of results kept in memory
+        :param path: the shelve file the results are persisted to, None to only keep them in memory
+        :param perceptual: also look the images up by their perceptual hash, off by default, see the class notes
+        :param max_distance: the maximum number of differing bits for two perceptual hashes to match
+        """
+        self.max_entries = max_entries
+        self.perceptual = perceptual
+        self.max_distance = max_distance
+
+        # exact hash -> (namespace, perceptual hash, texts)
+        self.__entries = OrderedDict()
+        self.__store = shelve.open(path) if path is not None else None
+        self.__lock = threading.Lock()
+
+        self.hits = 0
+        self.perceptual_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __remember(self, key, entry):
+        self.__entries[key] = entry
+        self.__entries.move_to_end(key)
+        while len(self.__entries) > self.max_entries:
+            self.__entries.popitem(last=False)
+            self.evictions += 1
+
+    def get(self, input_img, namespace=''):
+        """
+        Look up the OCR result of the image.
+
+        :param input_img: cv2 image
+        :param namespace: the OCR engine namespace
+        :return: the cached list of texts, None on a miss
+        """
+        key = exact_hash(input_img, namespace)
+        with self.__lock:
+            entry = self.__entries.get(key)
+            if entry is not None:
+                self.__entries.move_to_end(key)
+                self.hits += 1
+                return entry[2]
+
+            if self.__store is not None and key in self.__store:
+                entry = self.__store[key]
+                self.__remember(key, entry)
+                self.disk_hits += 1
+                return entry[2]
+
+        if self.perceptual:
+            phash = perceptual_hash(input_img)
+            with self.__lock:
+                for (other_key, (other_namespace, other_phash, texts)) in self.__entries.items():
+                    if other_namespace == namespace and other_phash is not None \
+                            and _hamming_distance(phash, other_phash) <= self.max_distance:
+                        self.__entries.move_to_end(other_key)
+                        self.perceptual_hits += 1
+                        return texts
+
+        with self.__lock:
+            self.misses += 1
+        return None
+
+    def put(self, input_img, texts, namespace=''):
+        """
+        Store the OCR result of the image. The empty results are only kept in memory, an image without text
+        today may be read by a retry or a better engine after a restart.
+
+        :param input_img: cv2 image
+        :param texts: the list of detected texts
+        :param namespace: the OCR engine namespace
+        """
+        key = exact_hash(input_img, namespace)
+        phash = perceptual_hash(input_img) if self.perceptual else None
+        entry = (namespace, phash, texts)
+        with self.__lock:
+            self.__remember(key, entry)
+            if self.__store is not None and texts:
+                self.__store[key] = entry
+
+    def clear(self):
+        """
+        Forget the results kept in memory, the on disk store is kept.
+        """
+        with self.__lock:
+            self.__entries.clear()
+
+    def stats(self):
+        """
+        :return: dict of the hit and miss counters and the hit rate
+        """
+        found = self.hits + self.perceptual_hits + self.disk_hits
+        lookups = found + self.misses
+        return {'hits': self.hits, 'perceptual_hits': self.perceptual_hits, 'disk_hits': self.disk_hits,
+                'misses': self.misses, 'evictions': self.evictions, 'entries': len(self.__entries),
+                'hit_rate': found / float(lookups) if lookups > 0 else 0.0}
+
+    def close(self):
+        with self.__lock:
+            if self.__store is not None:
+                self.__store.close()
+                self.__store = None
+
+
+class CachedOcr:
+    """
+    Puts an OcrResultCache in front of a text detector, only the cache misses reach the detector.
+    The failed detections, answered as None by the detector, are not cached and come out as no text.
+    """
+
+    def __init__(self, text_detector, cache, namespace='vision') -> None:
+        """
+        :param text_detector: the wrapped detector, with detect_texts and optionally detect_texts_batch
+        :param cache: the OcrResultCache
+        :param namespace: the namespace of the detector results within the cache
+        """
+        self.text_detector = text_detector
+        self.cache = cache
+        self.namespace = namespace
+
+    def detect_texts(self, input_img, **kwargs):
+        texts = self.cache.get(input_img, self.namespace)
+        if texts is None:
+            texts = self.text_detector.detect_texts(input_img, **kwargs)
+            self.cache.put(input_img, texts, self.namespace)
+        return texts
+
+    def detect_texts_batch(self, input_imgs, **kwargs):
+        results = [self.cache.get(input_img, self.namespace) for input_img in input_imgs]
+        missing = [i for (i, texts) in enumerate(results) if texts is None]
+        if missing:
+            detected = self.text_detector.detect_texts_batch([input_imgs[i] for i in missing], **kwargs)
+            for (i, texts) in zip(missing, detected):
+                if texts is None:
+                    # a failed request, retried the next time the image is seen
+                    results[i] = []
+                    continue
+                self.cache.put(input_imgs[i], texts, self.namespace)
+                results[i] = texts
+        return results
@@ -0,0 +1,265 @@
+from collections import Counter
+
+
+def edit_distance(text1, text2):
+    """
+    Levenshtein distance between the two texts.
+    """
+    previous = list(range(len(text2) + 1))
+    for (i, char1) in enumerate(text1, 1):
+        current = [i]
+        for (j, char2) in enumerate(text2, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char1 != char2)))
+        previous = current
+    return previous[-1]
+
+
+class ConsolidatedPlate:
+    """
+    The number plate voted from all the readings of the same plate.
+    """
+
+    def __init__(self, plate, confidence, readings, first_frame, last_frame, payload=None) -> None:
+        self.plate = plate
+        self.confidence = confidence
+        self.readings = readings
+        self.first_frame = first_frame
+        self.last_frame = last_frame
+        self.payload = payload
+
+    def __repr__(self) -> str:
+        return 'ConsolidatedPlate({0}, confidence={1:.2f}, readings={2:d})'.format(self.plate, self.confidence,
+                                                                                   self.readings)
+
+
+class _PlateTrack:
+    def __init__(self) -> None:
+        # (frame index, plate, position, payload, box)
+        self.readings = []
+        # the voted plate once emitted
+        self.emitted = None
+        # the frame, position and box the settled vehicle was last seen at, without being read again
+        self.seen_frame = None
+        self.seen_position = None
+        self.seen_box = None
+        # the settled vehicle is followed until a disagreeing reading is found at its place
+        self.followed = True
+        self.skipped = 0
+
+    @property
+    def last_frame(self):
+        return max(self.readings[-1][0], self.seen_frame if self.seen_frame is not None else -1)
+
+    def __latest(self, seen, field):
+        if seen is not None and self.seen_frame >= self.readings[-1][0]:
+            return seen
+        for reading in reversed(self.readings):
+            if reading[field] is not None:
+                return reading[field]
+        return None
+
+    @property
+    def position(self):
+        return self.__latest(self.seen_position, 2)
+
+    @property
+    def box(self):
+        return self.__latest(self.seen_box, 4)
+
+    def vote(self):
+        """
+        Vote the plate character by character, among the readings of the most frequent length.
+
+        :return: the ConsolidatedPlate
+        """
+        plates = [reading[1] for reading in self.readings]
+        length, length_votes = Counter(len(plate) for plate in plates).most_common(1)[0]
+        same_length = [plate for plate in plates if len(plate) == length]
+
+        chars = []
+        agreement = 0.0
+        for i in range(length):
+            char, votes = Counter(plate[i] for plate in same_length).most_common(1)[0]
+            chars.append(char)
+            agreement += votes / float(len(same_length))
+        confidence = (agreement / length) * (length_votes / float(len(plates))) if length else 0.0
+
+        return ConsolidatedPlate("".join(chars), confidence, len(plates), self.readings[0][0], self.readings[-1][0],
+                                 self.readings[-1][3])
+
+
+def _distance(position1, position2):
+    return ((position1[0] - position2[0]) ** 2 + (position1[1] - position2[1]) ** 2) ** 0.5
+
+
+def _diagonal(box):
+    return _distance(box[:2], box[2:])
+
+
+def _iou(box1, box2):
+    """
+    Intersection over union of two (x1, y1, x2, y2) boxes.
+    """
+    width = min(box1[2], box2[2]) - max(box1[0], box2[0])
+    height = min(box1[3], box2[3]) - max(box1[1], box2[1])
+    intersection = max(0, width) * max(0, height)
+    union = (box1[2] - box1[0]) * (box1[3] - box1[1]) + (box2[2] - box2[0]) * (box2[3] - box2[1]) - intersection
+    return intersection / float(union) if union > 0 else 0.0
+
+
+class PlateConsensus:
+    """
+    Groups the readings of the same number plate across nearby frames, by edit distance and position,
+    and emits a single voted plate once enough readings agree.
+    The vehicle of an emitted plate is settled, its OCR stops while it stays in place. Every vehicle is matched
+    with the settled plate whose box it overlaps the most, so a neighbouring vehicle is not taken for it. Another
+    vehicle may stop at the same place, at a gate or toll camera, so the settled vehicle is read again when its box
+    jumps and every few frames, and stops being settled when a reading at its place disagrees with its plate.
+    """
+
+    def __init__(self, min_readings=3, min_confidence=0.6, max_edit_distance=2, max_frame_gap=4,
+                 max_position_distance=150.0, max_position_ratio=0.5, min_box_iou=0.5, reverify_every=5) -> None:
+        """
+        :param min_readings: the readings needed before a plate is emitted
+        :param min_confidence: the voting confidence needed before a plate is emitted
+        :param max_edit_distance: the maximum edit distance of two readings of the same plate
+        :param max_frame_gap: the frames after which a plate without new readings is closed
+        :param max_position_distance: the maximum distance in pixels of two readings of the same plate,
+            for the readings without a vehicle box
+        :param max_position_ratio: the maximum distance of two readings of the same plate, relative to the
+            diagonal of the vehicle box
+        :param min_box_iou: the settled vehicle box overlapping its previous box less than this is read again
+        :param reverify_every: the settled vehicle is read again after skipping its OCR in this many frames
+        """
+        self.min_readings = min_readings
+        self.min_confidence = min_confidence
+        self.max_edit_distance = max_edit_distance
+        self.max_frame_gap = max_frame_gap
+        self.max_position_distance = max_position_distance
+        self.max_position_ratio = max_position_ratio
+        self.min_box_iou = min_box_iou
+        self.reverify_every = reverify_every
+        self.__tracks = []
+        self.__closed = []
+
+    def __is_near(self, track, position, box=None):
+        track_position = track.position
+        if position is None or track_position is None:
+            return True
+        boxes = [value for value in (box, track.box) if value is not None]
+        # the vehicles close to the camera move more pixels between the frames than the distant ones
+        max_distance = self.max_position_ratio * max(_diagonal(value) for value in boxes) if boxes \
+            else self.max_position_distance
+        return _distance(position, track_position) <= max_distance
+
+    def __expire(self, frame_index):
+        active = []
+        for track in self.__tracks:
+            if frame_index - track.last_frame > self.max_frame_gap:
+                self.__closed.append(track)
+            else:
+                active.append(track)
+        self.__tracks = active
+
+    def add(self, frame_index, plate, position=None, payload=None, box=None):
+        """
+        Add a plate reading.
+
+        :param frame_index: the index of the frame the plate was read in
+        :param plate: the plate text
+        :param position: optional (x, y) center of the vehicle within the frame
+        :param payload: optional data kept with the reading, the latest one is given back with the voted plate
+        :param box: optional (x1, y1, x2, y2) box of the vehicle within the frame
+        :return: the ConsolidatedPlate if this reading completes the evidence of its plate, None otherwise
+        """
+        self.__expire(frame_index)
+
+        best_track = None
+        best_distance = None
+        for track in self.__tracks:
+            if not self.__is_near(track, position, box):
+                continue
+            distance = min(edit_distance(plate, reading[1]) for reading in track.readings)
+            if distance <= self.max_edit_distance and (best_distance is None or distance < best_distance):
+                best_track = track
+                best_distance = distance
+
+        if best_track is None:
+            # a different plate read at the place of a settled vehicle, the vehicle has left
+            for track in self.__tracks:
+                if track.emitted and self.__is_near(track, position, box):
+                    track.followed = False
+            best_track = _PlateTrack()
+            self.__tracks.append(best_track)
+        elif best_track.emitted:
+            # the settled vehicle read again, followed from the box of this reading
+            best_track.followed = True
+        best_track.readings.append((frame_index, plate, position, payload, box))
+
+        if not best_track.emitted and len(best_track.readings) >= self.min_readings:
+            voted = best_track.vote()
+            if voted.confidence >= self.min_confidence:
+                best_track.emitted = voted
+                return voted
+        return None
+
+    def is_settled(self, frame_index, position, box=None):
+        """
+        Check if the plate of the vehicle at the position was already emitted, so OCR can stop for it.
+
+        :param frame_index: the index of the current frame
+        :param position: (x, y) center of the vehicle within the frame
+        :param box: optional (x1, y1, x2, y2) box of the vehicle, a jump of the box ends the settled state
+        :return: True if an emitted plate was read near the position within the last frames
+        """
+        self.__expire(frame_index)
+        best_track = None
+        best_overlap = None
+        for track in self.__tracks:
+            # a settled vehicle is only the one vehicle of a frame
+            if not track.emitted or not track.followed or track.seen_frame == frame_index \
+                    or track.position is None or not self.__is_near(track, position, box):
+                continue
+            track_box = track.box
+            overlap = _iou(box, track_box) if box is not None and track_box is not None \
+                else -_distance(position, track.position)
+            if best_overlap is None or overlap > best_overlap:
+                best_track = track
+                best_overlap = overlap
+        if best_track is None:
+            return False
+        if box is not None and best_track.box is not None and best_overlap < self.min_box_iou:
+            # the box jumped, another vehicle may have taken the place of the settled one, its reading tells
+            return False
+        if best_track.skipped >= self.reverify_every:
+            best_track.skipped = 0
+            return False
+        # keep following the vehicle while it stays in the frames
+        best_track.skipped += 1
+        best_track.seen_frame = frame_index
+        best_track.seen_position = position
+        best_track.seen_box = box
+        return True
+
+    def flush(self):
+        """
+        Close all the plates and vote the ones never emitted. They need the same evidence as the emitted plates,
+        e.g. after min_readings was lowered, and the ones within the edit distance of an emitted plate are dropped
+        as the readings of the same plate.
+
+        :return: the list of ConsolidatedPlate not emitted yet
+        """
+        tracks = self.__closed + self.__tracks
+        self.__closed = []
+        self.__tracks = []
+        emitted = [track.emitted.plate for track in tracks if track.emitted]
+        consolidated = []
+        # the plates with the most readings first, their duplicates are dropped
+        for track in sorted((track for track in tracks if not track.emitted), key=lambda track: -len(track.readings)):
+            voted = track.vote()
+            if voted.readings < self.min_readings or voted.confidence < self.min_confidence \
+                    or any(edit_distance(voted.plate, plate) <= self.max_edit_distance for plate in emitted):
+                continue
+            emitted.append(voted.plate)
+            consolidated.append(voted)
+        return consolidated
@@ -0,0 +1,139 @@
+from utils.text_filter import PLATE_GRAMMARS
+
+# The characters OCR engines read instead of the right one: read character -> {right character: likelihood}
+CONFUSIONS = {
+    # digits read instead of letters
+    "0": {"O": 0.9, "D": 0.6, "Q": 0.5},
+    "1": {"I": 0.8, "L": 0.5},
+    "2": {"Z": 0.7},
+    "4": {"A": 0.6},
+    "5": {"S": 0.8},
+    "6": {"G": 0.7},
+    "7": {"T": 0.6},
+    "8": {"B": 0.8},
+    # letters read instead of digits
+    "O": {"0": 0.9},
+    "D": {"0": 0.7},
+    "Q": {"0": 0.6},
+    "U": {"0": 0.5},
+    "I": {"1": 0.8, "J": 0.7},
+    "L": {"1": 0.6},
+    "Z": {"2": 0.7},
+    "A": {"4": 0.6},
+    "S": {"5": 0.8},
+    "G": {"6": 0.7},
+    "T": {"7": 0.6},
+    "B": {"8": 0.8},
+    # letters read instead of letters
+    "J": {"I": 0.6},
+}
+
+LETTER = "@"
+DIGIT = "#"
+REGION = "R"
+
+
+def _is_allowed(slot, char):
+    if slot == LETTER:
+        return char.isalpha()
+    if slot == DIGIT:
+        return char.isdigit()
+    return char == slot
+
+
+class PlateCorrector:
+    """
+    Corrects the OCR confusions of the number plate texts, position by position.
+    Every template position only allows a letter, a digit, a region code letter or a literal character,
+    so the confused characters are replaced with the allowed ones they are known to be misread for.
+    The templates are the "templates" of the PLATE_GRAMMARS countries, using @ for a letter, # for a digit,
+    R for a region code letter and any other character as itself.
+    """
+
+    def __init__(self, countries=("RO",), confusions=CONFUSIONS, max_corrections=3, boundary_penalty=0.5,
+                 correction_penalty=0.9) -> None:
+        """
+        :param countries: the PLATE_GRAMMARS countries to correct the plates of
+        :param confusions: the confusion table
+        :param max_corrections: the maximum number of characters replaced within a plate
+        :param boundary_penalty: the score factor of every alphanumeric character touching the plate,
+            so that a plate consuming the whole text wins over a shorter one within it
+        :param correction_penalty: the score factor of every replaced character, on top of its likelihood,
+            so that a word bent into a plate by several replacements scores low
+        """
+        self.confusions = confusions
+        self.max_corrections = max_corrections
+        self.boundary_penalty = boundary_penalty
+        self.correction_penalty = correction_penalty
+        self.templates = []
+        for country in countries:
+            grammar = PLATE_GRAMMARS[country]
+            regions = frozenset(grammar.get("regions", []))
+            for template in grammar.get("templates", []):
+                self.templates.append((template, regions))
+
+    def __options(self, slot, char):
+        """
+        :return: the list of (character, likelihood, corrected) the read character can stand for at the slot
+        """
+        options = []
+        if _is_allowed(slot, char):
+            options.append((char, 1.0, False))
+        for (right, likelihood) in self.confusions.get(char, {}).items():
+            if _is_allowed(slot, right):
+                options.append((right, likelihood, True))
+        return options
+
+    def __match(self, window, template, regions):
+        """
+        Find the best reading of the window following the template.
+
+        :return: tuple (plate, likelihood) or (None, 0.0)
+        """
+        # (text, likelihood, corrections) of the partial readings
+        readings = [("", 1.0, 0)]
+        for (slot, char) in zip(template, window):
+            if slot == REGION:
+                slot = LETTER
+            next_readings = []
+            for (right, likelihood, corrected) in self.__options(slot, char):
+                for (text, text_likelihood, corrections) in readings:
+                    if corrections + corrected <= self.max_corrections:
+                        penalty = self.correction_penalty if corrected else 1.0
+                        next_readings.append((text + right, text_likelihood * likelihood * penalty,
+                                              corrections + corrected))
+            if not next_readings:
+                return None, 0.0
+            readings = next_readings
+
+        region_positions = [i for (i, slot) in enumerate(template) if slot == REGION]
+        best = (None, 0.0)
+        for (text, likelihood, corrections) in readings:
+            if region_positions and "".join(text[i] for i in region_positions) not in regions:
+                continue
+            if likelihood > best[1]:
+                best = (text, likelihood)
+        return best
+
+    def correct(self, text):
+        """
+        Find the most likely number plate within an OCR text.
+
+        :param text: the detected text
+        :return: tuple (plate, score between 0 and 1) or (None, 0.0) if no plate can be read
+        """
+        text = "".join(char for char in text.upper() if char.isalnum())
+
+        best = (None, 0.0)
+        for (template, regions) in self.templates:
+            length = len(template)
+            for start in range(0, len(text) - length + 1):
+                plate, likelihood = self.__match(text[start:start + length], template, regions)
+                if plate is None:
+                    continue
+                # the characters touching the plate make it less likely to be the whole plate
+                touching = (start > 0) + (start + length < len(text))
+                score = likelihood * (self.boundary_penalty ** touching)
+                if score > best[1]:
+                    best = (plate, score)
+        return best
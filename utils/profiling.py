@@ -0,0 +1,314 @@
+import cProfile
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+SAMPLE = 'sample'
+DETERMINISTIC = 'cprofile'
+
+DEFAULT_SAMPLE_INTERVAL = 0.005
+DEFAULT_OUTPUT_DIR = 'profile'
+
+
+def _cpu_times():
+    """
+    :return: tuple (calling thread CPU, whole process CPU, reaped child processes CPU) seconds
+    """
+    times = os.times()
+    return time.thread_time(), time.process_time(), times.children_user + times.children_system
+
+
+class _Clock:
+    """
+    The wall and CPU times elapsed since its start.
+    The wall time not spent on the CPU of the calling thread is time blocked on I/O, locks or other threads,
+    the child processes CPU time is the pytesseract subprocesses work.
+    """
+    __slots__ = ('wall', 'thread_cpu', 'process_cpu', 'children_cpu')
+
+    def __init__(self) -> None:
+        self.wall = time.perf_counter()
+        self.thread_cpu, self.process_cpu, self.children_cpu = _cpu_times()
+
+    def elapsed(self):
+        thread_cpu, process_cpu, children_cpu = _cpu_times()
+        wall = time.perf_counter() - self.wall
+        thread_cpu -= self.thread_cpu
+        return {'wall': wall, 'cpu': thread_cpu, 'blocked': max(0.0, wall - thread_cpu),
+                'process_cpu': process_cpu - self.process_cpu, 'children_cpu': children_cpu - self.children_cpu}
+
+
+def _frame_name(frame):
+    code = frame.f_code
+    return '{0}:{1}'.format(os.path.basename(code.co_filename), code.co_name)
+
+
+class StackSampler:
+    """
+    Samples the Python stacks of the running threads at a fixed interval, from a daemon thread,
+    and counts them in the collapsed stacks format of the flame graph tools:
+    root;caller;callee count
+
+    The root of every stack is the pipeline stage its thread was in, or the thread name outside the stages.
+    A sampled stack stands for wall time: a thread blocked on a socket, a lock or a subprocess is sampled too.
+    """
+
+    def __init__(self, interval=DEFAULT_SAMPLE_INTERVAL, stage_of=None, all_threads=True) -> None:
+        """
+        :param interval: the seconds between two samples
+        :param stage_of: function(thread id) -> the current stage name or None
+        :param all_threads: sample the worker threads too, not only the thread starting the sampler
+        """
+        self.interval = interval
+        self.stage_of = stage_of
+        self.all_threads = all_threads
+        self.stacks = Counter()
+        self.samples = 0
+        self.__thread_id = None
+        self.__stopped = threading.Event()
+        self.__thread = None
+
+    def start(self):
+        self.__thread_id = threading.get_ident()
+        self.__stopped.clear()
+        self.__thread = threading.Thread(target=self.__run, name='stack-sampler', daemon=True)
+        self.__thread.start()
+
+    def stop(self):
+        if self.__thread is not None:
+            self.__stopped.set()
+            self.__thread.join()
+            self.__thread = None
+
+    def __sample(self):
+        own_id = threading.get_ident()
+        names = dict((thread.ident, thread.name) for thread in threading.enumerate())
+        for (thread_id, frame) in sys._current_frames().items():
+            if thread_id == own_id or (not self.all_threads and thread_id != self.__thread_id):
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(_frame_name(frame))
+                frame = frame.f_back
+            stage = self.stage_of(thread_id) if self.stage_of is not None else None
+            root = stage if stage is not None else names.get(thread_id, str(thread_id))
+            self.stacks[root + ';' + ';'.join(reversed(stack))] += 1
+        self.samples += 1
+
+    def __run(self):
+        while not self.__stopped.wait(self.interval):
+            self.__sample()
+
+    def write(self, path):
+        with open(path, 'w') as file:
+            for (stack, count) in self.stacks.most_common():
+                file.write('{0} {1:d}\n'.format(stack, count))
+
+
+class _StageTimer:
+    __slots__ = ('profiler', 'name', 'clock')
+
+    def __init__(self, profiler, name) -> None:
+        self.profiler = profiler
+        self.name = name
+        self.clock = None
+
+    def __enter__(self):
+        self.profiler._enter_stage(self.name)
+        self.clock = _Clock()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.profiler._exit_stage(self.name, self.clock.elapsed())
+        return False
+
+
+class _NullStage:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+class FrameProfiler:
+    """
+    Profiles a window of frames of the pipeline, either by sampling the stacks or with cProfile,
+    and breaks down the wall and CPU time of every profiled frame by stage.
+
+    Output files, within the output directory:
+    - stacks.collapsed: the sampled stacks, rooted at their stage (sample mode), for flamegraph.pl or speedscope
+    - cprofile.prof: the pstats file of the profiled frames (cprofile mode)
+    - frames.json: the wall, CPU and blocked time of every profiled frame and of its stages
+    """
+
+    def __init__(self, mode=SAMPLE, first_frame=1, frames=20, output_dir=DEFAULT_OUTPUT_DIR,
+                 interval=DEFAULT_SAMPLE_INTERVAL) -> None:
+        """
+        :param mode: SAMPLE for the low overhead stack sampling, DETERMINISTIC for cProfile
+        :param first_frame: the index of the first profiled frame
+        :param frames: the number of profiled frames
+        :param output_dir: the directory the profile files are written into
+        :param interval: the seconds between two stack samples
+        """
+        self.mode = mode
+        self.first_frame = first_frame
+        self.last_frame = first_frame + frames - 1
+        self.output_dir = output_dir
+        self.frames = []
+        self.__stages = {}
+        self.__frame = None
+        self.__clock = None
+        self.__started = False
+        self.__sampler = StackSampler(interval, stage_of=self.__current_stage) if mode == SAMPLE else None
+        self.__profile = cProfile.Profile() if mode == DETERMINISTIC else None
+
+    def __current_stage(self, thread_id):
+        stages = self.__stages.get(thread_id)
+        return stages[-1] if stages else None
+
+    def is_profiling(self):
+        return self.__frame is not None
+
+    def start_frame(self, index):
+        """
+        Start a frame, it is profiled if its index is within the profiled window.
+        """
+        if not self.first_frame <= index <= self.last_frame:
+            return
+        if not self.__started:
+            self.__started = True
+            if self.__sampler is not None:
+                self.__sampler.start()
+        self.__frame = {'frame': index, 'stages': {}}
+        if self.__profile is not None:
+            self.__profile.enable()
+        self.__clock = _Clock()
+
+    def end_frame(self):
+        if self.__frame is None:
+            return
+        self.__frame.update(self.__clock.elapsed())
+        if self.__profile is not None:
+            self.__profile.disable()
+        self.frames.append(self.__frame)
+        print("[PROFILE] frame {0:d}: {1:.3f}s wall, {2:.3f}s CPU, {3:.3f}s blocked".format(
+            self.__frame['frame'], self.__frame['wall'], self.__frame['cpu'], self.__frame['blocked']))
+        self.__frame = None
+        if self.frames[-1]['frame'] >= self.last_frame:
+            self.finish()
+
+    def stage(self, name):
+        """
+        :param name: the stage name
+        :return: context manager timing the stage within the profiled frame
+        """
+        if self.__frame is None:
+            return _NULL_STAGE
+        return _StageTimer(self, name)
+
+    def _enter_stage(self, name):
+        self.__stages.setdefault(threading.get_ident(), []).append(name)
+
+    def _exit_stage(self, name, elapsed):
+        self.__stages[threading.get_ident()].pop()
+        if self.__frame is None:
+            return
+        totals = self.__frame['stages'].setdefault(name, dict((key, 0.0) for key in elapsed))
+        for (key, value) in elapsed.items():
+            totals[key] += value
+
+    def finish(self):
+        """
+        Stop the profiling and write the profile files, once.
+        """
+        if not self.__started:
+            return
+        self.__started = False
+        self.first_frame = self.last_frame + 1
+        os.makedirs(self.output_dir, exist_ok=True)
+        if self.__sampler is not None:
+            self.__sampler.stop()
+            self.__sampler.write(os.path.join(self.output_dir, 'stacks.collapsed'))
+        if self.__profile is not None:
+            self.__profile.dump_stats(os.path.join(self.output_dir, 'cprofile.prof'))
+        with open(os.path.join(self.output_dir, 'frames.json'), 'w') as file:
+            json.dump({'mode': self.mode, 'frames': self.frames, 'stages': self.summary()}, file, indent=2)
+        print("[PROFILE] {0:d} frames profiled into {1}".format(len(self.frames), self.output_dir))
+
+    def summary(self):
+        """
+        :return: dict of stage name -> total wall, CPU and blocked seconds over the profiled frames
+        """
+        totals = {}
+        for frame in self.frames:
+            for (name, stage) in frame['stages'].items():
+                stage_totals = totals.setdefault(name, dict((key, 0.0) for key in stage))
+                for (key, value) in stage.items():
+                    stage_totals[key] += value
+        return totals
+
+
+class ProfiledInstrumentation:
+    """
+    Instrumentation whose stage spans are also timed by the FrameProfiler.
+    """
+
+    def __init__(self, instrumentation, profiler) -> None:
+        self.instrumentation = instrumentation
+        self.profiler = profiler
+
+    def span(self, name):
+        return _ProfiledSpan(self.instrumentation.span(name), self.profiler.stage(name))
+
+    def __getattr__(self, name):
+        return getattr(self.instrumentation, name)
+
+
+class _ProfiledSpan:
+    __slots__ = ('span', 'stage')
+
+    def __init__(self, span, stage) -> None:
+        self.span = span
+        self.stage = stage
+
+    def __enter__(self):
+        self.span.__enter__()
+        self.stage.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stage.__exit__(exc_type, exc_value, traceback)
+        return self.span.__exit__(exc_type, exc_value, traceback)
+
+
+def add_profile_arguments(parser):
+    """
+    Add the --profile arguments to the argparse parser of a pipeline entry point.
+    """
+    parser.add_argument("--profile", nargs="?", const=SAMPLE, choices=[SAMPLE, DETERMINISTIC],
+                        help="profile a window of frames, by sampling the stacks (default) or with cProfile")
+    parser.add_argument("--profile-start", type=int, default=1, help="the first profiled frame")
+    parser.add_argument("--profile-frames", type=int, default=20, help="the number of profiled frames")
+    parser.add_argument("--profile-output", default=DEFAULT_OUTPUT_DIR, help="the profile output directory")
+    parser.add_argument("--profile-interval", type=float, default=DEFAULT_SAMPLE_INTERVAL,
+                        help="the seconds between two stack samples")
+
+
+def create_profiler(args):
+    """
+    :param args: the parsed arguments of add_profile_arguments
+    :return: the FrameProfiler or None if profiling was not asked for
+    """
+    if args.profile is None:
+        return None
+    return FrameProfiler(args.profile, args.profile_start, args.profile_frames, args.profile_output,
+                         args.profile_interval)
@@ -0,0 +1,330 @@
+"""
+CPU thread budget of the pipeline workers.
+
+TensorFlow (the Keras YOLO model), OpenCV (cv2.dnn EAST and the contour work) and Tesseract (OpenMP) each start
+their own thread pools, sized for the whole host. With several workers per host they oversubscribe the CPUs.
+The budget gives every worker a number of threads, shared by all the libraries, and optionally pins it to its
+own CPUs. The environment variables must be set before TensorFlow and the BLAS libraries are loaded, so the
+budget is applied before importing the pipeline:
+
+    from utils import runtime_config
+    runtime_config.apply_runtime_config(runtime_config.load_runtime_config())
+    import npr_pipeline
+
+The best workers x threads split of a host is found with:
+    python -m utils.runtime_config calibrate --seconds 20 --output runtime_config.json
+
+The calibration runs its workers unpinned, as the pipeline processes run. Its "workers" is the number of
+pipeline processes worth starting on the host, e.g. service instances on consecutive ports. A configuration
+with "cpus" pins the processes, and a worker started with NPR_WORKER_INDEX gets its own share of them.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import queue
+import sys
+import time
+
+RUNTIME_CONFIG_PATH = "runtime_config.json"
+RUNTIME_CONFIG_ENV = "NPR_RUNTIME_CONFIG"
+WORKER_INDEX_ENV = "NPR_WORKER_INDEX"
+
+# the seconds the calibration workers may take for loading and warming up their models, on top of their window
+CALIBRATION_STARTUP_SECONDS = 300.0
+# the seconds between the checks of the calibration workers while waiting for their reports
+CALIBRATION_POLL_SECONDS = 1.0
+
+# the thread pool sizes read by the libraries when they are loaded
+THREAD_ENV_VARIABLES = ["OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS", "NUMEXPR_NUM_THREADS",
+                        "TF_NUM_INTRAOP_THREADS"]
+
+
+class ThreadBudget:
+    """
+    The threads and CPUs given to a pipeline worker.
+    """
+
+    def __init__(self, threads, inter_op_threads=1, cpus=None) -> None:
+        """
+        :param threads: the threads of every library pool: TensorFlow intra op, OpenCV, OpenMP and BLAS
+        :param inter_op_threads: the TensorFlow threads running independent operations concurrently
+        :param cpus: optional list of the CPU ids the worker is pinned to
+        """
+        self.threads = threads
+        self.inter_op_threads = inter_op_threads
+        self.cpus = list(cpus) if cpus is not None else None
+
+    def to_dict(self):
+        return {"threads": self.threads, "inter_op_threads": self.inter_op_threads, "cpus": self.cpus}
+
+    def __repr__(self) -> str:
+        return 'ThreadBudget(threads={0:d}, inter_op_threads={1:d}, cpus={2})'.format(self.threads,
+                                                                                      self.inter_op_threads, self.cpus)
+
+
+def available_cpus():
+    try:
+        return sorted(os.sched_getaffinity(0))
+    except AttributeError:
+        return list(range(os.cpu_count() or 1))
+
+
+def worker_cpus(worker_index, threads, cpus=None):
+    """
+    Split the CPUs between the workers, each worker gets its own threads CPUs.
+
+    :param worker_index: the index of the worker
+    :param threads: the threads of every worker
+    :param cpus: the CPU ids to split, the available ones if None
+    :return: the CPU ids of the worker, wrapping around when there are more threads than CPUs
+    """
+    cpus = available_cpus() if cpus is None else list(cpus)
+    start = worker_index * threads
+    return [cpus[(start + i) % len(cpus)] for i in range(threads)]
+
+
+def _apply_tensorflow(budget):
+    tensorflow = sys.modules.get("tensorflow")
+    if tensorflow is None:
+        # the environment variables apply when TensorFlow is loaded later
+        return "environment"
+    if hasattr(tensorflow, "config") and hasattr(tensorflow.config, "threading"):
+        try:
+            tensorflow.config.threading.set_intra_op_parallelism_threads(budget.threads)
+            tensorflow.config.threading.set_inter_op_parallelism_threads(budget.inter_op_threads)
+            return "config"
+        except RuntimeError:
+            # TensorFlow 2 cannot change its pools once they are running
+            return "already_initialised"
+    # TensorFlow 1 with the standalone Keras backend, the session pools are set when the session is created
+    import keras.backend as K
+    config = tensorflow.ConfigProto(intra_op_parallelism_threads=budget.threads,
+                                    inter_op_parallelism_threads=budget.inter_op_threads)
+    K.set_session(tensorflow.Session(config=config))
+    return "session"
+
+
+def apply_thread_budget(budget):
+    """
+    Apply the thread budget to the current process.
+
+    :param budget: the ThreadBudget
+    :return: dict of the settings in effect after the budget was applied
+    """
+    for variable in THREAD_ENV_VARIABLES:
+        os.environ[variable] = str(budget.threads)
+    os.environ["TF_NUM_INTEROP_THREADS"] = str(budget.inter_op_threads)
+    # Tesseract 4 starts its own OpenMP pools, also in its pytesseract subprocesses, they stay within the budget
+    os.environ["OMP_THREAD_LIMIT"] = str(budget.threads)
+
+    if budget.cpus is not None and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, budget.cpus)
+
+    import cv2
+    cv2.setNumThreads(budget.threads)
+
+    settings = current_settings()
+    settings["tensorflow"] = _apply_tensorflow(budget)
+    if settings["opencv_threads"] != budget.threads:
+        print("[RUNTIME] OpenCV kept {0:d} threads instead of {1:d}".format(settings["opencv_threads"],
+                                                                           budget.threads))
+    print("[RUNTIME] " + str(budget) + " applied, TensorFlow " + settings["tensorflow"])
+    return settings
+
+
+def current_settings():
+    """
+    :return: dict of the thread settings of the libraries in the current process
+    """
+    import cv2
+    return {
+        "opencv_threads": cv2.getNumThreads(),
+        "environment": dict((variable, os.environ.get(variable)) for variable in THREAD_ENV_VARIABLES),
+        "cpus": available_cpus(),
+    }
+
+
+def load_runtime_config(path=None):
+    """
+    Read the runtime configuration written by the calibration.
+
+    :param path: the JSON file, NPR_RUNTIME_CONFIG or runtime_config.json if None
+    :return: the ThreadBudget or None if there is no configuration
+    """
+    path = path if path is not None else os.environ.get(RUNTIME_CONFIG_ENV, RUNTIME_CONFIG_PATH)
+    if not os.path.exists(path):
+        return None
+    with open(path) as file:
+        config = json.load(file)
+    return ThreadBudget(config["threads"], config.get("inter_op_threads", 1), config.get("cpus"))
+
+
+def apply_runtime_config(budget, worker_index=None):
+    """
+    Apply the configured budget, if any.
+
+    :param budget: the ThreadBudget or None
+    :param worker_index: the index of the worker process among the ones sharing the configured CPUs,
+        NPR_WORKER_INDEX if None
+    """
+    if budget is None:
+        return None
+    if worker_index is None and os.environ.get(WORKER_INDEX_ENV):
+        worker_index = int(os.environ[WORKER_INDEX_ENV])
+    if worker_index is not None and budget.cpus is not None:
+        budget = ThreadBudget(budget.threads, budget.inter_op_threads,
+                              worker_cpus(worker_index, budget.threads, budget.cpus))
+    return apply_thread_budget(budget)
+
+
+def _calibration_worker(worker_index, threads, seconds, start_barrier, results):
+    """
+    Run the pipeline stages available on this host in a loop for the given seconds, and report the frames done.
+    A worker always reports, (worker index, frames done, stages) or (worker index, None, error message) when it
+    fails, and a failing worker aborts the start barrier so the other workers do not wait for it.
+    """
+    try:
+        results.put((worker_index,) + _calibration_window(threads, seconds, start_barrier))
+    except Exception as error:
+        start_barrier.abort()
+        results.put((worker_index, None, "{0}: {1}".format(type(error).__name__, error)))
+
+
+def _calibration_window(threads, seconds, start_barrier):
+    """
+    :return: tuple (frames done, stages run on every frame)
+    """
+    apply_thread_budget(ThreadBudget(threads, 1))
+
+    from benchmarks import bench_stages
+    frames = list(bench_stages.load_fixtures(bench_stages.FRAME_FIXTURES).values())
+    vehicles = list(bench_stages.load_fixtures(bench_stages.VEHICLE_FIXTURES).values())
+    if not frames or not vehicles:
+        raise IOError("the calibration fixtures of benchmarks.bench_stages are missing")
+
+    from lpdetection import number_plate_detection
+    nplDetector = number_plate_detection.NumberPlateDetection(top_k=3)
+    stages = [lambda frame: [nplDetector.detect_number_plate_locations(vehicle) for vehicle in vehicles]]
+    try:
+        from textdetection import text_recognition
+        eastDetector = text_recognition.EastTextDetector()
+        stages.append(eastDetector.detect_text_boxes)
+    except Exception as error:
+        print("[RUNTIME] calibration without EAST: " + str(error))
+    try:
+        from yolov3 import car_detection
+        yoloDetector = car_detection.YoloDetector()
+        stages.append(yoloDetector.detect_cars_with_boxes)
+    except Exception as error:
+        print("[RUNTIME] calibration without YOLO: " + str(error))
+
+    # warm up the models before the timing, then all the workers start their window together
+    for stage in stages:
+        stage(frames[0])
+    start_barrier.wait()
+    done = 0
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        frame = frames[done % len(frames)]
+        for stage in stages:
+            stage(frame)
+        done += 1
+    return done, len(stages)
+
+
+def _calibration_reports(processes, start_barrier, results, seconds):
+    """
+    Wait for the reports of the calibration workers.
+
+    :return: the list of (worker index, frames done, stages) reports
+    """
+    reports = []
+    deadline = time.monotonic() + seconds + CALIBRATION_STARTUP_SECONDS
+    while len(reports) < len(processes):
+        try:
+            report = results.get(timeout=CALIBRATION_POLL_SECONDS)
+        except queue.Empty:
+            # a worker killed before reporting would leave the others waiting for it on the barrier
+            failed = [process for process in processes if process.exitcode not in (None, 0)]
+            if failed or time.monotonic() > deadline:
+                start_barrier.abort()
+                raise RuntimeError("calibration worker " + (
+                    "{0} exited with code {1}".format(failed[0].name, failed[0].exitcode) if failed
+                    else "reports missing after {0:.0f} seconds".format(seconds + CALIBRATION_STARTUP_SECONDS)))
+            continue
+        if report[1] is None:
+            raise RuntimeError("calibration worker {0:d} failed: {1}".format(report[0], report[2]))
+        reports.append(report)
+    return reports
+
+
+def calibrate(seconds=20.0, max_workers=None, thread_options=(1, 2, 4, 8)):
+    """
+    Measure the throughput of every workers x threads split fitting the available CPUs.
+
+    :param seconds: the seconds every split runs
+    :param max_workers: the most workers tried, the CPU count if None
+    :param thread_options: the threads per worker tried
+    :return: tuple (best split dict, list of all the split dicts)
+    """
+    cpus = len(available_cpus())
+    max_workers = max_workers if max_workers is not None else cpus
+    context = multiprocessing.get_context("spawn")
+    splits = []
+    for threads in thread_options:
+        workers = 1
+        while workers <= max_workers and workers * threads <= max(cpus, threads):
+            results = context.Queue()
+            start_barrier = context.Barrier(workers)
+            processes = [context.Process(target=_calibration_worker,
+                                         args=(i, threads, seconds, start_barrier, results))
+                         for i in range(workers)]
+            for process in processes:
+                process.start()
+            try:
+                reports = _calibration_reports(processes, start_barrier, results, seconds)
+            finally:
+                for process in processes:
+                    process.join(CALIBRATION_POLL_SECONDS)
+                    if process.is_alive():
+                        process.terminate()
+                        process.join()
+            frames = sum(done for (index, done, stages) in reports)
+            split = {"workers": workers, "threads": threads, "frames": frames, "frames_per_second": frames / seconds,
+                     "stages": reports[0][2]}
+            print("[RUNTIME] {0:d} workers x {1:d} threads: {2:.2f} frames/s".format(workers, threads,
+                                                                                   split["frames_per_second"]))
+            splits.append(split)
+            workers *= 2
+    best = max(splits, key=lambda split: split["frames_per_second"])
+    return best, splits
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Runtime thread budget of the pipeline workers.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    calibrate_parser = commands.add_parser("calibrate", help="find the best workers x threads split of this host")
+    calibrate_parser.add_argument("--seconds", type=float, default=20.0, help="the seconds every split runs")
+    calibrate_parser.add_argument("--max-workers", type=int, help="the most workers tried")
+    calibrate_parser.add_argument("--threads", type=int, nargs="+", default=[1, 2, 4, 8],
+                                  help="the threads per worker tried")
+    calibrate_parser.add_argument("--output", default=RUNTIME_CONFIG_PATH, help="the runtime configuration written")
+    commands.add_parser("show", help="show the thread settings of this process")
+    args = parser.parse_args(argv)
+
+    if args.command == "show":
+        print(json.dumps(current_settings(), indent=2))
+        return
+
+    best, splits = calibrate(args.seconds, args.max_workers, args.threads)
+    config = {"workers": best["workers"], "threads": best["threads"], "inter_op_threads": 1, "cpus": None,
+              "calibration": splits}
+    with open(args.output, "w") as file:
+        json.dump(config, file, indent=2)
+    print("[RUNTIME] best split: {0:d} workers x {1:d} threads, written to {2}".format(best["workers"],
+                                                                                      best["threads"], args.output))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,54 +1,112 @@
 import re
 
-
-def __getRoNumberPlateRegex():
-    """
-    Get specific romanian number plate regex.
+# Number plate grammars by country.
+# "{region}" in a format is replaced with the alternation of the region codes.
+# The prefix corrections map frequent OCR misreadings of a plate prefix to the right one.
+# The templates give the class of every plate position for the confusion aware correction:
+# @ for a letter, # for a digit, R for a region code letter and any other character as itself.
+PLATE_GRAMMARS = {
+    "RO": {
+        "formats": ["B\\d{2,3}[A-Z]{3}", "{region}\\d{2}[A-Z]{3}"],
+        "regions": ["AB", "AG", "AR", "BC", "BH", "BN", "BR", "BT", "BV", "BZ", "CJ", "CL", "CS", "CT", "CV",
+                    "DB", "DJ", "GJ", "GL", "GR", "HD", "HR", "IF", "IL", "IS", "MH", "MM", "MS", "NT", "OT",
+                    "PH", "SB", "SJ", "SM", "TL", "TM", "TR", "VL", "VN", "VS"],
+        "prefix_corrections": {"CI": "CJ"},
+        "templates": ["B##@@@", "B###@@@", "RR##@@@"],
+    },
+}
+
+DATE_FORMATS = ["\\d{1,2}/\\d{1,2}/2\\d{3}", "2\\d{3}/\\d{1,2}/\\d{2}"]
+
+
+def compile_plate_grammar(grammar):
     """
-    # specific romanian number plate regex creation
-    nr_regex = "B\\d{2,3}[A-Z]{3}"
-    county_abbreviation = ["AB", "AG", "AR", "BC", "BH", "BN", "BR", "BT", "BV", "BZ", "CJ", "CL", "CS", "CT", "CV",
-                           "DB", "DJ", "GJ", "GL", "GR", "HD", "HR", "IF", "IL", "IS", "MH", "MM", "MS", "NT", "OT",
-                           "PH", "SB", "SJ", "SM", "TL", "TM", "TR", "VL", "VN", "VS"]
+    Build the regex of a country number plate grammar.
+    The misread prefixes are accepted too, they get corrected after the match.
 
-    for county in county_abbreviation:
-        nr_regex += "|" + county + "\\d{2}[A-Z]{3}"
-    return nr_regex
+    :param grammar: the PLATE_GRAMMARS entry
+    :return: the regex string
+    """
+    regions = list(grammar.get("regions", [])) + list(grammar.get("prefix_corrections", {}).keys())
+    region_regex = "(?:" + "|".join(regions) + ")"
+    return "|".join(plate_format.replace("{region}", region_regex) for plate_format in grammar["formats"])
 
 
-def _filterRomanianNumbers(number_candidates):
+def _compile_scanner(countries):
     """
-    Filter the romanian number plates from the potential candidates.
-    :param number_candidates:
-    :return: the filtered romanian number plates
+    Compile the single pass scanner of the dates and the number plates of the given countries.
+    A date must be the whole text, a number plate can be anywhere within it.
     """
-    numbers = []
-
-    for number in number_candidates:
-        # workarounds
-        if number[0:2] == "CI":
-            number = str(number).replace(number[0:2], "CJ", 1)
-
-        nr_regex = __getRoNumberPlateRegex()
+    date_regex = "|".join(DATE_FORMATS)
+    plate_regexes = ["(?P<plate_{0}>{1})".format(country, compile_plate_grammar(PLATE_GRAMMARS[country]))
+                     for country in countries]
+    return re.compile("^(?P<date>" + date_regex + ")$|" + "|".join(plate_regexes))
 
-        ro_nr_pattern = re.compile(nr_regex)
-        ro_nrs = re.findall(ro_nr_pattern, number)
-        if ro_nrs:
-            numbers.append(ro_nrs[0])
 
-    return numbers
+_DEFAULT_COUNTRIES = ("RO",)
+_DEFAULT_SCANNER = _compile_scanner(_DEFAULT_COUNTRIES)
 
 
 class NprTextsFilter:
     """
     Class that filters out the dates and the number plate texts from a list of potential candidates.
     """
-    __date_pattern = None
-    __number_pattern = None
+    __scanner = None
+    __corrections = None
+    __corrector = None
+    __min_correction_score = 0.0
+
+    def __init__(self, countries=_DEFAULT_COUNTRIES, corrector=None, min_correction_score=0.4) -> None:
+        """
+        :param countries: the PLATE_GRAMMARS countries whose number plates are kept
+        :param corrector: optional PlateCorrector reading the plates out of the texts not matching the grammars
+        :param min_correction_score: the corrected plates scoring lower are dropped
+        """
+        self.__corrector = corrector
+        self.__min_correction_score = min_correction_score
+        countries = tuple(countries)
+        self.__scanner = _DEFAULT_SCANNER if countries == _DEFAULT_COUNTRIES else _compile_scanner(countries)
+        self.__corrections = dict(("plate_" + country, PLATE_GRAMMARS[country].get("prefix_corrections", {}))
+                                  for country in countries)
+
+    def scan(self, text, correct=True):
+        """
+        Scan a single detected text for its date and its first number plate, in one pass.
+
+        :param text: the detected text
+        :param correct: read a plate out of the text with the corrector when nothing matches the grammars
+        :return: tuple (date or None, number plate or None)
+        """
+        # filter out not needed spaces from within the text
+        text = text.replace(" ", "")
+
+        date = None
+        number = None
+        for match in self.__scanner.finditer(text):
+            if match.lastgroup == "date":
+                date = match.group()
+            elif number is None:
+                number = match.group()
+                for (misread, right) in self.__corrections[match.lastgroup].items():
+                    if number.startswith(misread):
+                        number = right + number[len(misread):]
+                        break
+                break
+
+        if date is None and number is None and correct and self.__corrector is not None:
+            corrected, score = self.__corrector.correct(text)
+            if corrected is not None and score >= self.__min_correction_score:
+                number = corrected
+        return date, number
+
+    def filterBatch(self, strings_lists):
+        """
+        Detect the dates and number plates texts from many lists of detected texts.
 
-    def __init__(self) -> None:
-        self.__date_pattern = re.compile("^\\d{1,2}/\\d{1,2}/2\\d{3}$|^2\\d{3}/\\d{1,2}/\\d{2}$")
-        self.__number_pattern = re.compile("[A-Z]{2}\\d{2}[A-Z]{3}|[B]\\d{2,3}[A-Z]{3}")
+        :param strings_lists: the lists of texts, one for every detection
+        :return: the list of (dates, numbers) tuples, one for every detection
+        """
+        return [self.filterDatesAndPlates(strings) for strings in strings_lists]
 
     def filterDatesAndPlates(self, strings):
         """
@@ -57,7 +115,15 @@ class NprTextsFilter:
         :param strings: the list of texts from the detection
         :return: tuple of 2 lists: (dates, numbers)
         """
-        return self.filterDates(strings), self.filterNumberPlates(strings)
+        dates = []
+        numbers = []
+        for text in strings:
+            date, number = self.scan(text)
+            if date is not None:
+                dates.append(date)
+            if number is not None:
+                numbers.append(number)
+        return dates, numbers
 
     def filterNumberPlates(self, strings):
         """
@@ -66,21 +132,7 @@ class NprTextsFilter:
         :param strings: the list of texts from the detection
         :return: the list of detected number plates
         """
-        number_candidates = []
-        for text in strings:
-            # filter out not needed spaces from within the text
-            text = text.replace(" ", "")
-
-            # find the potential number from within the text
-            # further filtering will be done
-            found_numbers = re.findall(self.__number_pattern, text)
-            if found_numbers:
-                number_candidates.append(found_numbers[0])
-
-            # filtering with a specific romanian number plate regex
-        numbers = _filterRomanianNumbers(number_candidates)
-
-        return numbers
+        return self.filterDatesAndPlates(strings)[1]
 
     def filterDates(self, strings):
         """
@@ -89,12 +141,10 @@ class NprTextsFilter:
         :param strings: the list of texts from the detection
         :return: the list of detected dates
         """
+        # the corrector only reads plates, the dates do not need it
         dates = []
         for text in strings:
-            # filter out not needed spaces from within the text
-            text = text.replace(" ", "")
-
-            found_dates = re.findall(self.__date_pattern, text)
-            if found_dates:
-                dates.append(found_dates[0])
+            date, number = self.scan(text, correct=False)
+            if date is not None:
+                dates.append(date)
         return dates
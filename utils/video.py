@@ -0,0 +1,54 @@
+# consecutive frames sampled from every second of the video
+FRAMES_PER_SECOND = 2
+
+
+def sample_frames(cap, fps, per_second=FRAMES_PER_SECOND):
+    """
+    Read consecutive frames from every second of the video, two by default.
+    The skipped frames are only grabbed, without being retrieved and converted.
+
+    :param cap: the opened cv2.VideoCapture
+    :param fps: the frames per second of the video
+    :param per_second: the frames sampled from every second, or a function returning it, read at every frame
+    :return: generator of the sampled frames
+    """
+    fps = max(1, int(fps))
+    frame_number = 0
+    while cap.isOpened():
+        # Read the video file frame by frame.
+        if not cap.grab():
+            break
+
+        frame_number += 1
+        sampled = per_second() if callable(per_second) else per_second
+        if frame_number % fps < sampled:
+            ret, frame = cap.retrieve()
+            if ret:
+                yield frame
+
+
+def decode_into_ring(path, ring, frames_queue, per_second=FRAMES_PER_SECOND):
+    """
+    Decode the sampled frames of a video into a FrameRing, meant to run within its own process.
+    The FrameRefs are put into the queue as the frames are decoded, followed by None at the end of the video.
+    The decoding waits for a free slot whenever the ring is full.
+
+    :param path: the video file path
+    :param ring: the FrameRing
+    :param frames_queue: the multiprocessing.Queue of the FrameRefs
+    :param per_second: the frames sampled from every second, or a multiprocessing.Value of it shared with the parent
+    """
+    import cv2
+
+    if hasattr(per_second, 'value'):
+        shared = per_second
+        per_second = lambda: shared.value
+
+    cap = cv2.VideoCapture(path)
+    try:
+        for (index, frame) in enumerate(sample_frames(cap, int(cap.get(cv2.CAP_PROP_FPS)), per_second), 1):
+            frames_queue.put(ring.write(frame, index))
+    finally:
+        cap.release()
+        frames_queue.put(None)
+        ring.close()
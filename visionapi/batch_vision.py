@@ -0,0 +1,93 @@
+from visionapi.vision import MAX_BATCH_SIZE
+
+
+class VisionTicket:
+    """
+    Placeholder for the texts of an image submitted to the BatchVision, filled in when the batch is sent.
+    """
+
+    def __init__(self, input_img, callback=None) -> None:
+        self.input_img = input_img
+        self.callback = callback
+        self.texts = None
+        # the exception raised by the text detection of its batch, its texts are empty then
+        self.error = None
+
+    @property
+    def done(self):
+        return self.texts is not None
+
+
+class BatchVision:
+    """
+    Collects the images to run the text detection on, across vehicles and frames,
+    and sends them with as few Vision API round trips as possible.
+    """
+    __vision = None
+    __pending = None
+    __batch_size = MAX_BATCH_SIZE
+
+    def __init__(self, vision_detector, batch_size=MAX_BATCH_SIZE) -> None:
+        """
+        :param vision_detector: the Vision API text detector
+        :param batch_size: the pending images are sent as soon as there are this many of them
+        """
+        self.__vision = vision_detector
+        self.__pending = []
+        self.__batch_size = min(batch_size, MAX_BATCH_SIZE)
+
+    def submit(self, input_img, callback=None):
+        """
+        Queue a cv2 image for the text detection.
+
+        :param input_img: cv2 loaded image
+        :param callback: optional function called with the list of detected texts once they are known
+        :return: the VisionTicket holding the detected texts after the next flush
+        """
+        ticket = VisionTicket(input_img, callback)
+        self.__pending.append(ticket)
+        if len(self.__pending) >= self.__batch_size:
+            self.flush()
+        return ticket
+
+    def pending(self):
+        return len(self.__pending)
+
+    def flush(self):
+        """
+        Send all the queued images and map the detected texts back to their tickets.
+        Every ticket is done afterwards: the images answered with an error, and the images of a batch whose
+        text detection raised, have no text, the exception is kept as the error of their tickets.
+        """
+        while self.__pending:
+            tickets = self.__pending[:self.__batch_size]
+            self.__pending = self.__pending[self.__batch_size:]
+
+            error = None
+            try:
+                results = list(self.__vision.detect_texts_batch([ticket.input_img for ticket in tickets]))
+                if len(results) != len(tickets):
+                    raise ValueError("detect_texts_batch returned {0:d} results for {1:d} images".format(
+                        len(results), len(tickets)))
+            except Exception as batch_error:
+                print(str(batch_error))
+                error = batch_error
+                results = [None] * len(tickets)
+            for ticket, texts in zip(tickets, results):
+                # the images answered with an error have no text
+                ticket.texts = texts if texts is not None else []
+                ticket.error = error
+                ticket.input_img = None
+                if ticket.callback is not None:
+                    ticket.callback(ticket.texts)
+
+    def detect_texts_many(self, input_imgs):
+        """
+        Detect all the texts from the given images in batches.
+
+        :param input_imgs: list of cv2 loaded images
+        :return: the list of all detected texts for every image, in the input order
+        """
+        tickets = [self.submit(input_img) for input_img in input_imgs]
+        self.flush()
+        return [ticket.texts for ticket in tickets]
@@ -0,0 +1,160 @@
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.metrics import LatencyHistogram
+
+try:
+    from google.api_core import exceptions
+except ImportError:
+    # the stub and replay clients run without the Google client library
+    exceptions = None
+
+# errors worth another attempt, anything else is raised to the caller straight away
+TRANSIENT_ERRORS = (ConnectionError, TimeoutError)
+if exceptions is not None:
+    TRANSIENT_ERRORS += (exceptions.ServiceUnavailable, exceptions.DeadlineExceeded, exceptions.TooManyRequests,
+                         exceptions.ResourceExhausted, exceptions.InternalServerError)
+
+
+class TokenBucket:
+    """
+    Thread safe token bucket rate limiter.
+    """
+
+    def __init__(self, rate, capacity=None) -> None:
+        """
+        :param rate: the tokens added per second, our requests per second quota
+        :param capacity: the maximum burst of tokens, defaults to one second worth of tokens
+        """
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(1.0, rate))
+        self.__tokens = self.capacity
+        self.__updated = time.monotonic()
+        self.__lock = threading.Lock()
+
+    def acquire(self, tokens=1.0):
+        """
+        Block until the tokens are available and take them.
+        """
+        while True:
+            with self.__lock:
+                now = time.monotonic()
+                self.__tokens = min(self.capacity, self.__tokens + (now - self.__updated) * self.rate)
+                self.__updated = now
+                if self.__tokens >= tokens:
+                    self.__tokens -= tokens
+                    return
+                wait = (tokens - self.__tokens) / self.rate
+            time.sleep(wait)
+
+
+class ConcurrentVision:
+    """
+    Runs the Vision API text detections from a thread pool, sharing the client connection,
+    with a rate limit, a per call timeout and retries with jittered exponential backoff.
+    """
+    __vision = None
+    __executor = None
+    __rate_limiter = None
+
+    def __init__(self, vision_detector, max_concurrency=4, requests_per_second=10.0, burst=None, timeout=10.0,
+                 max_retries=3, backoff_base=0.2, backoff_max=5.0) -> None:
+        """
+        :param vision_detector: the Vision API text detector
+        :param max_concurrency: the maximum number of requests in flight
+        :param requests_per_second: the quota the requests are limited to, None for no limit
+        :param burst: the maximum burst of requests above the rate
+        :param timeout: the timeout in seconds of a single request
+        :param max_retries: the maximum number of retries of a request failing with a transient error
+        :param backoff_base: the backoff of the first retry in seconds, doubled for every following retry
+        :param backoff_max: the maximum backoff in seconds
+        """
+        self.__vision = vision_detector
+        self.__executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix='vision')
+        self.__rate_limiter = TokenBucket(requests_per_second, burst) if requests_per_second else None
+        self.__timeout = timeout
+        self.__max_retries = max_retries
+        self.__backoff_base = backoff_base
+        self.__backoff_max = backoff_max
+
+        self.latency = LatencyHistogram()
+        self.retries = 0
+        self.failures = 0
+        self.__counter_lock = threading.Lock()
+
+    def __call_with_retries(self, call):
+        attempt = 0
+        while True:
+            if self.__rate_limiter is not None:
+                self.__rate_limiter.acquire()
+            start = time.monotonic()
+            try:
+                result = call()
+                self.latency.observe(time.monotonic() - start)
+                return result
+            except TRANSIENT_ERRORS as error:
+                self.latency.observe(time.monotonic() - start)
+                if attempt >= self.__max_retries:
+                    with self.__counter_lock:
+                        self.failures += 1
+                    raise
+                # full jitter backoff
+                backoff = min(self.__backoff_max, self.__backoff_base * (2 ** attempt))
+                attempt += 1
+                with self.__counter_lock:
+                    self.retries += 1
+                print('Vision API transient error, retry {0:d} of {1:d}: {2}'.format(attempt, self.__max_retries,
+                                                                                   error))
+                time.sleep(random.uniform(0, backoff))
+
+    def detect_texts_async(self, input_img):
+        """
+        Start the text detection of a cv2 image.
+
+        :param input_img: cv2 loaded image
+        :return: concurrent.futures.Future of the list of all detected texts
+        """
+        return self.__executor.submit(self.__call_with_retries,
+                                      lambda: self.__vision.detect_texts(input_img, timeout=self.__timeout))
+
+    def detect_texts_batch_async(self, input_imgs):
+        """
+        Start the batched text detection of many cv2 images.
+
+        :param input_imgs: list of cv2 loaded images
+        :return: concurrent.futures.Future of the list of all detected texts for every image
+        """
+        return self.__executor.submit(self.__call_with_retries,
+                                      lambda: self.__vision.detect_texts_batch(input_imgs, timeout=self.__timeout))
+
+    def detect_texts(self, input_img):
+        return self.detect_texts_async(input_img).result()
+
+    def detect_text_annotations(self, input_img, **kwargs):
+        future = self.__executor.submit(self.__call_with_retries, lambda: self.__vision.detect_text_annotations(
+            input_img, timeout=self.__timeout, **kwargs))
+        return future.result()
+
+    def detect_texts_batch(self, input_imgs):
+        return self.detect_texts_batch_async(input_imgs).result()
+
+    def detect_texts_many(self, input_imgs):
+        """
+        Detect all the texts from the given images, the requests running concurrently.
+
+        :param input_imgs: list of cv2 loaded images
+        :return: the list of all detected texts for every image, in the input order
+        """
+        futures = [self.detect_texts_async(input_img) for input_img in input_imgs]
+        return [future.result() for future in futures]
+
+    def stats(self):
+        """
+        :return: dict of the latency histogram, the retries and the failed requests
+        """
+        return {'latency': self.latency.snapshot(), 'retries': self.retries, 'failures': self.failures}
+
+    def shutdown(self):
+        self.__executor.shutdown(wait=True)
@@ -0,0 +1,116 @@
+import threading
+
+import cv2
+
+JPEG = '.jpg'
+PNG = '.png'
+WEBP = '.webp'
+
+
+class EncodingPolicy:
+    """
+    How the cv2 images are encoded before being uploaded for OCR, and how many bytes it costs.
+    The defaults keep the colour JPEG at OpenCV's default quality.
+    """
+
+    def __init__(self, grayscale=False, target_text_height=None, text_height_ratio=0.7, image_format=JPEG,
+                 quality=None) -> None:
+        """
+        :param grayscale: drop the colour channels, OCR does not need them
+        :param target_text_height: downscale the images whose text is taller than this many pixels, None to keep the size
+        :param text_height_ratio: the text height estimated as a ratio of the image height, when it is not given
+        :param image_format: JPEG, PNG or WEBP
+        :param quality: the JPEG / WEBP quality between 0 and 100, or the PNG compression level between 0 and 9,
+            None for the OpenCV default
+        """
+        self.grayscale = grayscale
+        self.target_text_height = target_text_height
+        self.text_height_ratio = text_height_ratio
+        self.image_format = image_format
+        self.quality = quality
+
+        self.images = 0
+        self.encoded_bytes = 0
+        self.raw_bytes = 0
+        self.__lock = threading.Lock()
+
+    def __encode_params(self):
+        if self.quality is None:
+            return []
+        if self.image_format == JPEG:
+            return [cv2.IMWRITE_JPEG_QUALITY, int(self.quality)]
+        if self.image_format == WEBP:
+            return [cv2.IMWRITE_WEBP_QUALITY, int(self.quality)]
+        if self.image_format == PNG:
+            return [cv2.IMWRITE_PNG_COMPRESSION, int(self.quality)]
+        return []
+
+    def encode(self, input_img, text_height=None):
+        """
+        Encode the cv2 image following the policy.
+
+        :param input_img: cv2 image
+        :param text_height: the height in pixels of the text within the image, estimated from the image if None
+        :return: tuple of the encoded bytes and the scale applied to the image
+        """
+        raw_bytes = input_img.nbytes
+        img = input_img
+        if self.grayscale and img.ndim == 3:
+            img = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+
+        scale = 1.0
+        if self.target_text_height is not None:
+            if text_height is None:
+                text_height = img.shape[0] * self.text_height_ratio
+            if text_height > self.target_text_height:
+                scale = self.target_text_height / float(text_height)
+                img = cv2.resize(img, (max(1, int(img.shape[1] * scale)), max(1, int(img.shape[0] * scale))),
+                                 interpolation=cv2.INTER_AREA)
+
+        retval, buffer = cv2.imencode(self.image_format, img, self.__encode_params())
+        # the request protobuf needs bytes, the encoded buffer is copied once into them
+        content = buffer.tobytes()
+
+        with self.__lock:
+            self.images += 1
+            self.encoded_bytes += len(content)
+            self.raw_bytes += raw_bytes
+        return content, scale
+
+    def stats(self):
+        """
+        :return: dict of the encoded images count, their total and mean encoded bytes and the compression ratio
+        """
+        return {'images': self.images, 'encoded_bytes': self.encoded_bytes,
+                'bytes_per_image': self.encoded_bytes / float(self.images) if self.images else 0.0,
+                'compression': self.raw_bytes / float(self.encoded_bytes) if self.encoded_bytes else 0.0}
+
+
+def evaluate_policies(client, images, policies, texts_filter, baseline=None):
+    """
+    Compare the uploaded bytes and the recognised number plates of the encoding policies against a baseline.
+
+    :param client: the image annotator client, real or stub
+    :param images: list of cv2 plate images
+    :param policies: dict of name -> EncodingPolicy
+    :param texts_filter: the NprTextsFilter keeping the number plates
+    :param baseline: the reference EncodingPolicy, the default policy if None
+    :return: dict of name -> bytes per image, and the ratio of images whose plates match the baseline ones
+    """
+    # imported here, vision imports this module
+    from visionapi.vision import Vision
+
+    def plates(policy):
+        detector = Vision(client, encoding_policy=policy)
+        return [texts_filter.filterNumberPlates(texts or []) for texts in detector.detect_texts_batch(images)]
+
+    baseline = baseline if baseline is not None else EncodingPolicy()
+    baseline_plates = plates(baseline)
+
+    report = {'baseline': {'bytes_per_image': baseline.stats()['bytes_per_image'], 'plates_match': 1.0}}
+    for (name, policy) in policies.items():
+        policy_plates = plates(policy)
+        matching = sum(1 for (a, b) in zip(baseline_plates, policy_plates) if a == b)
+        report[name] = {'bytes_per_image': policy.stats()['bytes_per_image'],
+                        'plates_match': matching / float(len(images)) if images else 1.0}
+    return report
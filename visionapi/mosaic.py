@@ -0,0 +1,123 @@
+import cv2
+import numpy as np
+
+from visionapi.vision import VisionResponseError
+
+
+def pack_mosaic(crops, max_width=1600, separator=24, background=255):
+    """
+    Tile the crops row by row into one image, keeping a blank separator around every crop
+    so the OCR does not read the texts of two neighbouring crops as one.
+
+    :param crops: list of cv2 images, grayscale or BGR
+    :param max_width: the maximum width of the mosaic, wider crops get a row of their own
+    :param separator: the blank pixels between the crops and around the mosaic
+    :param background: the separator gray level
+    :return: tuple of the mosaic image and the (x, y, width, height) placement of every crop
+    """
+    color = any(crop.ndim == 3 for crop in crops)
+
+    placements = []
+    rows = []
+    x = separator
+    y = separator
+    row_height = 0
+    mosaic_width = 0
+    for crop in crops:
+        height, width = crop.shape[:2]
+        if x > separator and x + width + separator > max_width:
+            # start a new row
+            y += row_height + separator
+            x = separator
+            row_height = 0
+        placements.append((x, y, width, height))
+        x += width + separator
+        row_height = max(row_height, height)
+        mosaic_width = max(mosaic_width, x)
+    mosaic_height = y + row_height + separator
+
+    shape = (mosaic_height, mosaic_width, 3) if color else (mosaic_height, mosaic_width)
+    mosaic = np.full(shape, background, dtype=np.uint8)
+    for (crop, (x, y, width, height)) in zip(crops, placements):
+        if color and crop.ndim == 2:
+            crop = cv2.cvtColor(crop, cv2.COLOR_GRAY2BGR)
+        mosaic[y:y + height, x:x + width] = crop
+    return mosaic, placements
+
+
+def assign_annotations(annotations, placements):
+    """
+    Assign every detected word to the crop its bounding polygon center falls in.
+
+    :param annotations: the (text, vertices) list from Vision.detect_text_annotations
+    :param placements: the (x, y, width, height) placement of every crop within the mosaic
+    :return: the list of all detected texts for every crop, the whole crop text first then the single words,
+        like Vision.detect_texts
+    """
+    words = [[] for placement in placements]
+    # the first annotation is the text of the whole mosaic
+    for (text, vertices) in annotations[1:]:
+        if not vertices:
+            continue
+        center_x = sum(vx for (vx, vy) in vertices) / float(len(vertices))
+        center_y = sum(vy for (vx, vy) in vertices) / float(len(vertices))
+        for (i, (x, y, width, height)) in enumerate(placements):
+            if x <= center_x < x + width and y <= center_y < y + height:
+                words[i].append((center_x, text))
+                break
+
+    results = []
+    for crop_words in words:
+        crop_words.sort(key=lambda word: word[0])
+        texts = [text for (center_x, text) in crop_words]
+        results.append([" ".join(texts)] + texts if texts else [])
+    return results
+
+
+class MosaicVision:
+    """
+    Packs many small crops into one mosaic image per Vision API request,
+    the returned geometry telling which crop every text belongs to.
+    """
+
+    def __init__(self, vision_detector, max_crops=32, max_width=1600, separator=24, text_height_ratio=0.7) -> None:
+        """
+        :param vision_detector: the Vision API text detector, with detect_text_annotations
+        :param max_crops: the maximum number of crops packed into one mosaic
+        :param max_width: the maximum width of a mosaic
+        :param separator: the blank pixels between the crops
+        :param text_height_ratio: the text height estimated as a ratio of the crop height
+        """
+        self.vision_detector = vision_detector
+        self.max_crops = max_crops
+        self.max_width = max_width
+        self.separator = separator
+        self.text_height_ratio = text_height_ratio
+        self.requests = 0
+
+    def detect_texts_batch(self, input_imgs, **kwargs):
+        """
+        Detect all the texts from the given crops, one request per mosaic.
+
+        :param input_imgs: list of cv2 loaded images
+        :return: the list of all detected texts for every image, in the input order, None for the crops of
+            a mosaic answered with an error
+        """
+        results = []
+        for start in range(0, len(input_imgs), self.max_crops):
+            crops = input_imgs[start:start + self.max_crops]
+            mosaic, placements = pack_mosaic(crops, self.max_width, self.separator)
+            # the text height is the one of the smallest crop, not proportional to the whole mosaic
+            text_height = min(crop.shape[0] for crop in crops) * self.text_height_ratio
+            self.requests += 1
+            try:
+                annotations = self.vision_detector.detect_text_annotations(mosaic, text_height=text_height, **kwargs)
+            except VisionResponseError as error:
+                print(str(error))
+                results.extend([None] * len(crops))
+                continue
+            results.extend(assign_annotations(annotations, placements))
+        return results
+
+    def detect_texts(self, input_img, **kwargs):
+        return self.vision_detector.detect_texts(input_img, **kwargs)
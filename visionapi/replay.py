@@ -0,0 +1,180 @@
+"""
+Record and replay of the Vision API text detection responses, for offline and deterministic pipeline runs.
+
+The recording client wraps the real ImageAnnotatorClient and appends every answered image to a JSON lines file:
+the sha1 hash of the uploaded image bytes, its text annotations and the seconds of the call. The replay client
+answers the same images from that file without any network access, optionally with the recorded or a fixed
+latency. The uploads are hashed after their encoding, so a recording only replays with the same encoding policy
+and the same OpenCV JPEG encoder.
+
+    python npr_image.py --vision-record vision_responses.jsonl
+    python npr_image.py --vision-replay vision_responses.jsonl --vision-replay-latency recorded
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+
+from visionapi import stub
+
+RECORDED_LATENCY = "recorded"
+
+
+def request_hash(content):
+    """
+    :param content: the uploaded image bytes
+    :return: the sha1 hex digest keying the recorded response
+    """
+    return hashlib.sha1(content).hexdigest()
+
+
+def _image_content(image):
+    return image['content'] if isinstance(image, dict) else image.content
+
+
+def _annotations(response):
+    """
+    Get the (description, vertices) list of an annotate image response, in a JSON serialisable form.
+    """
+    return [[text.description, [[vertex.x, vertex.y] for vertex in text.bounding_poly.vertices]]
+            for text in response.text_annotations]
+
+
+def load_recording(path):
+    """
+    Read a recording, the later entries of the same image replace the earlier ones.
+
+    :param path: the JSON lines recording file
+    :return: dict of the image hash -> {"annotations": [(description, vertices)], "seconds": call seconds}
+    """
+    entries = {}
+    if not os.path.exists(path):
+        return entries
+    with open(path) as file:
+        for line in file:
+            if line.strip():
+                entry = json.loads(line)
+                entries[entry["hash"]] = entry
+    return entries
+
+
+class RecordingVisionClient:
+    """
+    Wraps an image annotator client and records its successful text detection responses.
+    The images already found within the recording are not recorded again.
+    """
+
+    def __init__(self, client, path) -> None:
+        """
+        :param client: the image annotator client answering the calls
+        :param path: the JSON lines recording file, appended to
+        """
+        self.client = client
+        self.path = path
+        self.recorded = set(load_recording(path))
+        self.__lock = threading.Lock()
+
+    def __record(self, contents, responses, seconds):
+        lines = []
+        with self.__lock:
+            for (content, response) in zip(contents, responses):
+                key = request_hash(content)
+                if response.error.message or key in self.recorded:
+                    continue
+                self.recorded.add(key)
+                lines.append(json.dumps({"hash": key, "annotations": _annotations(response), "seconds": seconds}))
+            if lines:
+                with open(self.path, "a") as file:
+                    file.write("\n".join(lines) + "\n")
+
+    def text_detection(self, image, **kwargs):
+        start = time.perf_counter()
+        response = self.client.text_detection(image=image, **kwargs)
+        self.__record([_image_content(image)], [response], time.perf_counter() - start)
+        return response
+
+    def batch_annotate_images(self, requests, **kwargs):
+        start = time.perf_counter()
+        batch_response = self.client.batch_annotate_images(requests, **kwargs)
+        self.__record([stub._request_content(request) for request in requests], batch_response.responses,
+                      time.perf_counter() - start)
+        return batch_response
+
+
+class ReplayVisionClient(stub.StubVisionClient):
+    """
+    Answers the text detection calls from a recording. The images missing from the recording are answered
+    with no text, or fail the call in the strict mode.
+    """
+
+    def __init__(self, path, latency=0.0, strict=False) -> None:
+        """
+        :param path: the JSON lines recording file
+        :param latency: the seconds every call sleeps, or RECORDED_LATENCY to sleep the recorded seconds
+            of the slowest image of the call
+        :param strict: raise a KeyError for the images missing from the recording
+        """
+        self.recording = load_recording(path)
+        self.recorded_latency = latency == RECORDED_LATENCY
+        super().__init__(self.__missing, dict((key, entry["annotations"]) for (key, entry) in self.recording.items()),
+                         0.0 if self.recorded_latency else float(latency))
+        self.strict = strict
+        self.misses = 0
+        print("[REPLAY] {0:d} recorded responses loaded from {1}".format(len(self.recording), path))
+
+    def __missing(self, content):
+        key = request_hash(content)
+        if self.strict:
+            raise KeyError("no recorded response for the image " + key)
+        self.misses += 1
+        print("[REPLAY] no recorded response for the image " + key + ", answering no text")
+        if self.misses == 1:
+            print("[REPLAY] the images are keyed by their encoded bytes, a change of the crops, of their encoding "
+                  "policy or of the JPEG encoder since the recording misses them, record it again")
+        return []
+
+    def stats(self):
+        """
+        :return: dict of the replayed images and of the images missing from the recording
+        """
+        return {"images": self.images, "misses": self.misses}
+
+    def __sleep_recorded(self, contents):
+        if self.recorded_latency:
+            entries = [self.recording.get(request_hash(content)) for content in contents]
+            time.sleep(max([entry["seconds"] for entry in entries if entry is not None] or [0.0]))
+
+    def text_detection(self, image, **kwargs):
+        self.__sleep_recorded([_image_content(image)])
+        return super().text_detection(image, **kwargs)
+
+    def batch_annotate_images(self, requests, **kwargs):
+        self.__sleep_recorded([stub._request_content(request) for request in requests])
+        return super().batch_annotate_images(requests, **kwargs)
+
+
+def add_replay_arguments(parser):
+    """
+    Add the Vision API record and replay options to an argparse parser.
+    """
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument("--vision-record", metavar="PATH",
+                       help="record the Vision API responses into this JSON lines file")
+    group.add_argument("--vision-replay", metavar="PATH",
+                       help="answer the Vision API calls from this recording, without network access")
+    parser.add_argument("--vision-replay-latency", default="0",
+                        help="the seconds every replayed call sleeps, or 'recorded' for the recorded call seconds")
+
+
+def create_vision_client(args):
+    """
+    :param args: the parsed arguments, with the replay arguments
+    :return: the Vision API client of the pipeline, None for the default client
+    """
+    if args.vision_replay:
+        return ReplayVisionClient(args.vision_replay, args.vision_replay_latency)
+    if args.vision_record:
+        from google.cloud import vision
+        return RecordingVisionClient(vision.ImageAnnotatorClient(), args.vision_record)
+    return None
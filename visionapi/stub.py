@@ -0,0 +1,102 @@
+import hashlib
+import threading
+import time
+
+
+class _Vertex:
+    def __init__(self, x, y) -> None:
+        self.x = x
+        self.y = y
+
+
+class _BoundingPoly:
+    def __init__(self, vertices) -> None:
+        self.vertices = [_Vertex(x, y) for (x, y) in vertices]
+
+
+class _TextAnnotation:
+    def __init__(self, description, vertices=()) -> None:
+        self.description = description
+        self.bounding_poly = _BoundingPoly(vertices)
+
+
+class _Status:
+    def __init__(self, message='') -> None:
+        self.message = message
+
+
+class StubResponse:
+    """
+    Mimics the annotate image response, only the fields read by the Vision class.
+    """
+
+    def __init__(self, annotations=(), error='') -> None:
+        self.text_annotations = [annotation if isinstance(annotation, _TextAnnotation) else _TextAnnotation(*annotation)
+                                 for annotation in annotations]
+        self.error = _Status(error)
+
+
+class StubBatchResponse:
+    def __init__(self, responses) -> None:
+        self.responses = responses
+
+
+def _request_content(request):
+    """
+    Get the image bytes from an annotate image request, given as a dict or as a types.AnnotateImageRequest.
+    """
+    image = request['image'] if isinstance(request, dict) else request.image
+    return image['content'] if isinstance(image, dict) else image.content
+
+
+def no_text_responder(content):
+    return []
+
+
+class StubVisionClient:
+    """
+    Local stand-in for the vision.ImageAnnotatorClient, used to run the pipeline offline.
+    The responder maps the encoded image bytes to the list of annotations, given as
+    descriptions or (description, vertices) tuples.
+    Latency and errors can be simulated to exercise the timeouts and retries of the callers.
+    """
+
+    def __init__(self, responder=no_text_responder, texts_by_hash=None, latency=0.0, errors=()) -> None:
+        """
+        :param responder: function(image bytes) -> list of annotations, used when the image hash is not known
+        :param texts_by_hash: dict of sha1 hex digest of the image bytes -> list of annotations
+        :param latency: the seconds every call sleeps before answering
+        :param errors: exceptions raised by the first calls, one per call, None entries letting the call succeed
+        """
+        self.responder = responder
+        self.texts_by_hash = texts_by_hash if texts_by_hash is not None else {}
+        self.latency = latency
+        self.errors = list(errors)
+        self.calls = 0
+        self.images = 0
+        self.__lock = threading.Lock()
+
+    def _start_call(self):
+        with self.__lock:
+            self.calls += 1
+            error = self.errors.pop(0) if self.errors else None
+        if self.latency:
+            time.sleep(self.latency)
+        if error is not None:
+            raise error
+
+    def _annotate(self, content):
+        with self.__lock:
+            self.images += 1
+        annotations = self.texts_by_hash.get(hashlib.sha1(content).hexdigest())
+        if annotations is None:
+            annotations = self.responder(content)
+        return StubResponse([(a,) if isinstance(a, str) else a for a in annotations])
+
+    def text_detection(self, image, **kwargs):
+        self._start_call()
+        return self._annotate(image['content'] if isinstance(image, dict) else image.content)
+
+    def batch_annotate_images(self, requests, **kwargs):
+        self._start_call()
+        return StubBatchResponse([self._annotate(_request_content(request)) for request in requests])
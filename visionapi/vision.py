@@ -3,34 +3,124 @@ import os
 import cv2
 import base64
 import numpy as np
-from google.cloud import vision
-from google.cloud.vision import types
+
+from visionapi.encoding import EncodingPolicy
+
+# maximum number of images accepted by a single batch_annotate_images call
+MAX_BATCH_SIZE = 16
+# the TEXT_DETECTION value of the vision.enums.Feature.Type of the requests
+TEXT_DETECTION = 5
+
+
+class VisionResponseError(Exception):
+    """
+    Raised when the Vision API answers the request of an image with an error instead of its annotations.
+    """
+
+
+def _check_response(response):
+    if response.error.message:
+        raise VisionResponseError('Vision API error: ' + response.error.message)
+    return response
+
+
+def _response_texts(response):
+    """
+    Get the list of all detected texts from an annotate image response.
+    """
+    texts = []
+    for text in response.text_annotations:
+        texts.append(text.description)
+    return texts
+
+
+def _response_annotations(response, scale=1.0):
+    """
+    Get the list of all detected texts with their bounding polygon from an annotate image response.
+    The vertices are scaled back to the coordinates of the image before its encoding.
+    """
+    annotations = []
+    for text in response.text_annotations:
+        vertices = [(vertex.x / scale, vertex.y / scale) for vertex in text.bounding_poly.vertices]
+        annotations.append((text.description, vertices))
+    return annotations
+
+
+def _call_options(timeout):
+    """
+    Only pass the timeout to the client when it is set, so the client default applies otherwise.
+    """
+    return {'timeout': timeout} if timeout is not None else {}
 
 
 class Vision:
     client = None
+    encoding_policy = None
+
+    def __init__(self, client=None, encoding_policy=None) -> None:
+        """
+        :param client: the image annotator client, a stub client can be given for offline runs
+        :param encoding_policy: the EncodingPolicy of the uploaded images, colour JPEG if None
+        """
+        if client is None:
+            # the Google client library is only needed by the live client, not by the stub and replay clients
+            from google.cloud import vision
+            client = vision.ImageAnnotatorClient()
+        self.client = client
+        self.encoding_policy = encoding_policy if encoding_policy is not None else EncodingPolicy()
 
-    def __init__(self) -> None:
-        self.client = vision.ImageAnnotatorClient()
+    def detect_texts_batch(self, input_imgs, timeout=None):
+        """
+        Detect all the text from many cv2 images with as few batch_annotate_images calls as possible.
 
-    def detect_texts(self, input_img):
+        :param input_imgs: list of cv2 loaded images
+        :param timeout: the timeout in seconds of every call, None for the client default
+        :return: the list of all detected texts for every image, in the input order, None for the images
+            answered with an error, so the failures are told apart from the images without text
+        """
+        results = []
+        for start in range(0, len(input_imgs), MAX_BATCH_SIZE):
+            requests = [{'image': {'content': self.encoding_policy.encode(input_img)[0]},
+                         'features': [{'type': TEXT_DETECTION}]}
+                        for input_img in input_imgs[start:start + MAX_BATCH_SIZE]]
+
+            batch_response = self.client.batch_annotate_images(requests, **_call_options(timeout))
+            for response in batch_response.responses:
+                if response.error.message:
+                    print('Vision API error: ' + response.error.message)
+                    results.append(None)
+                else:
+                    results.append(_response_texts(response))
+        return results
+
+    def detect_texts(self, input_img, timeout=None):
         """
         Detect all the text from a ccv2 image using the Google Cloud Vision API.
 
         :param input_img: cv2 loaded image
+        :param timeout: the timeout in seconds of the call, None for the client default
         :return: the list of all detected texts
+        :raise VisionResponseError: when the image is answered with an error
         """
-        retval, buffer = cv2.imencode('.jpg', input_img)
-        img_bytes = np.array(buffer).tobytes()
+        content, scale = self.encoding_policy.encode(input_img)
+        image = {'content': content}
 
-        image = types.Image(content=img_bytes)
+        response = _check_response(self.client.text_detection(image=image, **_call_options(timeout)))
+        return _response_texts(response)
 
-        response = self.client.text_detection(image=image)
-        detected_texts = response.text_annotations
+    def detect_text_annotations(self, input_img, timeout=None, text_height=None):
+        """
+        Detect all the text from a cv2 image, keeping the geometry of every annotation.
+        The first annotation is the whole text, the following ones are the single words.
 
-        texts = []
-        for text in detected_texts:
-            # print('\n"{}"'.format(text.description))
-            texts.append(text.description)
+        :param input_img: cv2 loaded image
+        :param timeout: the timeout in seconds of the call, None for the client default
+        :param text_height: the height in pixels of the text, when it is not proportional to the image height
+        :return: the list of (text, bounding polygon vertices [(x, y)]) of all detected texts
+        :raise VisionResponseError: when the image is answered with an error
+        """
+        content, scale = self.encoding_policy.encode(input_img, text_height)
+        image = {'content': content}
 
-        return texts
+        response = _check_response(self.client.text_detection(image=image, **_call_options(timeout)))
+        return _response_annotations(response, scale)
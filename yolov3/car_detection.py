@@ -7,16 +7,21 @@ import numpy as np
 from yolov3.model.yolo_model import YOLO
 
 
-def process_image(img):
+# the YOLO input size, a multiple of 32, smaller is faster and misses the smaller vehicles
+DEFAULT_INPUT_SIZE = 416
+
+
+def process_image(img, size=DEFAULT_INPUT_SIZE):
     """ Resize, reduce and expand image.
 
     # Argument:
         img: original image.
+        size: the YOLO input size.
 
     # Returns
-        image: ndarray(64, 64, 3), processed image.
+        image: ndarray(1, size, size, 3), processed image.
     """
-    image = cv2.resize(img, (416, 416), interpolation=cv2.INTER_CUBIC)
+    image = cv2.resize(img, (size, size), interpolation=cv2.INTER_CUBIC)
     image = np.array(image, dtype='float32')
     image /= 255.
     image = np.expand_dims(image, axis=0)
@@ -24,6 +29,19 @@ def process_image(img):
     return image
 
 
+def process_images(imgs, size=DEFAULT_INPUT_SIZE):
+    """ Resize, reduce and stack many images into a single batch.
+
+    # Argument:
+        imgs: original images.
+        size: the YOLO input size.
+
+    # Returns
+        images: ndarray(len(imgs), size, size, 3), processed images.
+    """
+    return np.concatenate([process_image(img, size) for img in imgs])
+
+
 def get_classes(file):
     """ Get classes names for the YOLO detection.
 
@@ -87,6 +105,19 @@ def extract_cars(image, boxes, scores, classes, all_classes):
     :param all_classes: all classes name.
     :return: the list of all images with detected cars/buses
     """
+    return [car_img for (car_img, box) in extract_car_boxes(image, boxes, scores, classes, all_classes)]
+
+
+def extract_car_boxes(image, boxes, scores, classes, all_classes):
+    """ Extract the detected cars & buses from the image, with their location.
+
+    :param image: original image
+    :param boxes: ndarray, boxes of objects
+    :param scores: ndarray, scores of objects.
+    :param classes: ndarray, classes of objects.
+    :param all_classes: all classes name.
+    :return: the list of (car/bus image, (x1, y1, x2, y2) box within the image)
+    """
 
     cars = []
 
@@ -100,7 +131,7 @@ def extract_cars(image, boxes, scores, classes, all_classes):
 
         if all_classes[cl] == 'car' or all_classes[cl] == 'bus':
             car_img = image[left:bottom, top:right]
-            cars.append(car_img)
+            cars.append((car_img, (int(top), int(left), int(right), int(bottom))))
 
     return cars
 
@@ -139,7 +170,20 @@ def detect_cars_image(image, yolo, all_classes):
     :param all_classes: all classes from yolo
     :return:
     """
-    processed_image = process_image(image)
+    return [car for (car, box) in detect_car_boxes_image(image, yolo, all_classes)]
+
+
+def detect_car_boxes_image(image, yolo, all_classes, input_size=DEFAULT_INPUT_SIZE):
+    """
+    Use yolo v3 to detect cars / buses within the given image, with their location.
+
+    :param image: image to detect from
+    :param yolo: the yolo model
+    :param all_classes: all classes from yolo
+    :param input_size: the YOLO input size
+    :return: the list of (car/bus image, (x1, y1, x2, y2) box within the image)
+    """
+    processed_image = process_image(image, input_size)
 
     start = time.time()
     boxes, classes, scores = yolo.predict(processed_image, image.shape)
@@ -149,11 +193,35 @@ def detect_cars_image(image, yolo, all_classes):
 
     cars = []
     if boxes is not None:
-        cars = extract_cars(image, boxes, scores, classes, all_classes)
+        cars = extract_car_boxes(image, boxes, scores, classes, all_classes)
 
     return cars
 
 
+def detect_car_boxes_images(images, yolo, all_classes, input_size=DEFAULT_INPUT_SIZE):
+    """
+    Use yolo v3 to detect cars / buses within many images, with a single forward pass.
+
+    :param images: images to detect from
+    :param yolo: the yolo model
+    :param all_classes: all classes from yolo
+    :param input_size: the YOLO input size
+    :return: the list of detect_car_boxes_image results, one for every image
+    """
+    processed_images = process_images(images, input_size)
+
+    start = time.time()
+    predictions = yolo.predict_batch(processed_images, [image.shape for image in images])
+    end = time.time()
+
+    print('YOLO Detection time: {0:.2f}s for {1:d} images'.format(end - start, len(images)))
+
+    results = []
+    for (image, (boxes, classes, scores)) in zip(images, predictions):
+        results.append(extract_car_boxes(image, boxes, scores, classes, all_classes) if boxes is not None else [])
+    return results
+
+
 def testYoloDetection():
     # load the YOLO model
     yolo = YOLO(0.6, 0.5)
@@ -179,12 +247,38 @@ class YoloDetector:
     __yolo = None
     __all_classes = None
 
-    def __init__(self) -> None:
+    def __init__(self, input_size=DEFAULT_INPUT_SIZE) -> None:
+        """
+        :param input_size: the YOLO input size, a multiple of 32
+        """
         # load the YOLO model
         self.yolo = YOLO(0.6, 0.5)
         # load the YOLO available classes
         self.all_classes = get_classes(os.path.dirname(__file__) + '/data/coco_classes.txt')
+        self.input_size = DEFAULT_INPUT_SIZE
+        self.set_input_size(input_size)
+
+    def set_input_size(self, input_size):
+        """
+        Change the YOLO input size, if the model accepts it.
+
+        :param input_size: the YOLO input size, a multiple of 32
+        :return: True if the input size was changed
+        """
+        fixed_size = self.yolo.input_size()
+        if input_size % 32 != 0 or (fixed_size is not None and fixed_size != (input_size, input_size)):
+            print('YOLO input size {0:d} not supported by the model, keeping {1:d}'.format(input_size,
+                                                                                         self.input_size))
+            return False
+        self.input_size = input_size
+        return True
 
     def detect_cars(self, image):
-        detected_cars = detect_cars_image(image, self.yolo, self.all_classes)
+        detected_cars = [car for (car, box) in self.detect_cars_with_boxes(image)]
         return detected_cars
+
+    def detect_cars_with_boxes(self, image):
+        return detect_car_boxes_image(image, self.yolo, self.all_classes, self.input_size)
+
+    def detect_cars_with_boxes_batch(self, images):
+        return detect_car_boxes_images(images, self.yolo, self.all_classes, self.input_size)
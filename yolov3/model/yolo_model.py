@@ -18,13 +18,23 @@ class YOLO:
         self._t2 = nms_threshold
         self._yolo = load_model(os.path.join(os.path.dirname(__file__), os.pardir) + '/data/yolo.h5')
 
-    def _process_feats(self, out, anchors, mask):
+    def input_size(self):
+        """Get the input size the model was built for.
+
+        # Returns
+            (height, width) of the model input, None when the model accepts any size multiple of 32.
+        """
+        height, width = self._yolo.input_shape[1:3]
+        return (height, width) if height is not None and width is not None else None
+
+    def _process_feats(self, out, anchors, mask, input_size=(416, 416)):
         """process output features.
 
         # Arguments
             out: Tensor (N, N, 3, 4 + 1 +80), output feature map of yolo.
             anchors: List, anchors for box.
             mask: List, mask for anchors.
+            input_size: (height, width) of the processed input image.
 
         # Returns
             boxes: ndarray (N, N, 3, 4), x,y,w,h for per box.
@@ -53,7 +63,7 @@ class YOLO:
 
         box_xy += grid
         box_xy /= (grid_w, grid_h)
-        box_wh /= (416, 416)
+        box_wh /= (input_size[1], input_size[0])
         box_xy -= (box_wh / 2.)
         boxes = np.concatenate((box_xy, box_wh), axis=-1)
 
@@ -123,12 +133,13 @@ class YOLO:
 
         return keep
 
-    def _yolo_out(self, outs, shape):
+    def _yolo_out(self, outs, shape, input_size=(416, 416)):
         """Process output of yolo base net.
 
         # Argument:
             outs: output of yolo base net.
             shape: shape of original image.
+            input_size: (height, width) of the processed input image.
 
         # Returns:
             boxes: ndarray, boxes of objects.
@@ -142,7 +153,7 @@ class YOLO:
         boxes, classes, scores = [], [], []
 
         for out, mask in zip(outs, masks):
-            b, c, s = self._process_feats(out, anchors, mask)
+            b, c, s = self._process_feats(out, anchors, mask, input_size)
             b, c, s = self._filter_boxes(b, c, s)
             boxes.append(b)
             classes.append(c)
@@ -193,6 +204,21 @@ class YOLO:
         """
 
         outs = self._yolo.predict(image)
-        boxes, classes, scores = self._yolo_out(outs, shape)
+        boxes, classes, scores = self._yolo_out(outs, shape, image.shape[1:3])
 
         return boxes, classes, scores
+
+    def predict_batch(self, images, shapes):
+        """Detect the objects of many images with a single yolo forward pass.
+
+        # Arguments
+            images: ndarray (batch, size, size, 3), processed input images.
+            shapes: shapes of the original images.
+
+        # Returns
+            list of (boxes, classes, scores), one for every image.
+        """
+
+        outs = self._yolo.predict(images)
+        return [self._yolo_out([out[i:i + 1] for out in outs], shape, images.shape[1:3])
+                for (i, shape) in enumerate(shapes)]